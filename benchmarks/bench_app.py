@@ -0,0 +1,210 @@
+"""Benchmark headless do app (Streamlit AppTest).
+
+Mede, em percentis, as etapas que o usuário sente:
+
+- cold start (caches do Streamlit limpos) e rerun sem mudanças;
+- troca de camada (cada opção de `camada`, com o cache de mapas desligado
+  para medir o `build_map` de fato);
+- aplicar filtro de cursos no formulário do mapa;
+- abrir o modal do município (via ``?municipio=``), frio e já em cache.
+
+Roda com o CSV do repositório (escala 1) e com bases sintéticas com linhas
+e cursos multiplicados por 10, 100, 1000... O relatório sai em JSON, para
+comparar entre commits:
+
+    python benchmarks/bench_app.py --escalas 1 10 100 --saida bench.json
+    python benchmarks/bench_app.py --escalas 1 --comparar bench.json
+
+Precisa de `data/municipios_latlon.geojson` e deve ser rodado da raiz do repo.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from qualificacao.cubo import CAMADAS  # noqa: E402
+from qualificacao.ingestao import CSV_PADRAO, garantir_parquet  # noqa: E402
+
+APP = os.path.join(RAIZ, "qualificacao_app.py")
+PERCENTIS = (50, 90, 99)
+
+
+def base_sintetica(escala: int, destino: str) -> str:
+    """CSV com linhas e cursos multiplicados por `escala` (municípios iguais)."""
+    df = pd.read_csv(os.path.join(RAIZ, CSV_PADRAO), encoding="utf-8")
+    copias = []
+    for i in range(escala):
+        c = df.copy()
+        if i:
+            c["CURSO"] = c["CURSO"].astype(str) + f" ({i})"
+        copias.append(c)
+    caminho = os.path.join(destino, f"base_x{escala}.csv")
+    pd.concat(copias, ignore_index=True).to_csv(caminho, index=False, encoding="utf-8")
+    return caminho
+
+
+def resumo(amostras: list) -> dict:
+    a = np.asarray(amostras, dtype=float) * 1000.0
+    r = {"n": len(a), "media_ms": float(a.mean()), "max_ms": float(a.max())}
+    r.update({f"p{p}_ms": float(np.percentile(a, p)) for p in PERCENTIS})
+    return r
+
+
+def _rodar(at, timeout):
+    t = time.perf_counter()
+    at.run(timeout=timeout)
+    dt = time.perf_counter() - t
+    if at.exception:
+        raise RuntimeError(f"exceção no app: {[e.value for e in at.exception]}")
+    return dt
+
+
+def _limpar_caches():
+    import streamlit as st
+
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+
+def medir(repeticoes: int, timeout: float) -> dict:
+    from streamlit.testing.v1 import AppTest
+
+    etapas = {}
+
+    def registrar(nome, dt):
+        etapas.setdefault(nome, []).append(dt)
+
+    for _ in range(repeticoes):
+        _limpar_caches()
+        at = AppTest.from_file(APP, default_timeout=timeout)
+        registrar("cold_start", _rodar(at, timeout))
+        registrar("rerun", _rodar(at, timeout))
+
+    # troca de camada (a partir de outra camada, para forçar o build)
+    for _ in range(repeticoes):
+        for camada in CAMADAS:
+            outra = CAMADAS[(CAMADAS.index(camada) + 1) % len(CAMADAS)]
+            at.sidebar.radio[0].set_value(outra)
+            _rodar(at, timeout)
+            at.sidebar.radio[0].set_value(camada)
+            registrar(f"camada:{camada}", _rodar(at, timeout))
+
+    # filtro de cursos (seleções diferentes a cada repetição)
+    sorteio = random.Random(42)
+    for _ in range(repeticoes):
+        seletor = next(m for m in at.multiselect if m.label == "Filtrar por curso")
+        seletor.set_value(sorteio.sample(list(seletor.options), k=min(3, len(seletor.options))))
+        next(b for b in at.button if b.label == "Aplicar").click()
+        registrar("filtro_cursos", _rodar(at, timeout))
+
+    # modal do município: primeira abertura e reabertura (cache)
+    seletor = next(m for m in at.multiselect if m.label == "Município")
+    municipios = sorteio.sample(list(seletor.options), k=min(repeticoes, len(seletor.options)))
+    for fase in ("dialogo_frio", "dialogo_cache"):
+        for mun in municipios:
+            at.query_params["municipio"] = mun
+            registrar(fase, _rodar(at, timeout))
+
+    return {nome: resumo(v) for nome, v in etapas.items()}
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(atual: dict, base: dict, limiar: float) -> list:
+    """Etapas cujo p50 piorou mais que `limiar` (fração) em relação à base."""
+    regressoes = []
+    for escala, dados in atual["escalas"].items():
+        antes = base.get("escalas", {}).get(escala, {}).get("etapas", {})
+        for etapa, r in dados["etapas"].items():
+            if etapa not in antes:
+                continue
+            p50, p50_base = r["p50_ms"], antes[etapa]["p50_ms"]
+            razao = p50 / p50_base if p50_base else float("inf")
+            print(f"x{escala:<5} {etapa:<40} {p50_base:9.1f} -> {p50:9.1f} ms  ({razao:5.2f}x)")
+            if razao > 1 + limiar:
+                regressoes.append((escala, etapa, razao))
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark headless do Qualificação App.")
+    parser.add_argument("--escalas", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--cache-mapa", action="store_true",
+                        help="mantém o cache de mapas ligado (por padrão mede o build_map)")
+    parser.add_argument("--saida", default=None, help="arquivo JSON do relatório")
+    parser.add_argument("--comparar", default=None, help="relatório base para detectar regressões")
+    parser.add_argument("--limiar", type=float, default=0.2, help="piora tolerada no p50 (fração)")
+    args = parser.parse_args()
+
+    os.chdir(RAIZ)
+    if not os.path.exists("data/municipios_latlon.geojson"):
+        sys.exit("data/municipios_latlon.geojson não encontrado")
+    if not args.cache_mapa:
+        os.environ["QUALIFICACAO_MAPA_CACHE_MB"] = "0"
+    # aquecimento em segundo plano disputaria a CPU com as etapas medidas
+    # (o efeito dele é medido em bench_aquecimento.py)
+    os.environ.setdefault("QUALIFICACAO_AQUECIMENTO", "0")
+
+    relatorio = {
+        "commit": _commit(),
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "repeticoes": args.repeticoes,
+        "cache_mapa": args.cache_mapa,
+        "escalas": {},
+    }
+
+    with tempfile.TemporaryDirectory(prefix="qualificacao_bench_") as tmp:
+        for escala in args.escalas:
+            csv = CSV_PADRAO if escala == 1 else base_sintetica(escala, tmp)
+            os.environ["QUALIFICACAO_CSV"] = csv
+
+            t = time.perf_counter()
+            parquet, _ = garantir_parquet(csv)
+            ingestao = time.perf_counter() - t
+            base = pd.read_parquet(parquet, columns=["CURSO"])
+
+            print(f"escala x{escala}: {len(base)} linhas, {base['CURSO'].nunique()} cursos", flush=True)
+            etapas = medir(args.repeticoes, args.timeout)
+            etapas["ingestao"] = resumo([ingestao])
+            relatorio["escalas"][str(escala)] = {
+                "linhas": int(len(base)),
+                "cursos": int(base["CURSO"].nunique()),
+                "etapas": etapas,
+            }
+            for nome, r in etapas.items():
+                print(f"  {nome:<40} p50 {r['p50_ms']:9.1f} ms   p90 {r['p90_ms']:9.1f} ms", flush=True)
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            regressoes = comparar(relatorio, json.load(f), args.limiar)
+        if regressoes:
+            sys.exit(f"{len(regressoes)} regressão(ões) acima de {args.limiar:.0%} no p50")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark do aquecimento dos caches (Streamlit AppTest).
+
+Compara, com o aquecimento desligado e ligado, o que o primeiro usuário
+depois de um deploy sente:
+
+- cold start (caches do Streamlit limpos);
+- tempo até o aquecimento terminar (só com ele ligado);
+- primeira troca para cada camada e primeiro filtro de um dos cursos com
+  mais concludentes — sem aquecimento, cada um paga o `build_map`.
+
+    python benchmarks/bench_aquecimento.py --escalas 1 10 --saida aquecimento.json
+
+Deve ser rodado da raiz do repo (precisa de `data/municipios_latlon.geojson`).
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from bench_app import APP, _limpar_caches, _rodar, base_sintetica  # noqa: E402
+from qualificacao.cubo import CAMADAS  # noqa: E402
+from qualificacao.ingestao import CSV_PADRAO, garantir_parquet  # noqa: E402
+
+
+def aguardar_aquecimento(at, timeout: float) -> float:
+    """Reroda até a sidebar deixar de mostrar o progresso; segundos esperados."""
+    t = time.perf_counter()
+    while time.perf_counter() - t < timeout:
+        if not any("Aquecendo caches" in c.value for c in at.sidebar.caption):
+            return time.perf_counter() - t
+        time.sleep(0.25)
+        _rodar(at, timeout)
+    raise RuntimeError("aquecimento não terminou no tempo limite")
+
+
+def curso_mais_concludentes(parquet: str) -> str:
+    df = pd.read_parquet(parquet, columns=["CURSO", "qtd_concludentes"])
+    return str(df.groupby("CURSO")["qtd_concludentes"].sum().idxmax())
+
+
+def medir(aquecer: bool, curso: str, timeout: float) -> dict:
+    from streamlit.testing.v1 import AppTest
+
+    os.environ["QUALIFICACAO_AQUECIMENTO"] = "1" if aquecer else "0"
+    _limpar_caches()
+    at = AppTest.from_file(APP, default_timeout=timeout)
+    r = {"cold_start_ms": _rodar(at, timeout) * 1000}
+    if aquecer:
+        r["ate_aquecer_ms"] = (aguardar_aquecimento(at, timeout) * 1000) + r["cold_start_ms"]
+
+    for camada in CAMADAS[1:] + CAMADAS[:1]:
+        at.sidebar.radio[0].set_value(camada)
+        r[f"camada:{camada}_ms"] = _rodar(at, timeout) * 1000
+
+    # o curso com mais concludentes (sem histórico, o primeiro filtro aquecido)
+    seletor = next(m for m in at.multiselect if m.label == "Filtrar por curso")
+    seletor.set_value([curso])
+    next(b for b in at.button if b.label == "Aplicar").click()
+    r["filtro_curso_ms"] = _rodar(at, timeout) * 1000
+    return r
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do aquecimento dos caches.")
+    parser.add_argument("--escalas", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--saida", default=None, help="arquivo JSON do relatório")
+    args = parser.parse_args()
+
+    os.chdir(RAIZ)
+    if not os.path.exists("data/municipios_latlon.geojson"):
+        sys.exit("data/municipios_latlon.geojson não encontrado")
+
+    relatorio = {}
+    with tempfile.TemporaryDirectory(prefix="qualificacao_aquecimento_") as tmp:
+        # histórico de filtros vazio: o aquecimento usa os cursos com mais concludentes
+        os.environ["QUALIFICACAO_FILTROS_POPULARES"] = os.path.join(tmp, "filtros_populares.json")
+        for escala in args.escalas:
+            csv = CSV_PADRAO if escala == 1 else base_sintetica(escala, tmp)
+            os.environ["QUALIFICACAO_CSV"] = csv
+            parquet, _ = garantir_parquet(csv)
+            curso = curso_mais_concludentes(parquet)
+            print(f"escala x{escala}", flush=True)
+            relatorio[str(escala)] = {}
+            for modo, aquecer in (("sem_aquecimento", False), ("com_aquecimento", True)):
+                r = medir(aquecer, curso, args.timeout)
+                relatorio[str(escala)][modo] = r
+                print(f"  {modo}", flush=True)
+                for nome, ms in r.items():
+                    print(f"    {nome:<40} {ms:9.1f} ms", flush=True)
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Benchmark do drill-down Lote → Município → Curso.
+
+Monta os rollups (`Hierarquia`) uma vez por escala e mede, em percentis,
+cada nível da navegação. Os mesmos níveis também são medidos sem rollup,
+direto sobre o cubo (groupby novo; no mapa, bincount com máscara do lote):
+
+- nível 1: métricas de um lote;
+- nível 2: municípios do lote;
+- nível 3: cursos de um município no lote;
+- mapa: valores da camada por município, só com o lote.
+
+Durante as medições do rollup, `DataFrame.groupby` e `Series.groupby` ficam
+trocados por uma função que falha. Se algum nível recalcular, o benchmark
+quebra. Os resultados também são conferidos contra o groupby.
+
+    python benchmarks/bench_hierarquia.py --escalas 1 10 100 --max-ms 5
+
+Sai com código 1 se o p50 de algum nível passar de `--max-ms`.
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from bench_app import base_sintetica, resumo  # noqa: E402
+from qualificacao.cubo import CAMADAS, valores_municipios  # noqa: E402
+from qualificacao.dataset import Dataset  # noqa: E402
+from qualificacao.hierarquia import Hierarquia  # noqa: E402
+from qualificacao.ingestao import CSV_PADRAO  # noqa: E402
+from qualificacao.municipios import TabelaMunicipios  # noqa: E402
+
+GEOJSON = os.path.join(RAIZ, "data", "municipios_latlon.geojson")
+
+
+@contextlib.contextmanager
+def sem_groupby():
+    """Qualquer groupby dentro do bloco é um erro (prova de que só há fatias)."""
+    originais = pd.DataFrame.groupby, pd.Series.groupby
+
+    def proibido(*args, **kwargs):
+        raise AssertionError("groupby chamado durante o drill-down")
+
+    pd.DataFrame.groupby = pd.Series.groupby = proibido
+    try:
+        yield
+    finally:
+        pd.DataFrame.groupby, pd.Series.groupby = originais
+
+
+def _tempo(fn) -> float:
+    t = time.perf_counter()
+    fn()
+    return time.perf_counter() - t
+
+
+def groupby_lote(cubo, lote):
+    return cubo[cubo["Nº LOTE"] == lote].groupby("Nº LOTE", observed=True)[["qtd_concludentes"]].sum()
+
+
+def groupby_municipios(cubo, lote):
+    return (cubo[cubo["Nº LOTE"] == lote]
+            .groupby("Município", observed=True)[["qtd_turmas", "qtd_concludentes"]].sum())
+
+
+def groupby_cursos(cubo, lote, municipio):
+    fatia = cubo[(cubo["Nº LOTE"] == lote) & (cubo["Município"] == municipio)]
+    return fatia.groupby("CURSO", observed=True)[["qtd_turmas", "qtd_concludentes"]].sum()
+
+
+def medir(ds: Dataset, n_municipios: int, amostras: int, sorteio: random.Random) -> dict:
+    t = time.perf_counter()
+    h = Hierarquia(ds.cubo)
+    montagem = time.perf_counter() - t
+
+    cubo = ds.cubo
+    lotes = h.nomes_lotes()
+    alvos = []
+    for _ in range(amostras):
+        lote = sorteio.choice(lotes)
+        alvos.append((lote, str(sorteio.choice(list(h.municipios(lote)["Município"])))))
+
+    rollup = {k: [] for k in ("lote", "municipios", "cursos", "mapa")}
+    with sem_groupby():
+        for lote, mun in alvos:
+            rollup["lote"].append(_tempo(lambda: h.lote(lote)))
+            rollup["municipios"].append(_tempo(lambda: h.municipios(lote)))
+            rollup["cursos"].append(_tempo(lambda: h.cursos(lote, mun)))
+            if n_municipios:
+                rollup["mapa"].append(_tempo(lambda: h.valores_mapa(lote, CAMADAS[2], n_municipios)))
+
+    sem_rollup = {k: [] for k in rollup}
+    for lote, mun in alvos:
+        sem_rollup["lote"].append(_tempo(lambda: groupby_lote(cubo, lote)))
+        sem_rollup["municipios"].append(_tempo(lambda: groupby_municipios(cubo, lote)))
+        sem_rollup["cursos"].append(_tempo(lambda: groupby_cursos(cubo, lote, mun)))
+        if n_municipios:
+            mascara = (cubo["Nº LOTE"] == lote).to_numpy()
+            sem_rollup["mapa"].append(_tempo(lambda: valores_municipios(cubo, CAMADAS[2], n_municipios, mascara)))
+
+    # conferência: rollup == groupby
+    for lote, mun in alvos:
+        esperado = groupby_cursos(cubo, lote, mun)
+        obtido = h.cursos(lote, mun).set_index("CURSO")[esperado.columns]
+        obtido.index = obtido.index.astype(str)
+        esperado.index = esperado.index.astype(str)
+        pd.testing.assert_frame_equal(obtido.sort_index(), esperado.sort_index(), check_dtype=False,
+                                      check_names=False, check_index_type=False)
+        if n_municipios:
+            mascara = (cubo["Nº LOTE"] == lote).to_numpy()
+            for camada in CAMADAS:
+                assert np.allclose(h.valores_mapa(lote, camada, n_municipios),
+                                   valores_municipios(cubo, camada, n_municipios, mascara)), camada
+
+    return {
+        "montagem": resumo([montagem]),
+        "rollup": {k: resumo(v) for k, v in rollup.items() if v},
+        "sem_rollup": {k: resumo(v) for k, v in sem_rollup.items() if v},
+        "nbytes": h.nbytes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do drill-down por lote (rollups x cubo).")
+    parser.add_argument("--escalas", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--amostras", type=int, default=50)
+    parser.add_argument("--max-ms", type=float, default=5.0, help="orçamento do p50 de cada nível (rollup)")
+    parser.add_argument("--saida", default=None, help="arquivo JSON do relatório")
+    args = parser.parse_args()
+
+    os.chdir(RAIZ)
+    tabela = None
+    if os.path.exists(GEOJSON):
+        with open(GEOJSON, "r", encoding="utf-8") as f:
+            tabela = TabelaMunicipios.de_geojson(json.load(f))
+    else:
+        print("data/municipios_latlon.geojson não encontrado: nível do mapa não medido")
+
+    relatorio, falhas = {}, []
+    sorteio = random.Random(42)
+    with tempfile.TemporaryDirectory(prefix="qualificacao_bench_") as tmp:
+        for escala in args.escalas:
+            csv = CSV_PADRAO if escala == 1 else base_sintetica(escala, tmp)
+            ds = Dataset.carregar(csv, municipios=tabela)
+            r = medir(ds, len(tabela) if tabela is not None else 0, args.amostras, sorteio)
+            relatorio[str(escala)] = {"linhas_cubo": len(ds.cubo), **r}
+
+            print(f"escala x{escala}: {len(ds.cubo)} linhas no cubo, rollups {r['nbytes'] / 1024:.0f} KiB, "
+                  f"montagem {r['montagem']['p50_ms']:.1f} ms", flush=True)
+            for nivel, rr in r["rollup"].items():
+                base = r["sem_rollup"][nivel]["p50_ms"]
+                print(f"  {nivel:<12} rollup p50 {rr['p50_ms']:8.3f} ms   sem rollup p50 {base:8.3f} ms   "
+                      f"({base / max(rr['p50_ms'], 1e-6):6.1f}x)", flush=True)
+                if rr["p50_ms"] > args.max_ms:
+                    falhas.append(f"x{escala} {nivel}")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    if falhas:
+        sys.exit(f"orçamento estourado: {', '.join(falhas)}")
+
+
+if __name__ == "__main__":
+    main()
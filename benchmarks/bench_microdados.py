@@ -0,0 +1,145 @@
+"""Benchmark da agregação de microdados (qualificacao.microdados).
+
+Gera exportações sintéticas de inscrições (uma linha por aluno × turma, com
+colunas extras que o motor não lê) a partir dos municípios, cursos e lotes
+do CSV do repositório e mede:
+
+- agregação completa (``--refazer``) de todos os arquivos;
+- anexar um arquivo novo (incremental: só ele é lido);
+- rodar de novo sem mudanças.
+
+As etapas rodam em processos próprios. O relatório traz inscrições/s e o
+pico de memória (RSS) do maior desses processos, workers incluídos. Com
+``--conferir`` (padrão até 2 milhões de linhas), a saída é comparada com um
+groupby do pandas sobre tudo em memória.
+
+    python benchmarks/bench_microdados.py --linhas 5000000 --arquivos 8 --motor arrow --max-mb 1024
+
+Sai com código 1 se o pico de RSS passar de `--max-mb`.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from qualificacao.ingestao import CSV_PADRAO, ler_csv  # noqa: E402
+from qualificacao.microdados import SAIDA, atualizar, motor_disponivel  # noqa: E402
+
+SITUACOES = np.array(["Concluído", "CONCLUIDO", "Desistente", "Em andamento", "Reprovado"])
+LINHAS_POR_BLOCO = 500_000
+
+
+def gerar(destino: str, nome: str, linhas: int, semente: int, cursos: pd.DataFrame) -> str:
+    """CSV de inscrições; turmas e vagas derivadas de (lote, município, curso)."""
+    sorteio = np.random.default_rng(semente)
+    caminho = os.path.join(destino, nome)
+    escritas = 0
+    while escritas < linhas:
+        n = min(LINHAS_POR_BLOCO, linhas - escritas)
+        linha = sorteio.integers(0, len(cursos), n)
+        turma = sorteio.integers(0, 4, n)
+        base = cursos.iloc[linha].reset_index(drop=True)
+        id_turma = pd.Series(linha * 4 + turma).astype(str)
+        pd.DataFrame({
+            "CPF": sorteio.integers(10**10, 10**11, n).astype(str),
+            "NOME_ALUNO": "ALUNO " + pd.Series(sorteio.integers(0, 10**6, n)).astype(str),
+            "Nº LOTE": base["Nº LOTE"],
+            "Município": base["Município"].str.title(),
+            "CURSO": base["CURSO"],
+            "ID_TURMA": "T" + id_turma,
+            "VAGAS_TURMA": 20 + (linha * 4 + turma) % 21,
+            "SITUACAO": SITUACOES[sorteio.integers(0, len(SITUACOES), n)],
+        }).to_csv(caminho, mode="a" if escritas else "w", header=not escritas, index=False, encoding="utf-8")
+        escritas += n
+    return caminho
+
+
+def referencia(arquivos: list) -> pd.DataFrame:
+    """Mesma agregação, tudo em memória com pandas (para conferir)."""
+    df = pd.concat([pd.read_csv(a, dtype=str) for a in arquivos], ignore_index=True)
+    df["Município"] = df["Município"].str.strip().str.upper()
+    df["concluiu"] = df["SITUACAO"].str.upper().isin(["CONCLUÍDO", "CONCLUIDO"]).astype(int)
+    df["vagas"] = pd.to_numeric(df["VAGAS_TURMA"])
+    turmas = df.groupby(["Nº LOTE", "Município", "CURSO", "ID_TURMA"], as_index=False).agg(
+        inscritos=("CPF", "size"), concludentes=("concluiu", "sum"), vagas=("vagas", "max"))
+    return (turmas.groupby(["Nº LOTE", "Município", "CURSO"], as_index=False)
+                  .agg(qtd_turmas=("ID_TURMA", "size"), qtd_inscritos=("inscritos", "sum"),
+                       qtd_vagas=("vagas", "sum"), qtd_concludentes=("concludentes", "sum")))
+
+
+def etapa_isolada(entrada: list, refazer: bool, opcoes: dict):
+    """(relatório, pico de RSS em MiB até aqui) de `atualizar` num processo novo."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        r = pool.submit(atualizar, entrada, refazer=refazer, **opcoes).result()
+    # processos já encerrados; ru_maxrss (KiB no Linux) é o do maior filho até agora
+    return r, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da agregação de microdados.")
+    parser.add_argument("--linhas", type=int, default=1_000_000, help="inscrições no total (sem o anexo)")
+    parser.add_argument("--arquivos", type=int, default=4)
+    parser.add_argument("--motor", choices=["auto", "duckdb", "arrow"], default="auto")
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument("--memoria-mb", type=int, default=1024)
+    parser.add_argument("--conferir", action=argparse.BooleanOptionalAction, default=None)
+    parser.add_argument("--max-mb", type=float, default=None, help="orçamento do pico de RSS")
+    parser.add_argument("--saida", default=None, help="arquivo JSON do relatório")
+    args = parser.parse_args()
+
+    cursos = ler_csv(os.path.join(RAIZ, CSV_PADRAO))[["Nº LOTE", "Município", "CURSO"]].astype(str)
+    conferir = args.conferir if args.conferir is not None else args.linhas <= 2_000_000
+    motor = motor_disponivel(args.motor)
+
+    relatorio = {"motor": motor, "linhas": args.linhas, "arquivos": args.arquivos}
+    with tempfile.TemporaryDirectory(prefix="qualificacao_micro_") as tmp:
+        t = time.perf_counter()
+        por_arquivo = -(-args.linhas // args.arquivos)
+        arquivos = [gerar(tmp, f"inscricoes_{i:02d}.csv", min(por_arquivo, args.linhas - i * por_arquivo), i, cursos)
+                    for i in range(args.arquivos)]
+        anexo = gerar(tmp, "inscricoes_anexo.csv", max(por_arquivo // 4, 1), 999, cursos)
+        mb = sum(os.path.getsize(a) for a in arquivos) / 2**20
+        print(f"{args.arquivos} arquivo(s), {args.linhas:,} inscrições, {mb:.0f} MiB "
+              f"(gerados em {time.perf_counter() - t:.1f} s); motor {motor}", flush=True)
+
+        estado, saida = os.path.join(tmp, "estado"), os.path.join(tmp, "agregado.csv")
+        opcoes = dict(estado=estado, saida=saida, motor=motor, processos=args.processos,
+                      memoria_mb=args.memoria_mb)
+        for etapa, entrada, refazer in (("completa", arquivos, True),
+                                        ("anexo", arquivos + [anexo], False),
+                                        ("sem_mudanca", arquivos + [anexo], False)):
+            r, pico = etapa_isolada(entrada, refazer, opcoes)
+            relatorio[etapa] = {"segundos": r["segundos"], "linhas_lidas": r["linhas_lidas"],
+                                "linhas_s": r["linhas_lidas"] / max(r["segundos"], 1e-9)}
+            print(f"  {etapa:<12} {r['segundos']:7.2f} s  {r['linhas_lidas']:>12,} lidas  "
+                  f"({relatorio[etapa]['linhas_s']:,.0f}/s)", flush=True)
+        relatorio["pico_mb"] = pico
+        print(f"  pico RSS: {pico:.0f} MiB")
+
+        if conferir:
+            esperado = referencia(arquivos + [anexo]).sort_values(SAIDA[:3]).reset_index(drop=True)
+            obtido = (pd.read_csv(saida, dtype={c: str for c in SAIDA[:3]})
+                        .sort_values(SAIDA[:3]).reset_index(drop=True))
+            pd.testing.assert_frame_equal(obtido[SAIDA], esperado[SAIDA], check_dtype=False)
+            print("  saída confere com o groupby em memória")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    if args.max_mb is not None and pico > args.max_mb:
+        sys.exit(f"orçamento estourado: pico de {pico:.0f} MiB > {args.max_mb:.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Benchmark do modo série (qualificacao.periodos).
+
+Gera `--periodos` partições sintéticas a partir do CSV do repositório
+(métricas sorteadas por período, cursos multiplicados por `--escala`) e mede:
+
+- carga da série inteira a frio (cada partição vira Parquet e cubo);
+- carga depois de chegar um período novo (só ele é processado);
+- o cubo de intervalos sorteados do slider, com as somas acumuladas e sem
+  elas (bincount sobre as linhas do intervalo), contra o caminho ingênuo:
+  concatenar as bases do intervalo e rodar o `build_cubo`.
+
+Os cubos dos intervalos são conferidos com os do caminho ingênuo.
+
+    python benchmarks/bench_periodos.py --periodos 24 --escala 10 --max-ms 50
+
+Sai com código 1 se o p99 de um intervalo (somas acumuladas) passar de `--max-ms`.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from bench_app import base_sintetica, resumo  # noqa: E402
+from qualificacao.cubo import CHAVES, build_cubo  # noqa: E402
+from qualificacao.dataset import Dataset, _carregar_periodo  # noqa: E402
+from qualificacao.ingestao import CSV_PADRAO, carregar_dataset  # noqa: E402
+from qualificacao.periodos import SOMAS, SeriePeriodos, listar_periodos  # noqa: E402
+
+METRICAS_CSV = ["qtd_turmas", "qtd_vagas", "qtd_inscritos", "qtd_concludentes"]
+
+
+def gerar_periodo(base: pd.DataFrame, destino: str, rotulo: str, semente: int) -> str:
+    """Partição com ~80% das linhas da base e métricas escaladas ao acaso."""
+    sorteio = np.random.default_rng(semente)
+    df = base.sample(frac=0.8, random_state=semente).reset_index(drop=True)
+    for col in METRICAS_CSV:
+        if col in df.columns:
+            valores = pd.to_numeric(df[col], errors="coerce").fillna(0)
+            df[col] = (valores * sorteio.uniform(0.5, 1.5, len(df))).round().astype("int64")
+    caminho = os.path.join(destino, f"{rotulo}.csv")
+    df.to_csv(caminho, index=False, encoding="utf-8")
+    return caminho
+
+
+def rotulo(i: int) -> str:
+    return f"{2000 + i // 2}-S{i % 2 + 1}"
+
+
+def normalizar(cubo: pd.DataFrame) -> pd.DataFrame:
+    c = cubo[CHAVES + SOMAS].copy()
+    for col in CHAVES:
+        c[col] = c[col].astype(str)
+    return c.sort_values(CHAVES).reset_index(drop=True)
+
+
+def medir_intervalos(serie: SeriePeriodos, intervalos) -> list:
+    tempos = []
+    for i, j in intervalos:
+        t = time.perf_counter()
+        serie.cubo(i, j)
+        tempos.append(time.perf_counter() - t)
+    return tempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do modo série (períodos).")
+    parser.add_argument("--periodos", type=int, default=12)
+    parser.add_argument("--escala", type=int, default=1, help="multiplica os cursos de cada partição")
+    parser.add_argument("--intervalos", type=int, default=200, help="intervalos sorteados do slider")
+    parser.add_argument("--conferir", type=int, default=20, help="intervalos conferidos com o build_cubo")
+    parser.add_argument("--max-ms", type=float, default=None)
+    parser.add_argument("--saida", default=None, help="arquivo JSON do relatório")
+    args = parser.parse_args()
+
+    relatorio = {"periodos": args.periodos, "escala": args.escala}
+    with tempfile.TemporaryDirectory(prefix="qualificacao_periodos_") as tmp:
+        csv = os.path.join(RAIZ, CSV_PADRAO) if args.escala == 1 else base_sintetica(args.escala, tmp)
+        base = pd.read_csv(csv, encoding="utf-8")
+        diretorio = os.path.join(tmp, "periodos")
+        os.makedirs(diretorio)
+        for i in range(args.periodos):
+            gerar_periodo(base, diretorio, rotulo(i), i)
+
+        t = time.perf_counter()
+        ds = Dataset.carregar_periodos(diretorio)
+        relatorio["carga_fria_ms"] = (time.perf_counter() - t) * 1000
+
+        gerar_periodo(base, diretorio, rotulo(args.periodos), args.periodos)
+        t = time.perf_counter()
+        ds = Dataset.carregar_periodos(diretorio)
+        relatorio["carga_com_periodo_novo_ms"] = (time.perf_counter() - t) * 1000
+
+        serie = ds.periodos
+        n = len(serie)
+        # base concatenada só para o cálculo ingênuo (o Dataset da série não guarda a base)
+        base_serie = pd.concat([carregar_dataset(c).assign(**{"Período": r}) for r, c in listar_periodos(diretorio)],
+                               ignore_index=True)
+        relatorio["linhas_base"] = len(base_serie)
+        relatorio["chaves"] = len(serie.chaves)
+        relatorio["memoria_serie_mb"] = serie.nbytes / 2**20
+
+        sorteio = np.random.default_rng(0)
+        intervalos = [tuple(sorted(sorteio.integers(0, n, 2))) for _ in range(args.intervalos)]
+        cubos = [_carregar_periodo(c) for _, c in listar_periodos(diretorio)]
+        sem_acumulados = SeriePeriodos(serie.rotulos, cubos, max_bytes=0)
+        relatorio["intervalo_acumulado"] = resumo(medir_intervalos(serie, intervalos))
+        relatorio["intervalo_bincount"] = resumo(medir_intervalos(sem_acumulados, intervalos))
+
+        tempos = []
+        for i, j in intervalos[:args.conferir]:
+            t = time.perf_counter()
+            ingenuo = build_cubo(base_serie[base_serie["Período"].isin(serie.rotulos[i:j + 1])])
+            tempos.append(time.perf_counter() - t)
+            esperado = normalizar(ingenuo[ingenuo["n_registros"] > 0])
+            for s in (serie, sem_acumulados):
+                pd.testing.assert_frame_equal(normalizar(s.cubo(i, j)), esperado, check_dtype=False)
+        relatorio["intervalo_build_cubo"] = resumo(tempos)
+
+    print(f"{n} período(s), {relatorio['linhas_base']} linha(s), {relatorio['chaves']} chave(s), "
+          f"série {relatorio['memoria_serie_mb']:.1f} MB")
+    print(f"  carga a frio                  {relatorio['carga_fria_ms']:9.1f} ms")
+    print(f"  carga com um período novo     {relatorio['carga_com_periodo_novo_ms']:9.1f} ms")
+    for nome in ("intervalo_acumulado", "intervalo_bincount", "intervalo_build_cubo"):
+        r = relatorio[nome]
+        print(f"  {nome:<30}p50 {r['p50_ms']:8.2f} ms   p99 {r['p99_ms']:8.2f} ms")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    if args.max_ms is not None and relatorio["intervalo_acumulado"]["p99_ms"] > args.max_ms:
+        print(f"p99 acima de {args.max_ms} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Checagem de orçamento de inicialização e de rerun do app.
+
+1. Importa, num processo novo, apenas os imports de topo de
+   `qualificacao_app.py` e mede o tempo; falha se passar do orçamento ou se
+   alguma biblioteca pesada (folium, altair, branca, streamlit_folium,
+   shapely) já vier carregada — elas só devem entrar quando o componente que
+   as usa renderiza.
+2. Via AppTest, mede o primeiro run (processo novo, caches vazios) e o p50
+   dos reruns seguintes.
+
+    python benchmarks/orcamento.py --max-import-ms 3000 --max-rerun-ms 1000
+
+Sai com código 1 se algum orçamento for estourado.
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(RAIZ, "qualificacao_app.py")
+PESADAS = ("folium", "altair", "branca", "streamlit_folium", "shapely")
+
+
+def imports_de_topo(caminho: str) -> str:
+    with open(caminho, "r", encoding="utf-8") as f:
+        arvore = ast.parse(f.read())
+    nos = [n for n in arvore.body if isinstance(n, (ast.Import, ast.ImportFrom))]
+    return "\n".join(ast.unparse(n) for n in nos)
+
+
+def medir_imports() -> dict:
+    codigo = (
+        "import json, sys, time\n"
+        "t = time.perf_counter()\n"
+        + imports_de_topo(APP) + "\n"
+        "dt = time.perf_counter() - t\n"
+        f"print(json.dumps({{'ms': dt * 1000, 'pesadas': [m for m in {PESADAS!r} if m in sys.modules]}}))\n"
+    )
+    saida = subprocess.run([sys.executable, "-c", codigo], cwd=RAIZ, capture_output=True,
+                           text=True, check=True).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def medir_reruns(n: int, timeout: float) -> dict:
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=timeout)
+    t = time.perf_counter()
+    at.run()
+    primeiro = time.perf_counter() - t
+    if at.exception:
+        raise RuntimeError(f"exceção no app: {[e.value for e in at.exception]}")
+    reruns = []
+    for _ in range(n):
+        t = time.perf_counter()
+        at.run()
+        reruns.append(time.perf_counter() - t)
+    return {"primeiro_ms": primeiro * 1000, "rerun_p50_ms": float(np.percentile(reruns, 50)) * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Orçamento de import e rerun do Qualificação App.")
+    parser.add_argument("--max-import-ms", type=float, default=3000)
+    parser.add_argument("--max-primeiro-ms", type=float, default=8000)
+    parser.add_argument("--max-rerun-ms", type=float, default=1000)
+    parser.add_argument("--reruns", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    os.chdir(RAIZ)
+    sys.path.insert(0, RAIZ)
+    falhas = []
+
+    imp = medir_imports()
+    print(f"imports de topo: {imp['ms']:.0f} ms (orçamento {args.max_import_ms:.0f})")
+    if imp["ms"] > args.max_import_ms:
+        falhas.append("tempo de import")
+    if imp["pesadas"]:
+        print(f"  carregadas no import: {', '.join(imp['pesadas'])}")
+        falhas.append("bibliotecas pesadas no import")
+
+    if os.path.exists("data/municipios_latlon.geojson"):
+        r = medir_reruns(args.reruns, args.timeout)
+        print(f"primeiro run: {r['primeiro_ms']:.0f} ms (orçamento {args.max_primeiro_ms:.0f})")
+        print(f"rerun p50:    {r['rerun_p50_ms']:.0f} ms (orçamento {args.max_rerun_ms:.0f})")
+        if r["primeiro_ms"] > args.max_primeiro_ms:
+            falhas.append("primeiro run")
+        if r["rerun_p50_ms"] > args.max_rerun_ms:
+            falhas.append("rerun")
+    else:
+        print("data/municipios_latlon.geojson não encontrado: reruns não medidos")
+
+    if falhas:
+        sys.exit(f"orçamento estourado: {', '.join(falhas)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Módulos de apoio do Qualificação App."""
@@ -0,0 +1,148 @@
+"""Aquecimento dos caches em paralelo, ao subir o processo e a cada nova versão.
+
+Um `Aquecimento` recebe tarefas nomeadas (funções sem argumentos), em ordem
+de prioridade, e as executa num pool de threads. As tarefas preenchem os
+mesmos caches das sessões (`st.cache_resource` e o store de resultados),
+que já constroem cada chave uma única vez: uma sessão que pede algo em
+construção espera só por aquele item, e o que ainda não começou ela mesma
+constrói, como sem aquecimento. Nenhuma sessão espera o plano inteiro.
+
+Threads, e não processos: os caches vivem na memória deste processo, e o
+que é pesado (Parquet, numpy, serialização) fica fora do GIL boa parte do
+tempo.
+
+`FiltrosPopulares` guarda em disco quantas vezes cada seleção de cursos foi
+aplicada, para que o próximo processo aqueça os filtros mais usados.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+log = logging.getLogger(__name__)
+
+
+class Aquecimento:
+    def __init__(self, threads: int = 4, rotulo: str = ""):
+        self.rotulo = rotulo
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(threads)),
+                                        thread_name_prefix="qualificacao-aquecimento")
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._futuros = []
+        self._tarefas = {}       # nome -> {"status", "ms", "erro"}
+        self.iniciado_em = time.time()
+        self.concluido_em = None
+
+    def iniciar(self, tarefas) -> "Aquecimento":
+        """Enfileira (nome, função) na ordem dada; não espera."""
+        tarefas = list(tarefas)
+        with self._lock:
+            # todas registradas antes de a primeira terminar (o fim é "nenhuma pendente")
+            for nome, _ in tarefas:
+                self._tarefas[nome] = {"status": "pendente", "ms": None, "erro": None}
+            self._futuros += [self._pool.submit(self._rodar, nome, funcao) for nome, funcao in tarefas]
+            if not self._tarefas:
+                self.concluido_em = time.time()
+        return self
+
+    def _rodar(self, nome: str, funcao):
+        if self._parar.is_set():
+            self._anotar(nome, "cancelada")
+            return
+        self._anotar(nome, "rodando")
+        t = time.perf_counter()
+        try:
+            funcao()
+            self._anotar(nome, "pronta", (time.perf_counter() - t) * 1000)
+        except Exception as e:
+            # o que falhou aqui a sessão tenta de novo (e mostra o erro) ao pedir
+            self._anotar(nome, "erro", (time.perf_counter() - t) * 1000, f"{type(e).__name__}: {e}")
+            log.exception("falha ao aquecer %s", nome)
+
+    def _anotar(self, nome, status, ms=None, erro=None):
+        with self._lock:
+            self._tarefas[nome] = {"status": status, "ms": ms, "erro": erro}
+            if self.concluido_em is None and all(
+                    t["status"] in ("pronta", "erro", "cancelada") for t in self._tarefas.values()):
+                self.concluido_em = time.time()
+                fim = True
+            else:
+                fim = False
+        if fim:
+            p = self.progresso()
+            log.info("aquecimento %s: %d tarefa(s) em %.1f s (%d erro(s))",
+                     self.rotulo, p["prontas"], p["segundos"], p["erros"])
+
+    @property
+    def concluido(self) -> bool:
+        return self.concluido_em is not None
+
+    def aguardar(self, timeout: float | None = None) -> bool:
+        """Espera as tarefas enfileiradas; True se todas terminaram."""
+        with self._lock:
+            futuros = list(self._futuros)
+        return not wait(futuros, timeout=timeout).not_done
+
+    def parar(self):
+        """Descarta o que ainda não começou (versão antiga, cache limpo)."""
+        self._parar.set()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def progresso(self) -> dict:
+        with self._lock:
+            status = [t["status"] for t in self._tarefas.values()]
+        fim = self.concluido_em or time.time()
+        return {
+            "total": len(status),
+            "prontas": status.count("pronta"),
+            "erros": status.count("erro"),
+            "rodando": status.count("rodando"),
+            "segundos": fim - self.iniciado_em,
+            "concluido": self.concluido,
+        }
+
+    def tempos(self) -> list:
+        """[(nome, status, ms)] na ordem do plano."""
+        with self._lock:
+            return [(nome, t["status"], t["ms"]) for nome, t in self._tarefas.items()]
+
+
+class FiltrosPopulares:
+    """Contagem persistente das seleções de cursos aplicadas no mapa."""
+
+    def __init__(self, caminho: str, max_itens: int = 200):
+        self.caminho = caminho
+        self.max_itens = max_itens
+        self._lock = threading.Lock()
+        self._contagem = {}      # tupla de cursos -> usos
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                for item in json.load(f).get("filtros", []):
+                    self._contagem[tuple(item["cursos"])] = int(item["usos"])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass  # sem histórico (ou ilegível): começa do zero
+
+    def registrar(self, cursos):
+        cursos = tuple(sorted(map(str, cursos)))
+        if not cursos:
+            return
+        with self._lock:
+            self._contagem[cursos] = self._contagem.get(cursos, 0) + 1
+            if len(self._contagem) > self.max_itens:
+                del self._contagem[min(self._contagem, key=self._contagem.get)]
+            itens = [{"cursos": list(c), "usos": n} for c, n in self._contagem.items()]
+            try:
+                os.makedirs(os.path.dirname(self.caminho) or ".", exist_ok=True)
+                with open(self.caminho + ".tmp", "w", encoding="utf-8") as f:
+                    json.dump({"filtros": itens}, f, ensure_ascii=False)
+                os.replace(self.caminho + ".tmp", self.caminho)
+            except OSError:
+                log.warning("não foi possível gravar %s", self.caminho)
+
+    def mais_usados(self, n: int) -> list:
+        """As `n` seleções mais aplicadas (tuplas de cursos), da mais usada para a menos."""
+        with self._lock:
+            return sorted(self._contagem, key=lambda c: -self._contagem[c])[:n]
@@ -0,0 +1,127 @@
+"""Atualização dos dados em segundo plano, com troca atômica de versão.
+
+Um `Atualizador` por processo guarda o `Dataset` atual. Uma thread verifica
+o CSV de origem a cada `intervalo` segundos. Quando o CSV muda, ela refaz o
+Parquet, carrega a nova versão e aquece os caches (o plano de aquecimento
+do app) fora do caminho das sessões; só então troca a referência.
+
+Cada rerun lê `atual` uma vez e segue com aquele snapshot até o fim. A troca
+é a atribuição de uma referência: nenhuma sessão vê metade de uma versão e
+nenhum usuário paga a recarga.
+
+Um CSV ainda sendo copiado não é lido: a thread só recarrega quando o
+arquivo está igual (mtime/tamanho) há pelo menos um ciclo.
+
+Com ``intervalo <= 0`` não há thread: a verificação (um `os.stat`) é feita
+no próprio rerun, como antes.
+
+A origem também pode ser um diretório de períodos: basta passar as funções
+de `versao` e `assinatura` dele.
+"""
+import logging
+import os
+import threading
+import time
+import weakref
+
+from qualificacao.dataset import versao_dataset
+
+log = logging.getLogger(__name__)
+
+
+def assinatura_arquivo(caminho: str) -> tuple:
+    info = os.stat(caminho)
+    return info.st_mtime_ns, info.st_size
+
+
+class Atualizador:
+    def __init__(self, csv: str, carregar, aquecer=None, intervalo: float = 30.0,
+                 versao=versao_dataset, assinatura=assinatura_arquivo):
+        self.csv = csv
+        self.intervalo = float(intervalo)
+        self._carregar = carregar      # versão -> Dataset
+        self._aquecer = aquecer        # callback(Dataset) antes da troca
+        self._versao = versao          # origem -> versão dos dados
+        self._assinatura_de = assinatura
+        self._atual = None
+        self._lock = threading.Lock()  # uma recarga por vez
+        self._parar = threading.Event()
+        self._thread = None
+        self._assinatura = None        # (mtime_ns, tamanho) da origem na última verificação
+        self.recargas = 0
+        self.verificado_em = None
+        self.ultimo_erro = None
+
+    @property
+    def atual(self):
+        """Snapshot da versão atual (leia uma vez por rerun)."""
+        ds = self._atual
+        if ds is None or self._thread is None:
+            ds = self.verificar()
+        return ds
+
+    def verificar(self, aguardar_estavel: bool = False):
+        """Recarrega se o CSV mudou; retorna o Dataset atual.
+
+        Com `aguardar_estavel`, um CSV que mudou desde a verificação anterior
+        fica para a próxima (pode estar sendo escrito).
+        """
+        with self._lock:
+            anterior, self._assinatura = self._assinatura, self._assinatura_de(self.csv)
+            self.verificado_em = time.time()
+            if aguardar_estavel and self._atual is not None and self._assinatura != anterior:
+                return self._atual
+            versao = self._versao(self.csv)
+            if self._atual is not None and self._atual.versao == versao:
+                return self._atual
+            ds = self._carregar(versao)
+            if self._aquecer is not None and self._atual is not None:
+                # na primeira carga quem espera é o usuário: o app aquece em segundo plano
+                try:
+                    self._aquecer(ds)
+                except Exception:
+                    log.exception("falha ao aquecer os caches da versão %s", versao)
+            anterior, self._atual = self._atual, ds
+            self.recargas += 1
+            if anterior is not None:
+                log.info("dados atualizados: versão %s -> %s", anterior.versao, ds.versao)
+            return ds
+
+    def iniciar(self) -> "Atualizador":
+        """Sobe a thread de verificação (nada a fazer com intervalo <= 0)."""
+        if self.intervalo > 0 and self._thread is None:
+            # a thread só guarda uma referência fraca: o Atualizador descartado
+            # (ex.: st.cache_resource.clear()) encerra o laço sozinho
+            self._thread = threading.Thread(
+                target=_laco, args=(weakref.ref(self), self._parar, self.intervalo),
+                name="qualificacao-atualizador", daemon=True)
+            self._thread.start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+
+    def stats(self) -> dict:
+        ds = self._atual
+        return {
+            "versao": ds.versao if ds is not None else None,
+            "carregado_em": ds.carregado_em if ds is not None else None,
+            "verificado_em": self.verificado_em,
+            "recargas": self.recargas,
+            "intervalo_s": self.intervalo,
+            "ultimo_erro": self.ultimo_erro,
+        }
+
+
+def _laco(ref, parar: threading.Event, intervalo: float):
+    while not parar.wait(intervalo):
+        atualizador = ref()
+        if atualizador is None:
+            return
+        try:
+            atualizador.verificar(aguardar_estavel=True)
+            atualizador.ultimo_erro = None
+        except Exception as e:  # CSV sendo copiado, inválido...: mantém a versão atual
+            atualizador.ultimo_erro = f"{type(e).__name__}: {e}"
+            log.exception("falha ao verificar %s", atualizador.csv)
+        del atualizador
@@ -0,0 +1,221 @@
+"""Cache LRU compartilhado entre sessões, limitado por memória.
+
+Um único `LRUCache` por processo guarda os resultados do app (KPIs,
+máscaras de filtro, mapas renderizados, SVG, detalhes do modal) sob um teto
+global de bytes, com TTL opcional e cotas por espaço — o primeiro elemento
+da chave (``("mapa", ...)``, ``("kpis", ...)``...). Os valores são
+devolvidos sem cópia: arrays numpy ficam somente leitura e os DataFrames
+contam com o copy-on-write do pandas (sempre ligado a partir do pandas 3,
+fixado em ``requirements.txt``), então nenhuma sessão altera o que as
+outras veem.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def tamanho_aproximado(valor, _vistos: set | None = None) -> int:
+    """Tamanho (em bytes) de um valor cacheado, somando o conteúdo de dicts,
+    listas, tuplas e atributos de objetos (specs Vega, dataclasses...).
+
+    Objetos compartilhados contam uma vez só.
+    """
+    if isinstance(valor, (str, bytes)):
+        return len(valor)
+    if hasattr(valor, "memory_usage"):
+        # DataFrame/Series/Index: __sizeof__ é o memory_usage(deep=True)
+        return sys.getsizeof(valor)
+    nbytes = getattr(valor, "nbytes", None)
+    if isinstance(nbytes, (int, np.integer)):
+        return int(nbytes)
+    if _vistos is None:
+        _vistos = set()
+    if id(valor) in _vistos:
+        return 0
+    _vistos.add(id(valor))
+    total = sys.getsizeof(valor)
+    if isinstance(valor, dict):
+        total += sum(tamanho_aproximado(k, _vistos) + tamanho_aproximado(v, _vistos) for k, v in valor.items())
+    elif isinstance(valor, (list, tuple, set, frozenset)):
+        total += sum(tamanho_aproximado(v, _vistos) for v in valor)
+    elif hasattr(valor, "__dict__"):
+        total += tamanho_aproximado(vars(valor), _vistos)
+    return total
+
+
+def somente_leitura(valor):
+    """Marca arrays numpy como somente leitura (também dentro de tuplas)."""
+    if isinstance(valor, np.ndarray):
+        valor.flags.writeable = False
+    elif isinstance(valor, tuple):
+        for v in valor:
+            somente_leitura(v)
+    return valor
+
+
+def espaco_da_chave(chave):
+    return chave[0] if isinstance(chave, tuple) and chave else None
+
+
+class LRUCache:
+    """Cache LRU thread-safe com teto de bytes, TTL, cotas e contadores.
+
+    Pensado para ser criado uma vez por processo (via ``st.cache_resource``)
+    e compartilhado por todas as sessões.
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int | None = None, sizeof=tamanho_aproximado,
+                 ao_remover=None, ttl: float | None = None, cotas: dict | None = None):
+        self.max_bytes = int(max_bytes)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cotas = dict(cotas or {})  # espaço -> teto de bytes daquele espaço
+        self._sizeof = sizeof
+        self._ao_remover = ao_remover  # callback(chave, valor) ao sair do cache
+        self._dados = OrderedDict()  # chave -> (valor, nbytes, expira_em)
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._construindo = {}       # chave -> Lock (evita construir duas vezes)
+        self._espacos = {}           # espaço -> [entradas, bytes, hits, misses]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._dados)
+
+    def __contains__(self, chave):
+        with self._lock:
+            return chave in self._dados
+
+    def _espaco(self, chave) -> list:
+        return self._espacos.setdefault(espaco_da_chave(chave), [0, 0, 0, 0])
+
+    def get(self, chave, default=None):
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is not None and item[2] is not None and item[2] <= time.monotonic():
+                self._retirar(chave)
+                self.expirations += 1
+                item = None
+            if item is None:
+                self.misses += 1
+                self._espaco(chave)[3] += 1
+                return default
+            self._dados.move_to_end(chave)
+            self.hits += 1
+            self._espaco(chave)[2] += 1
+            return item[0]
+
+    def put(self, chave, valor, nbytes: int | None = None):
+        nbytes = self._sizeof(valor) if nbytes is None else int(nbytes)
+        somente_leitura(valor)
+        espaco = espaco_da_chave(chave)
+        with self._lock:
+            if chave in self._dados:
+                antigo = self._retirar(chave, avisar=False)
+                if antigo is not valor:
+                    self._remover(chave, antigo)
+            if nbytes > self.max_bytes or nbytes > self.cotas.get(espaco, nbytes):
+                # maior que o cache (ou que a cota do espaço): não armazena
+                return valor
+            expira = time.monotonic() + self.ttl if self.ttl else None
+            self._dados[chave] = (valor, nbytes, expira)
+            self._bytes += nbytes
+            conta = self._espaco(chave)
+            conta[0] += 1
+            conta[1] += nbytes
+            self._evict(espaco)
+        return valor
+
+    def get_or_build(self, chave, builder):
+        """Retorna o valor cacheado ou constrói (uma única vez por chave)."""
+        valor = self.get(chave, _AUSENTE)
+        if valor is not _AUSENTE:
+            return valor
+        with self._lock:
+            trava = self._construindo.setdefault(chave, threading.Lock())
+        with trava:
+            with self._lock:
+                item = self._dados.get(chave)
+            if item is not None:
+                return item[0]
+            try:
+                return self.put(chave, builder())
+            finally:
+                with self._lock:
+                    self._construindo.pop(chave, None)
+
+    def clear(self):
+        with self._lock:
+            for chave in list(self._dados):
+                self._retirar(chave)
+
+    def expirar(self) -> int:
+        """Remove já as entradas vencidas (sem esperar um acesso); retorna quantas."""
+        if not self.ttl:
+            return 0
+        agora = time.monotonic()
+        with self._lock:
+            vencidas = [k for k, (_, _, exp) in self._dados.items() if exp is not None and exp <= agora]
+            for chave in vencidas:
+                self._retirar(chave)
+            self.expirations += len(vencidas)
+        return len(vencidas)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entradas": len(self._dados),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": (self.hits / total) if total else None,
+                "por_espaco": {
+                    str(esp): {"entradas": e, "bytes": b, "hits": h, "misses": m,
+                               "cota": self.cotas.get(esp)}
+                    for esp, (e, b, h, m) in self._espacos.items()
+                },
+            }
+
+    def _retirar(self, chave, avisar: bool = True):
+        valor, nbytes, _ = self._dados.pop(chave)
+        self._bytes -= nbytes
+        conta = self._espaco(chave)
+        conta[0] -= 1
+        conta[1] -= nbytes
+        if avisar:
+            self._remover(chave, valor)
+        return valor
+
+    def _evict(self, espaco=None):
+        cota = self.cotas.get(espaco)
+        if cota is not None:
+            # a cota do espaço é respeitada removendo os mais antigos dele
+            conta = self._espacos.get(espaco)
+            for chave in [k for k in self._dados if espaco_da_chave(k) == espaco]:
+                if conta[1] <= cota:
+                    break
+                self._retirar(chave)
+                self.evictions += 1
+        while self._dados and (
+            self._bytes > self.max_bytes
+            or (self.max_entries is not None and len(self._dados) > self.max_entries)
+        ):
+            self._retirar(next(iter(self._dados)))
+            self.evictions += 1
+
+    def _remover(self, chave, valor):
+        if self._ao_remover is not None:
+            self._ao_remover(chave, valor)
+
+
+_AUSENTE = object()
@@ -0,0 +1,174 @@
+"""Classificação de cores das camadas do mapa, vetorizada.
+
+Todos os valores de uma camada são classificados numa única chamada
+(`np.searchsorted` sobre as quebras), e o resultado é um array de cores por
+feição. Esquemas suportados:
+
+- "fixo": quebras fixas no estilo QGIS, como sempre usadas no app;
+- "quantil", "intervalos_iguais" e "jenks" (quebras naturais de Fisher-Jenks).
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+ESQUEMAS = ("fixo", "quantil", "jenks", "intervalos_iguais")
+
+COR_AUSENTE = "#e0e0e0"
+COR_COM = "#a9c772"
+COR_SEM = "#f7e350"
+
+# camada -> (paleta branca, quebras fixas sem o máximo, piso do máximo, 0 vira cinza?)
+CONFIG_CAMADAS = {
+    "Cursos por Município": ("Greens_05", [1.0, 2.0, 5.0, 10.0, 20.0], 20.0, True),
+    "Concludentes por Município": ("Greens_06", [0.0, 100.0, 150.0, 200.0, 500.0, 1000.0], 1000.0, False),
+    "Turmas por Município": ("Greens_05", [1.0, 5.0, 10.0, 20.0], 20.0, True),
+}
+
+
+@dataclass(frozen=True)
+class Classificacao:
+    camada: str
+    esquema: str
+    quebras: tuple          # vazio para a camada binária
+    cores: tuple            # uma cor (#RRGGBBAA) por classe
+    cinza_abaixo_de_1: bool = False
+
+    @property
+    def binaria(self) -> bool:
+        return not self.quebras
+
+    def cores_de(self, valores) -> np.ndarray:
+        """Cor de preenchimento de cada valor (mesma regra do StepColormap do branca)."""
+        v = np.asarray(valores, dtype=float)
+        if self.binaria:
+            return np.where(v >= 1.0, COR_COM, COR_SEM)
+        idx = np.searchsorted(np.asarray(self.quebras), v, side="right") - 1
+        idx = np.clip(idx, 0, len(self.cores) - 1)
+        cores = np.asarray(self.cores, dtype=object)[idx]
+        if self.cinza_abaixo_de_1:
+            cores = np.where(v < 1.0, COR_AUSENTE, cores)
+        return cores
+
+    def legenda(self) -> list:
+        """Itens (cor, rótulo) da legenda, na ordem das classes."""
+        if self.binaria:
+            return [(COR_COM, "Com qualificação"), (COR_SEM, "Sem qualificação")]
+        itens = [(COR_AUSENTE, "Sem oferta")] if self.cinza_abaixo_de_1 else []
+        q = self.quebras
+        for i, cor in enumerate(self.cores):
+            itens.append((cor, f"{q[i]:,.0f} – {q[i + 1]:,.0f}".replace(",", ".")))
+        return itens
+
+    def colormap(self):
+        """StepColormap do branca para a legenda (None na camada binária)."""
+        if self.binaria:
+            return None
+        from branca.colormap import StepColormap
+
+        rgba = [tuple(int(c[i:i + 2], 16) / 255 for i in (1, 3, 5, 7)) for c in self.cores]
+        cm = StepColormap(rgba, index=list(self.quebras),
+                          vmin=self.quebras[0], vmax=self.quebras[-1])
+        cm.caption = self.camada
+        return cm
+
+
+def _hex(cor) -> str:
+    return "#%02x%02x%02x%02x" % tuple(int(u * 255.9999) for u in cor)
+
+
+def quebras_jenks(valores, n_classes: int) -> list:
+    """Quebras naturais (Fisher-Jenks) por programação dinâmica vetorizada."""
+    v = np.sort(np.asarray(valores, dtype=float))
+    if len(v) > 2000:
+        # amostra por quantis: limita n (a programação dinâmica é O(k·n²) no pior caso)
+        v = np.quantile(v, np.linspace(0, 1, 2000))
+    n = len(v)
+    k = min(n_classes, len(np.unique(v)))
+    if k < 2:
+        return [float(v[0]), float(v[-1])]
+
+    s1 = np.concatenate([[0.0], np.cumsum(v)])
+    s2 = np.concatenate([[0.0], np.cumsum(v * v)])
+
+    dp = np.full((k, n), np.inf)
+    inicio = np.zeros((k, n), dtype=np.int64)
+    dp[0] = s2[1:] - s1[1:] ** 2 / np.arange(1, n + 1)
+    bloco = 64   # colunas j por vez, contra todas as linhas i candidatas
+    for c in range(1, k):
+        # dp[c-1][i-1] + custo(i, j) = (dp[c-1][i-1] - s2[i]) + s2[j+1] - (s1[j+1] - s1[i])² / (j+1-i)
+        base = dp[c - 1][c - 1:n - 1] - s2[c:n]
+        # o início ótimo da última classe não diminui com j (o custo é monótono), então cada
+        # bloco só olha de onde o anterior terminou até j: na prática bem menos que n² contas
+        lo = c
+        for j0 in range(c, n, bloco):
+            j1 = min(j0 + bloco, n)
+            i = np.arange(lo, j1)[:, None]
+            j = np.arange(j0, j1)[None, :]
+            cnt = (j + 1 - i).astype(float)
+            valido = cnt > 0
+            soma = s1[j + 1] - s1[i]
+            total = soma * soma
+            np.divide(total, cnt, out=total, where=valido)
+            np.subtract(base[lo - c:j1 - c, None] + s2[j + 1], total, out=total)
+            total[~valido] = np.inf
+            m = np.argmin(total, axis=0)
+            dp[c, j0:j1] = total[m, np.arange(j1 - j0)]
+            inicio[c, j0:j1] = m + lo
+            lo = inicio[c, j1 - 1]
+
+    quebras = [float(v[-1])]
+    j = n - 1
+    for c in range(k - 1, 0, -1):
+        i = inicio[c, j]
+        quebras.append(float(v[i]))
+        j = i - 1
+    quebras.append(float(v[0]))
+    return sorted(set(quebras))
+
+
+def _quebras(esquema: str, valores: np.ndarray, n_classes: int) -> list:
+    if len(valores) == 0:
+        return [0.0, 1.0]
+    if esquema == "quantil":
+        q = np.quantile(valores, np.linspace(0, 1, n_classes + 1))
+    elif esquema == "intervalos_iguais":
+        q = np.linspace(valores.min(), valores.max(), n_classes + 1)
+    elif esquema == "jenks":
+        q = quebras_jenks(valores, n_classes)
+    else:
+        raise ValueError(f"esquema desconhecido: {esquema}")
+    q = sorted(set(float(x) for x in q))
+    return q if len(q) > 1 else [q[0], q[0] + 1.0]
+
+
+def classificar(camada: str, valores, esquema: str = "fixo", n_classes: int = 5) -> Classificacao:
+    """Classificação da camada para o conjunto de valores (todas as feições)."""
+    if camada not in CONFIG_CAMADAS:
+        return Classificacao(camada=camada, esquema=esquema, quebras=(), cores=())
+
+    from branca.colormap import linear
+
+    paleta, fixas, piso_max, cinza = CONFIG_CAMADAS[camada]
+    v = np.asarray(valores, dtype=float)
+    vmax = float(v.max()) if len(v) else 0.0
+
+    if esquema == "fixo":
+        quebras = fixas + [max(piso_max, vmax)]
+    else:
+        # classes só entre os municípios com oferta (os demais ficam cinza/base)
+        validos = v[v >= 1.0] if cinza else v[v > 0]
+        quebras = _quebras(esquema, validos, n_classes)
+
+    base = getattr(linear, paleta)
+    if len(quebras) == 2:
+        # uma classe só (ex.: todos os valores iguais): o to_step divide por zero
+        cores = [base.colors[len(base.colors) // 2]]
+    else:
+        cores = base.to_step(index=quebras).colors
+    return Classificacao(
+        camada=camada,
+        esquema=esquema,
+        quebras=tuple(float(q) for q in quebras),
+        cores=tuple(_hex(c) for c in cores),
+        cinza_abaixo_de_1=cinza,
+    )
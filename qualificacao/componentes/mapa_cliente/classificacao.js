@@ -0,0 +1,162 @@
+// Classificação de cores no navegador: porte de qualificacao/classificacao.py
+// (mesmas quebras e a mesma amostragem de paleta do to_step do branca).
+(function (raiz) {
+  "use strict";
+
+  function linspace(a, b, n) {
+    // como np.linspace: início + i * passo, último ponto exato
+    var passo = (b - a) / (n - 1), out = [];
+    for (var i = 0; i < n; i++) out.push(i === n - 1 ? b : a + i * passo);
+    return out;
+  }
+
+  function quantil(ordenados, q) {
+    // np.quantile (método linear) sobre valores já ordenados
+    var n = ordenados.length, pos = q * (n - 1), lo = Math.floor(pos);
+    var hi = Math.min(lo + 1, n - 1), t = pos - lo;
+    var a = ordenados[lo], d = ordenados[hi] - a;
+    return t >= 0.5 ? ordenados[hi] - d * (1 - t) : a + d * t;
+  }
+
+  function unicos(valores) {
+    var vistos = new Set(valores);
+    return Array.from(vistos).sort(function (a, b) { return a - b; });
+  }
+
+  function quebrasJenks(valores, nClasses) {
+    var v = valores.slice().sort(function (a, b) { return a - b; });
+    if (v.length > 2000) {
+      v = linspace(0, 1, 2000).map(function (q) { return quantil(v, q); });
+    }
+    var n = v.length, k = Math.min(nClasses, unicos(v).length);
+    if (k < 2) return [v[0], v[n - 1]];
+
+    var s1 = new Float64Array(n + 1), s2 = new Float64Array(n + 1);
+    for (var i = 0; i < n; i++) {
+      s1[i + 1] = s1[i] + v[i];
+      s2[i + 1] = s2[i] + v[i] * v[i];
+    }
+    var custo = function (i, j) {
+      var soma = s1[j + 1] - s1[i];
+      return (s2[j + 1] - s2[i]) - soma * soma / (j + 1 - i);
+    };
+    var dp = [], inicio = [];
+    for (var c = 0; c < k; c++) {
+      dp.push(new Float64Array(n).fill(Infinity));
+      inicio.push(new Int32Array(n));
+    }
+    for (var j = 0; j < n; j++) dp[0][j] = s2[j + 1] - s1[j + 1] * s1[j + 1] / (j + 1);
+    for (c = 1; c < k; c++) {
+      for (j = c; j < n; j++) {
+        var melhor = Infinity, m = c;
+        for (i = c; i <= j; i++) {
+          var total = dp[c - 1][i - 1] + custo(i, j);
+          if (total < melhor) { melhor = total; m = i; }
+        }
+        dp[c][j] = melhor;
+        inicio[c][j] = m;
+      }
+    }
+    var quebras = [v[n - 1]];
+    j = n - 1;
+    for (c = k - 1; c > 0; c--) {
+      i = inicio[c][j];
+      quebras.push(v[i]);
+      j = i - 1;
+    }
+    quebras.push(v[0]);
+    return unicos(quebras);
+  }
+
+  function quebrasEsquema(esquema, valores, nClasses) {
+    if (!valores.length) return [0, 1];
+    var q;
+    if (esquema === "quantil") {
+      var ord = valores.slice().sort(function (a, b) { return a - b; });
+      q = linspace(0, 1, nClasses + 1).map(function (p) { return quantil(ord, p); });
+    } else if (esquema === "intervalos_iguais") {
+      q = linspace(Math.min.apply(null, valores), Math.max.apply(null, valores), nClasses + 1);
+    } else if (esquema === "jenks") {
+      q = quebrasJenks(valores, nClasses);
+    } else {
+      throw new Error("esquema desconhecido: " + esquema);
+    }
+    q = unicos(q);
+    return q.length > 1 ? q : [q[0], q[0] + 1];
+  }
+
+  function corNaPaleta(paleta, indice, x) {
+    // LinearColormap.rgba_floats_tuple
+    var n = indice.length;
+    if (x <= indice[0]) return paleta[0];
+    if (x >= indice[n - 1]) return paleta[n - 1];
+    var i = 0;
+    while (indice[i] < x) i++;
+    var p = indice[i - 1] < indice[i] ? (x - indice[i - 1]) / (indice[i] - indice[i - 1]) : 1;
+    return paleta[i].map(function (c, j) { return (1 - p) * paleta[i - 1][j] + p * c; });
+  }
+
+  function hex(rgba) {
+    return "#" + rgba.map(function (u) {
+      return ("0" + Math.floor(u * 255.9999).toString(16)).slice(-2);
+    }).join("");
+  }
+
+  function coresDasClasses(cfg, quebras) {
+    var paleta = cfg.paleta, base = cfg.indice;
+    if (quebras.length === 2) return [hex(paleta[Math.floor(paleta.length / 2)])];
+    // to_step: paleta reescalada para [min, max] das quebras e amostrada por classe
+    var vmin = Math.min.apply(null, quebras), vmax = Math.max.apply(null, quebras);
+    var b0 = base[0], b1 = base[base.length - 1];
+    var indice = base.map(function (x) { return vmin + (vmax - vmin) * (x - b0) / (b1 - b0); });
+    var n = quebras.length - 1, cores = [];
+    for (var i = 0; i < n; i++) {
+      var x = quebras[i] * (1 - i / (n - 1)) + quebras[i + 1] * i / (n - 1);
+      cores.push(hex(corNaPaleta(paleta, indice, x)));
+    }
+    return cores;
+  }
+
+  function classificar(config, camada, valores, esquema, nClasses) {
+    var cfg = config.camadas[camada] || {};
+    if (!cfg.paleta) return {camada: camada, quebras: [], cores: [], cinza: false};
+    nClasses = nClasses || 5;
+    var quebras;
+    if (esquema === "fixo") {
+      var vmax = valores.length ? Math.max.apply(null, valores) : 0;
+      quebras = cfg.fixas.concat([Math.max(cfg.piso, vmax)]);
+    } else {
+      // classes só entre os municípios com oferta (os demais ficam cinza/base)
+      var validos = valores.filter(function (x) { return cfg.cinza ? x >= 1 : x > 0; });
+      quebras = quebrasEsquema(esquema, validos, nClasses);
+    }
+    return {camada: camada, quebras: quebras, cores: coresDasClasses(cfg, quebras), cinza: cfg.cinza};
+  }
+
+  function corDe(classes, cores, v) {
+    if (!classes.quebras.length) return v >= 1 ? cores.com : cores.sem;
+    if (classes.cinza && v < 1) return cores.ausente;
+    var q = classes.quebras, i = 0;
+    while (i < q.length && q[i] <= v) i++;
+    return classes.cores[Math.min(Math.max(i - 1, 0), classes.cores.length - 1)];
+  }
+
+  function formatar(x) {
+    return Math.round(x).toString().replace(/\B(?=(\d{3})+(?!\d))/g, ".");
+  }
+
+  function legenda(classes, cores) {
+    if (!classes.quebras.length) return [[cores.com, "Com qualificação"], [cores.sem, "Sem qualificação"]];
+    var itens = classes.cinza ? [[cores.ausente, "Sem oferta"]] : [];
+    var q = classes.quebras;
+    classes.cores.forEach(function (cor, i) {
+      itens.push([cor, formatar(q[i]) + " – " + formatar(q[i + 1])]);
+    });
+    return itens;
+  }
+
+  var api = {classificar: classificar, corDe: corDe, legenda: legenda, formatar: formatar,
+             quebrasJenks: quebrasJenks};
+  if (typeof module !== "undefined" && module.exports) module.exports = api;
+  else raiz.Classificacao = api;
+})(this);
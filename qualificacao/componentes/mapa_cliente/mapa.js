@@ -0,0 +1,220 @@
+// Mapa do componente mapa_cliente: carrega geometria e tabela uma vez e faz
+// filtro de cursos, troca de camada e recoloração sem voltar ao servidor.
+(function () {
+  "use strict";
+
+  // --- protocolo dos componentes do Streamlit (sem a biblioteca JS) ---
+  function enviar(tipo, dados) {
+    window.parent.postMessage(Object.assign({isStreamlitMessage: true, type: tipo}, dados), "*");
+  }
+
+  var arquivos = {};     // url -> Promise do JSON (uma vez por arquivo)
+  function baixar(url) {
+    if (!arquivos[url]) {
+      arquivos[url] = fetch(url).then(function (r) {
+        if (!r.ok) throw new Error(r.status + " " + url);
+        return r.json();
+      }).catch(function (e) {
+        delete arquivos[url];   // tenta de novo no próximo render
+        throw e;
+      });
+    }
+    return arquivos[url];
+  }
+
+  var estado = {
+    args: null,
+    geometria: null,   // url carregada
+    tabela: null,
+    dados: null,       // tabela Município × CURSO
+    selecionados: new Set(),   // nomes dos cursos
+    camada: null,
+    valores: null,
+  };
+  var mapa = null, camadaGeo = null, legenda = null;
+  var el = function (id) { return document.getElementById(id); };
+
+  function semAcento(s) {
+    return s.normalize("NFD").replace(/[\u0300-\u036f]/g, "").toLowerCase();
+  }
+
+  function avisar(texto) {
+    el("aviso").hidden = !texto;
+    el("aviso").textContent = texto || "";
+  }
+
+  // --- valores por município: soma das linhas dos cursos selecionados ---
+  function calcular() {
+    var t = estado.dados, cfg = estado.args.config.camadas[estado.camada] || {};
+    var n = camadaGeo ? camadaGeo.getLayers().length : 0;
+    var valores = new Float64Array(n);
+    var todos = estado.selecionados.size === 0;
+    var marcados = new Uint8Array(t.cursos.length);
+    t.cursos.forEach(function (c, i) { marcados[i] = estado.selecionados.has(c) ? 1 : 0; });
+    var coluna = cfg.coluna ? t[cfg.coluna] : null;
+    for (var r = 0; r < t.m.length; r++) {
+      if (!todos && !marcados[t.c[r]]) continue;
+      if (coluna) valores[t.m[r]] += coluna[r];
+      else valores[t.m[r]] = 1;
+    }
+    return Array.from(valores);
+  }
+
+  function recolorir() {
+    if (!camadaGeo || !estado.dados) return;
+    var args = estado.args, cores = args.config.cores;
+    var valores = calcular();
+    var classes = Classificacao.classificar(args.config, estado.camada, valores, args.esquema);
+    estado.valores = valores;
+    camadaGeo.setStyle(function (f) {
+      return {fillColor: Classificacao.corDe(classes, cores, valores[f.id]),
+              color: "#333", weight: 0.7, fillOpacity: 0.75};
+    });
+    var itens = Classificacao.legenda(classes, cores);
+    legenda.getContainer().innerHTML = "<b>" + estado.camada + "</b><br>" + itens.map(function (it) {
+      return "<i style='background:" + it[0] + "'></i>" + it[1];
+    }).join("<br>");
+
+    var atendidos = valores.filter(function (v) { return v > 0; }).length;
+    var n = estado.selecionados.size;
+    el("contagem").textContent = (n ? n + " curso(s)" : "Todos os cursos") + " • " + atendidos + " municípios";
+  }
+
+  // --- painel: camadas e lista de cursos ---
+  function montarCamadas() {
+    var sel = el("camada");
+    sel.innerHTML = "";
+    Object.keys(estado.args.config.camadas).forEach(function (c) {
+      var op = document.createElement("option");
+      op.value = op.textContent = c;
+      sel.appendChild(op);
+    });
+    sel.value = estado.camada;
+    sel.onchange = function () { estado.camada = sel.value; recolorir(); };
+  }
+
+  function montarCursos() {
+    var t = estado.dados, totais = new Float64Array(t.cursos.length);
+    for (var r = 0; r < t.c.length; r++) totais[t.c[r]] += t.conc[r];
+    var lista = el("lista");
+    lista.innerHTML = "";
+    t.cursos.forEach(function (curso, i) {
+      var rotulo = document.createElement("label");
+      var caixa = document.createElement("input");
+      caixa.type = "checkbox";
+      caixa.value = curso;
+      caixa.checked = estado.selecionados.has(curso);
+      caixa.onchange = function () {
+        if (caixa.checked) estado.selecionados.add(curso);
+        else estado.selecionados.delete(curso);
+        recolorir();
+      };
+      var nome = document.createElement("span");
+      nome.textContent = curso;
+      var total = document.createElement("small");
+      total.textContent = Classificacao.formatar(totais[i]);
+      total.title = "concludentes";
+      rotulo.append(caixa, nome, total);
+      rotulo.dataset.busca = semAcento(curso);
+      lista.appendChild(rotulo);
+    });
+    // seleção que não existe mais na tabela atual é descartada
+    estado.selecionados = new Set(t.cursos.filter(function (c) { return estado.selecionados.has(c); }));
+    filtrarLista();
+  }
+
+  function filtrarLista() {
+    var termo = semAcento(el("busca").value.trim());
+    Array.prototype.forEach.call(el("lista").children, function (rotulo) {
+      rotulo.hidden = termo && rotulo.dataset.busca.indexOf(termo) < 0;
+    });
+  }
+
+  // --- mapa (Leaflet) ---
+  function montarMapa(geojson) {
+    var vista = estado.args.mapa || {};
+    if (!mapa) {
+      mapa = L.map("mapa").setView(vista.center || [-5.3159, -39.2129], vista.zoom || 7);
+      L.tileLayer("https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}{r}.png", {
+        attribution: "&copy; OpenStreetMap &copy; CARTO", subdomains: "abcd", maxZoom: 20,
+      }).addTo(mapa);
+      legenda = L.control({position: "bottomright"});
+      legenda.onAdd = function () { return L.DomUtil.create("div", "legenda"); };
+      legenda.addTo(mapa);
+    }
+    if (camadaGeo) mapa.removeLayer(camadaGeo);
+    camadaGeo = L.geoJSON(geojson, {
+      onEachFeature: function (f, camada) {
+        camada.bindTooltip(function () {
+          var v = estado.valores ? estado.valores[f.id] : 0;
+          var cfg = estado.args.config.camadas[estado.camada] || {};
+          var texto = cfg.coluna ? Classificacao.formatar(v) : (v >= 1 ? "Sim" : "Não");
+          return "<b>" + f.properties.nome + "</b><br>" + estado.camada + ": " + texto;
+        }, {sticky: true});
+        camada.on("click", function () { clicar(f.id); });
+        camada.on("mouseover", function () { camada.setStyle({weight: 2, color: "#000", fillOpacity: 0.85}); });
+        camada.on("mouseout", function () { camada.setStyle({weight: 0.7, color: "#333", fillOpacity: 0.75}); });
+      },
+    }).addTo(mapa);
+  }
+
+  // --- clique: único momento em que o servidor é chamado (modal) ---
+  function clicar(id) {
+    enviar("streamlit:setComponentValue", {
+      value: {municipio: id, cursos: Array.from(estado.selecionados).sort(),
+              camada: estado.camada, clique: Date.now()},
+      dataType: "json",
+    });
+  }
+
+  function carregar(args) {
+    var url = function (nome) { return new URL("../../" + args.base + nome, window.location.href).href; };
+    var novaGeometria = args.geometria !== estado.geometria, novaTabela = args.tabela !== estado.tabela;
+    estado.geometria = args.geometria;
+    estado.tabela = args.tabela;
+    return Promise.all([baixar(url(args.geometria)), baixar(url(args.tabela))]).then(function (r) {
+      if (args.geometria !== estado.geometria || args.tabela !== estado.tabela) return;  // já trocou de novo
+      avisar(null);
+      if (novaGeometria) montarMapa(r[0]);
+      if (novaTabela) {
+        estado.dados = r[1];
+        montarCursos();
+      }
+      recolorir();
+    }).catch(function (e) {
+      estado.geometria = estado.tabela = null;
+      avisar("Não foi possível carregar os dados do mapa (" + e.message + ").");
+    });
+  }
+
+  function render(args) {
+    var anterior = estado.args;
+    estado.args = args;
+    if (!anterior) {
+      el("raiz").style.height = args.altura + "px";
+      enviar("streamlit:setFrameHeight", {height: args.altura + 40});
+      el("busca").oninput = filtrarLista;
+      el("limpar").onclick = function () {
+        estado.selecionados.clear();
+        montarCursos();
+        recolorir();
+      };
+    }
+    // camada e cursos vindos do servidor (barra lateral/filtro salvo) só valem quando mudam
+    if (!anterior || anterior.camada !== args.camada) estado.camada = args.camada;
+    if (!anterior || JSON.stringify(anterior.cursos) !== JSON.stringify(args.cursos)) {
+      estado.selecionados = new Set(args.cursos);
+      if (estado.dados) montarCursos();
+    }
+    if (!anterior || JSON.stringify(anterior.config) !== JSON.stringify(args.config)) montarCamadas();
+    el("camada").value = estado.camada;
+
+    if (args.geometria !== estado.geometria || args.tabela !== estado.tabela) carregar(args);
+    else recolorir();
+  }
+
+  window.addEventListener("message", function (evento) {
+    if (evento.data && evento.data.type === "streamlit:render") render(evento.data.args);
+  });
+  enviar("streamlit:componentReady", {apiVersion: 1});
+})();
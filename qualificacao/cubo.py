@@ -0,0 +1,97 @@
+"""Cubo agregado Município × CURSO × Nº LOTE.
+
+A base bruta é agrupada uma única vez por versão do dataset; mapa, KPIs,
+rankings e o modal do município leem apenas deste cubo compacto.
+"""
+import numpy as np
+import pandas as pd
+
+CHAVES = ["Município", "CURSO", "Nº LOTE"]
+METRICAS = ["qtd_turmas", "qtd_inscritos", "qtd_vagas", "qtd_concludentes"]
+
+CAMADAS = [
+    "Municípios com Qualificação",
+    "Cursos por Município",
+    "Concludentes por Município",
+    "Turmas por Município",
+]
+
+
+def build_cubo(df: pd.DataFrame) -> pd.DataFrame:
+    """Agrupa a base por (Município, CURSO, Nº LOTE) somando as métricas."""
+    df = df.copy()
+    for col in CHAVES:
+        if col not in df.columns:
+            df[col] = ""
+    for col in METRICAS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
+        else:
+            df[col] = 0
+
+    cubo = (df.groupby(CHAVES, as_index=False, sort=True, dropna=False, observed=True)
+              .agg(**{c: (c, "sum") for c in METRICAS},
+                   n_registros=("CURSO", "size")))
+    return cubo
+
+
+def codigos(serie: pd.Series):
+    """(códigos inteiros, categorias) de uma coluna-chave; -1 = ausente."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy(), serie.cat.categories
+    cod, categorias = pd.factorize(serie, sort=True)
+    return cod, pd.Index(categorias)
+
+
+# camada -> métrica somada (None = presença: 1 para quem tem alguma linha)
+COLUNA_CAMADA = {
+    "Municípios com Qualificação": None,
+    "Cursos por Município": "n_registros",
+    "Concludentes por Município": "qtd_concludentes",
+    "Turmas por Município": "qtd_turmas",
+}
+
+
+def _somar_camada(cubo: pd.DataFrame, camada: str, cod: np.ndarray, n: int, mascara=None):
+    """(valores, presentes) por código 0..n-1; códigos negativos são ignorados."""
+    peso = np.ones(len(cubo)) if mascara is None else np.asarray(mascara, dtype=float)
+    validos = cod >= 0
+    cod, peso = cod[validos], peso[validos]
+    presentes = np.bincount(cod, weights=peso, minlength=n) > 0
+    if COLUNA_CAMADA[camada] is None:
+        return presentes.astype(float), presentes
+    metrica = cubo[COLUNA_CAMADA[camada]].to_numpy(dtype=float)[validos]
+    return np.bincount(cod, weights=metrica * peso, minlength=n), presentes
+
+
+def valores_camada(cubo: pd.DataFrame, camada: str, mascara: np.ndarray | None = None) -> pd.Series:
+    """Valor por município (índice = Município) para a camada do mapa.
+
+    `mascara` (bool por linha do cubo) restringe as linhas sem copiá-las.
+    """
+    if cubo.empty or camada not in COLUNA_CAMADA:
+        return pd.Series(dtype=float)
+    cod, municipios = codigos(cubo["Município"])
+    valores, presentes = _somar_camada(cubo, camada, cod, len(municipios), mascara)
+    return pd.Series(valores[presentes], index=pd.Index(municipios.astype(str))[presentes])
+
+
+def valores_municipios(cubo: pd.DataFrame, camada: str, n_municipios: int,
+                       mascara: np.ndarray | None = None) -> np.ndarray:
+    """Valor da camada por id da tabela de municípios (alinhado às feições); ausentes = 0.
+
+    Usa a coluna `id_municipio` gravada na carga: a junção com a geometria é
+    só indexação, sem nomes.
+    """
+    if cubo.empty or camada not in COLUNA_CAMADA or "id_municipio" not in cubo:
+        return np.zeros(n_municipios)
+    valores, _ = _somar_camada(cubo, camada, cubo["id_municipio"].to_numpy(), n_municipios, mascara)
+    return valores
+
+
+def agregado_por_curso(fatia: pd.DataFrame) -> pd.DataFrame:
+    """Concludentes e turmas por curso, ordenado por concludentes."""
+    return (fatia.groupby("CURSO", as_index=False, observed=True)
+                 .agg(concludentes=("qtd_concludentes", "sum"),
+                      turmas=("qtd_turmas", "sum"))
+                 .sort_values("concludentes", ascending=False))
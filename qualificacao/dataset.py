@@ -0,0 +1,167 @@
+"""Handle versionado do dataset.
+
+Um `Dataset` reúne a base normalizada e o cubo agregado de uma versão dos
+dados, identificada pela impressão digital (sha256) do CSV de origem. É
+criado uma vez por versão e compartilhado, somente leitura, entre as
+sessões; as funções cacheadas recebem o handle e o Streamlit faz o hash
+apenas de `versao` — custo constante, qualquer que seja o volume de dados.
+
+Com a tabela de municípios, o cubo ganha `id_municipio` (id da feição) na
+carga e os nomes da base sem correspondência ficam em `nao_encontrados`.
+
+No modo série (`carregar_periodos`), o handle traz a `SeriePeriodos` e cada
+intervalo de períodos é outro handle (`recorte`), com versão própria: os
+caches por versão valem para ele sem mudança. Nesse modo não há base
+concatenada (`df` é None): tudo sai dos cubos das partições.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from qualificacao.cubo import build_cubo
+from qualificacao.ingestao import CSV_PADRAO, carregar_dataset, garantir_parquet
+from qualificacao.municipios import TabelaMunicipios
+from qualificacao.periodos import PERIODOS_PADRAO, SeriePeriodos, listar_periodos
+
+log = logging.getLogger(__name__)
+
+_versoes = {}  # csv -> ((mtime_ns, tamanho), versão)
+# memos do modo série; o Atualizador carrega numa thread, as sessões na delas
+_periodos = {}  # csv da partição -> (versão, cubo)
+_serie = None   # ((rótulo, versão) de cada partição, municípios, série)
+_lock_periodos = threading.RLock()
+
+
+def versao_dataset(csv: str = CSV_PADRAO) -> str:
+    """Versão atual dos dados (refaz o Parquet antes, se o CSV mudou).
+
+    Enquanto o CSV não muda (mesmo mtime/tamanho), custa só um `os.stat`.
+    """
+    st = os.stat(csv)
+    assinatura = (st.st_mtime_ns, st.st_size)
+    memo = _versoes.get(csv)
+    if memo and memo[0] == assinatura:
+        return memo[1]
+    _, origem = garantir_parquet(csv)
+    versao = (origem.get("sha256") or f"{origem.get('mtime_ns')}-{origem.get('tamanho')}")[:16]
+    _versoes[csv] = (assinatura, versao)
+    return versao
+
+
+def versao_periodos(diretorio: str = PERIODOS_PADRAO) -> str:
+    """Versão da série: muda quando um período entra, sai ou muda (só ele é refeito)."""
+    h = hashlib.sha256()
+    for rotulo, caminho in listar_periodos(diretorio):
+        h.update(f"{rotulo}={versao_dataset(caminho)};".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def _carregar_periodo(caminho: str) -> pd.DataFrame:
+    # cubo de uma partição, refeito só quando o CSV dela muda (a base não fica em memória)
+    with _lock_periodos:
+        versao = versao_dataset(caminho)
+        memo = _periodos.get(caminho)
+        if memo is None or memo[0] != versao:
+            memo = _periodos[caminho] = (versao, build_cubo(carregar_dataset(caminho)))
+        return memo[1]
+
+
+def _nao_encontrados_do_cubo(cubo: pd.DataFrame) -> pd.DataFrame:
+    # o mesmo relatório de TabelaMunicipios.nao_encontrados, contando as linhas pelo n_registros
+    faltando = cubo[cubo["id_municipio"] < 0]
+    contagem = (faltando.groupby(faltando["Município"].astype("string").fillna(""), observed=True)["n_registros"]
+                .sum().sort_values(ascending=False, kind="stable"))
+    return contagem.rename_axis("Município").reset_index(name="linhas")
+
+
+@dataclass(frozen=True, eq=False)
+class Dataset:
+    versao: str
+    df: pd.DataFrame | None = field(repr=False)   # base normalizada (None no modo série)
+    cubo: pd.DataFrame = field(repr=False)
+    nao_encontrados: pd.DataFrame | None = field(default=None, repr=False)
+    carregado_em: float = field(default_factory=time.time)
+    periodos: SeriePeriodos | None = field(default=None, repr=False)
+    periodo: tuple | None = None    # (primeiro, último) rótulo do intervalo
+
+    @classmethod
+    def carregar(cls, csv: str = CSV_PADRAO, versao: str | None = None,
+                 municipios: TabelaMunicipios | None = None) -> "Dataset":
+        versao = versao or versao_dataset(csv)
+        df = carregar_dataset(csv)
+        cubo = build_cubo(df)
+        nao_encontrados = None
+        if municipios is not None:
+            cubo["id_municipio"] = municipios.codificar(cubo["Município"])
+            nao_encontrados = municipios.nao_encontrados(df["Município"])
+            if len(nao_encontrados):
+                log.warning("%d município(s) da base sem correspondência no GeoJSON: %s",
+                            len(nao_encontrados), ", ".join(nao_encontrados["Município"].head(20)))
+        return cls(versao=versao, df=df, cubo=cubo, nao_encontrados=nao_encontrados)
+
+    @classmethod
+    def carregar_periodos(cls, diretorio: str = PERIODOS_PADRAO, versao: str | None = None,
+                          municipios: TabelaMunicipios | None = None) -> "Dataset":
+        """Série inteira de períodos (um CSV agregado por período em `diretorio`).
+
+        Se as partições são as da última série carregada mais algumas no fim
+        (o caso de um período novo), a série anterior é estendida só com elas.
+        """
+        global _serie
+        particoes = listar_periodos(diretorio)
+        if not particoes:
+            raise FileNotFoundError(f"nenhum período (*.csv) em {diretorio}")
+        with _lock_periodos:
+            versao = versao or versao_periodos(diretorio)
+            assinatura = tuple((rotulo, versao_dataset(caminho)) for rotulo, caminho in particoes)
+            for caminho in set(_periodos) - {c for _, c in particoes}:
+                del _periodos[caminho]
+
+            anterior = _serie
+            if (anterior is None or anterior[1] is not municipios
+                    or assinatura[:len(anterior[0])] != anterior[0]):
+                anterior = ((), municipios, None)
+            novos = [(rotulo, _carregar_periodo(caminho)) for rotulo, caminho in particoes[len(anterior[0]):]]
+            serie = anterior[2]
+            if serie is None:
+                serie = SeriePeriodos([r for r, _ in novos], [c for _, c in novos], municipios=municipios)
+            else:
+                for rotulo, cubo in novos:
+                    serie = serie.acrescentar(rotulo, cubo)
+            _serie = (assinatura, municipios, serie)
+
+        cubo = serie.cubo(0, len(serie) - 1)
+        nao_encontrados = _nao_encontrados_do_cubo(cubo) if municipios is not None else None
+        return cls(versao=versao, df=None, cubo=cubo, nao_encontrados=nao_encontrados,
+                   periodos=serie, periodo=(serie.rotulos[0], serie.rotulos[-1]))
+
+    def recorte(self, inicio: str, fim: str) -> "Dataset":
+        """Handle só com os períodos `inicio`..`fim` (a série inteira é o próprio handle)."""
+        serie = self.periodos
+        i, j = sorted((serie.indice(inicio), serie.indice(fim)))
+        if (i, j) == (0, len(serie) - 1):
+            return self
+        rotulos = serie.rotulos[i:j + 1]
+        return Dataset(versao=f"{self.versao}@{rotulos[0]}..{rotulos[-1]}",
+                       df=None, cubo=serie.cubo(i, j),
+                       nao_encontrados=self.nao_encontrados, carregado_em=self.carregado_em,
+                       periodos=serie, periodo=(rotulos[0], rotulos[-1]))
+
+    def __hash__(self):
+        return hash(self.versao)
+
+    def __eq__(self, outro):
+        return isinstance(outro, Dataset) and outro.versao == self.versao
+
+
+def hash_dataset(ds: Dataset) -> str:
+    return ds.versao
+
+
+# uso: @st.cache_data(hash_funcs=HASH_FUNCS)
+HASH_FUNCS = {Dataset: hash_dataset}
@@ -0,0 +1,82 @@
+"""Detalhe por município (modal do mapa).
+
+`IndiceMunicipios` guarda, uma vez por versão, o intervalo de linhas do
+cubo de cada id de município (coluna `id_municipio`), e a fatia sai por
+`iloc`, sem varrer strings. O `DetalheMunicipio` reúne tudo o que o modal
+mostra — KPIs, agregados por curso e specs dos gráficos — e é cacheado por
+(versão, id do município, filtro).
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from qualificacao.cubo import agregado_por_curso
+from qualificacao.graficos import barras_horizontais
+
+COLUNAS_DETALHE = ["Nº LOTE", "Município", "CURSO", "qtd_turmas", "qtd_inscritos", "qtd_vagas", "qtd_concludentes"]
+
+
+class IndiceMunicipios:
+    """id do município -> intervalo de linhas do cubo."""
+
+    def __init__(self, cubo: pd.DataFrame, n_municipios: int):
+        cod = cubo["id_municipio"].to_numpy()
+        ordem = np.argsort(cod, kind="stable")
+        # ids na mesma ordem do cubo (ex.: GeoJSON em ordem alfabética): a fatia vira slice
+        self._ordem = None if np.array_equal(ordem, np.arange(len(cod))) else ordem
+        cod_ordenado = cod[ordem]
+        alvos = np.arange(n_municipios)
+        self._inicio = np.searchsorted(cod_ordenado, alvos, side="left")
+        self._fim = np.searchsorted(cod_ordenado, alvos, side="right")
+
+    def __contains__(self, id_municipio) -> bool:
+        return 0 <= id_municipio < len(self._inicio) and self._fim[id_municipio] > self._inicio[id_municipio]
+
+    def linhas(self, id_municipio: int):
+        """Posições das linhas do município (slice quando contíguas)."""
+        if not 0 <= id_municipio < len(self._inicio):
+            return slice(0, 0)
+        ini, fim = int(self._inicio[id_municipio]), int(self._fim[id_municipio])
+        return slice(ini, fim) if self._ordem is None else self._ordem[ini:fim]
+
+    def fatia(self, cubo: pd.DataFrame, id_municipio: int, mascara: np.ndarray | None = None) -> pd.DataFrame:
+        linhas = self.linhas(id_municipio)
+        fatia = cubo.iloc[linhas]
+        if mascara is not None:
+            fatia = fatia[np.asarray(mascara)[linhas]]
+        return fatia
+
+
+@dataclass(frozen=True)
+class DetalheMunicipio:
+    municipio: str
+    cursos_distintos: int
+    total_turmas: int
+    total_concludentes: int
+    linhas: pd.DataFrame = field(repr=False)
+    por_curso: pd.DataFrame = field(repr=False)
+    graficos: dict = field(repr=False)     # nome -> spec Vega-Lite
+
+
+def montar_detalhe(cubo: pd.DataFrame, indice: IndiceMunicipios, id_municipio: int, municipio: str,
+                   mascara: np.ndarray | None = None) -> DetalheMunicipio:
+    """Tudo o que o modal do município precisa, calculado uma vez."""
+    df_mun = indice.fatia(cubo, id_municipio, mascara)
+    agg = agregado_por_curso(df_mun)
+    agg["CURSO"] = agg["CURSO"].astype(str)
+    cols = [c for c in COLUNAS_DETALHE if c in df_mun.columns]
+    return DetalheMunicipio(
+        municipio=municipio,
+        cursos_distintos=int(df_mun["CURSO"].nunique()),
+        total_turmas=int(df_mun["qtd_turmas"].sum()),
+        total_concludentes=int(df_mun["qtd_concludentes"].sum()),
+        linhas=df_mun[cols].reset_index(drop=True),
+        por_curso=agg.reset_index(drop=True),
+        graficos={
+            "concludentes": barras_horizontais(agg, "concludentes", "CURSO", "Concludentes", "Curso",
+                                               tooltip=("CURSO", "concludentes", "turmas")),
+            "turmas": barras_horizontais(agg, "turmas", "CURSO", "Turmas", "Curso",
+                                         tooltip=("CURSO", "turmas", "concludentes")),
+        },
+    )
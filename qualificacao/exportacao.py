@@ -0,0 +1,217 @@
+"""Exportações sob demanda (CSV UTF-8, Parquet e XLSX).
+
+Nada é gerado durante o render, só no clique. O arquivo é escrito em disco
+em blocos de linhas (sem montar o conteúdo inteiro em memória) e fica num
+cache LRU em disco, por (versão, visão, filtro, formato) — o segundo
+download da mesma visão não gera nada.
+
+Com `url` (diretório dentro de ``static/``, servido em ``/app/static``), o
+download sai do disco pela rota estática do servidor, em streaming: o
+arquivo não passa pela memória do processo. Sem ela, ou para um arquivo
+que não coube no cache, `dados` lê o arquivo para o ``st.download_button``;
+o que não coube no cache é apagado assim que lido.
+"""
+import atexit
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import uuid
+import zipfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+from qualificacao.cache import LRUCache
+
+BLOCO_LINHAS = 50_000
+# maior arquivo que a rota estática do Streamlit serve (acima disso, 404)
+MAX_ROTA_ESTATICA = 200 * 1024 * 1024
+# arquivos fora do cache ainda não baixados são apagados depois disso
+AVULSOS_TTL_S = 600
+
+# formato -> (mime, extensão)
+FORMATOS = {
+    "csv": ("text/csv", ".csv"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", ".xlsx"),
+}
+
+
+def _blocos(df: pd.DataFrame):
+    for ini in range(0, max(len(df), 1), BLOCO_LINHAS):
+        yield df.iloc[ini:ini + BLOCO_LINHAS]
+
+
+def escrever_csv(df: pd.DataFrame, caminho: str):
+    # utf-8-sig: o Excel reconhece os acentos ao abrir o CSV direto
+    with open(caminho, "w", encoding="utf-8-sig", newline="") as f:
+        for i, bloco in enumerate(_blocos(df)):
+            bloco.to_csv(f, index=False, header=(i == 0))
+
+
+def escrever_parquet(df: pd.DataFrame, caminho: str):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(caminho, schema, compression="zstd") as escritor:
+        for bloco in _blocos(df):
+            escritor.write_table(pa.Table.from_pandas(bloco, schema=schema, preserve_index=False))
+
+
+# --- XLSX mínimo (uma planilha, strings inline), escrito em streaming no zip ---
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/></Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="dados" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/></Relationships>'
+)
+
+
+def _celula(valor) -> str:
+    if valor is None or (isinstance(valor, float) and np.isnan(valor)) or valor is pd.NA:
+        return "<c/>"
+    if isinstance(valor, (bool, np.bool_)):
+        return f'<c t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, (int, float, np.integer, np.floating)):
+        return f"<c><v>{valor}</v></c>"
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(str(valor))}</t></is></c>'
+
+
+def escrever_xlsx(df: pd.DataFrame, caminho: str):
+    with zipfile.ZipFile(caminho, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        z.writestr("_rels/.rels", _RELS)
+        z.writestr("xl/workbook.xml", _WORKBOOK)
+        z.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        with z.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as f:
+            f.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            f.write(("<row>" + "".join(_celula(str(c)) for c in df.columns) + "</row>").encode("utf-8"))
+            for bloco in _blocos(df):
+                linhas = ("<row>" + "".join(_celula(v) for v in linha) + "</row>"
+                          for linha in bloco.itertuples(index=False, name=None))
+                f.write("".join(linhas).encode("utf-8"))
+            f.write(b"</sheetData></worksheet>")
+
+
+_ESCRITORES = {"csv": escrever_csv, "parquet": escrever_parquet, "xlsx": escrever_xlsx}
+
+
+class Exportador:
+    """Cache em disco dos arquivos exportados, limitado por bytes (LRU).
+
+    Cada processo escreve num subdiretório só dele dentro de `diretorio`
+    (outros processos ou réplicas no mesmo diretório não se apagam), removido
+    quando o processo termina.
+    """
+
+    def __init__(self, max_bytes: int, diretorio: str | None = None, url: str | None = None):
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        self.diretorio = tempfile.mkdtemp(prefix="qualificacao_export_", dir=diretorio)
+        self.url_base = f"{url.rstrip('/')}/{os.path.basename(self.diretorio)}" if url else None
+        atexit.register(shutil.rmtree, self.diretorio, ignore_errors=True)
+        # nomes imprevisíveis: a rota estática não tem controle de acesso
+        self._sal = uuid.uuid4().hex
+        self._cache = LRUCache(max_bytes=max_bytes, sizeof=os.path.getsize, ao_remover=self._apagar)
+        self._avulsos = {}       # caminho -> criado em (maiores que o cache, ainda não baixados)
+
+    @staticmethod
+    def _apagar(_chave, caminho):
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+
+    def _nome(self, chave) -> str:
+        return hashlib.sha1((self._sal + repr(chave)).encode("utf-8")).hexdigest()[:20]
+
+    def _caminho(self, chave, formato: str) -> str:
+        return os.path.join(self.diretorio, self._nome(chave) + FORMATOS[formato][1])
+
+    def _gerar(self, chave, formato: str, montar_df) -> str:
+        destino = self._caminho(chave, formato)
+        tmp = destino + f".{uuid.uuid4().hex[:8]}.tmp"
+        _ESCRITORES[formato](montar_df(), tmp)
+        if os.path.getsize(tmp) > self._cache.max_bytes:
+            # não fica no cache: nome próprio, apagado ao ser lido (ou vencido)
+            destino = os.path.join(self.diretorio, f"{self._nome(chave)}-{uuid.uuid4().hex[:8]}{FORMATOS[formato][1]}")
+            self._avulsos[destino] = time.time()
+        os.replace(tmp, destino)
+        return destino
+
+    def _apagar_avulsos_vencidos(self):
+        limite = time.time() - AVULSOS_TTL_S
+        for caminho, criado_em in list(self._avulsos.items()):
+            if criado_em < limite and self._avulsos.pop(caminho, None) is not None:
+                self._apagar(None, caminho)
+
+    def arquivo(self, chave, formato: str, montar_df) -> str:
+        """Caminho do arquivo exportado (gerado na primeira vez)."""
+        self._apagar_avulsos_vencidos()
+        return self._cache.get_or_build((formato, chave), lambda: self._gerar(chave, formato, montar_df))
+
+    def url(self, chave, formato: str) -> str | None:
+        """Endereço na rota estática, para um arquivo já gerado e guardado (senão None)."""
+        if self.url_base is None or (formato, chave) not in self._cache:
+            return None
+        caminho = self._caminho(chave, formato)
+        try:
+            if os.path.getsize(caminho) > MAX_ROTA_ESTATICA:
+                return None
+        except OSError:
+            return None
+        return f"{self.url_base}/{os.path.basename(caminho)}"
+
+    def dados(self, chave, formato: str, montar_df, caminho: str | None = None):
+        """Função sem argumentos para o `data` do st.download_button (roda só no clique).
+
+        Os bytes passam pela memória do servidor; um arquivo fora do cache é
+        apagado logo depois de lido.
+        """
+        def _ler():
+            # o avulso pode ter vencido antes do clique: gera de novo
+            origem = caminho if caminho and os.path.exists(caminho) else self.arquivo(chave, formato, montar_df)
+            with open(origem, "rb") as f:
+                conteudo = f.read()
+            if self._avulsos.pop(origem, None) is not None:
+                self._apagar(None, origem)
+            return conteudo
+        return _ler
+
+    def stats(self) -> dict:
+        self._apagar_avulsos_vencidos()
+        return {**self._cache.stats(), "avulsos": len(self._avulsos)}
+
+    def limpar(self):
+        self._cache.clear()
+        self._avulsos.clear()
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+        os.makedirs(self.diretorio, exist_ok=True)
@@ -0,0 +1,202 @@
+"""Motor de filtros do mapa: índices invertidos sobre o cubo.
+
+Para cada valor de CURSO, Município e Nº LOTE guarda-se, uma única vez por
+versão do dataset, a lista das linhas do cubo em que ele aparece (todas as
+listas da dimensão num único vetor, ordenado por valor, com os inícios de
+cada uma); as métricas numéricas ficam pré-ordenadas. Um filtro qualquer
+vira OR das listas dentro de cada dimensão, faixa numérica por
+``searchsorted`` e AND entre tudo (bitsets de ``np.packbits``) — sem varrer
+strings nem copiar linhas. O índice ocupa uma posição por linha e dimensão,
+qualquer que seja o número de valores. O resultado é uma máscara booleana
+sobre o cubo, aceita por `calcular_kpis` e `valores_camada`.
+"""
+from dataclasses import dataclass, replace
+
+import numpy as np
+
+from qualificacao.cache import LRUCache
+from qualificacao.cubo import codigos
+
+# dimensão -> coluna do cubo
+DIMENSOES_FILTRO = {"curso": "CURSO", "municipio": "Município", "lote": "Nº LOTE"}
+# faixas numéricas por linha do cubo (Município × CURSO × Nº LOTE)
+FAIXAS = {
+    "qtd_concludentes": "Concludentes",
+    "qtd_turmas": "Turmas",
+    "taxa_conclusao": "Taxa de conclusão (concludentes/inscritos)",
+}
+
+
+@dataclass(frozen=True)
+class Filtro:
+    """Seleção do usuário; imutável e hashable (serve de chave de cache)."""
+    cursos: tuple = ()
+    municipios: tuple = ()
+    lotes: tuple = ()
+    faixas: tuple = ()      # ((coluna, mínimo, máximo), ...)
+
+    @classmethod
+    def criar(cls, cursos=(), municipios=(), lotes=(), faixas=None) -> "Filtro":
+        """Normaliza a seleção (ordem não importa para a chave)."""
+        faixas = tuple(sorted((c, float(lo), float(hi)) for c, (lo, hi) in (faixas or {}).items()))
+        return cls(cursos=tuple(sorted(map(str, cursos))),
+                   municipios=tuple(sorted(map(str, municipios))),
+                   lotes=tuple(sorted(map(str, lotes))),
+                   faixas=faixas)
+
+    @property
+    def ativo(self) -> bool:
+        return bool(self.cursos or self.municipios or self.lotes or self.faixas)
+
+    def valores(self, dimensao: str) -> tuple:
+        return {"curso": self.cursos, "municipio": self.municipios, "lote": self.lotes}[dimensao]
+
+    def com_lote(self, lote) -> "Filtro":
+        """O mesmo filtro restrito a um lote (substitui os lotes escolhidos); None = sem mudança."""
+        return self if lote is None else replace(self, lotes=(str(lote),))
+
+    def com_cursos(self, cursos) -> "Filtro":
+        """O mesmo filtro com outros cursos (ex.: os escolhidos no mapa do navegador)."""
+        return replace(self, cursos=tuple(sorted(map(str, cursos))))
+
+    def sem(self, dimensao: str) -> "Filtro":
+        """O mesmo filtro sem a dimensão (base das opções cruzadas)."""
+        return replace(self, **{{"curso": "cursos", "municipio": "municipios", "lote": "lotes"}[dimensao]: ()})
+
+    def faixa(self, coluna: str):
+        return next(((lo, hi) for c, lo, hi in self.faixas if c == coluna), None)
+
+    def descricao(self) -> str:
+        partes = []
+        if self.lotes:
+            partes.append(f"{len(self.lotes)} lote(s)")
+        if self.cursos:
+            partes.append(f"{len(self.cursos)} curso(s)")
+        if self.municipios:
+            partes.append(f"{len(self.municipios)} município(s)")
+        partes += [f"{FAIXAS.get(c, c)} entre {lo:g} e {hi:g}" for c, lo, hi in self.faixas]
+        return " • ".join(partes)
+
+
+class IndiceFiltros:
+    """Índices invertidos do cubo; criado uma vez por versão e só lido depois."""
+
+    def __init__(self, cubo, cache: LRUCache | None = None, prefixo: tuple = ()):
+        self.n = len(cubo)
+        self._nbytes_bits = (self.n + 7) // 8
+        self._codigos = {}
+        self._categorias = {}
+        self._posicao = {}
+        self._linhas = {}        # linhas do cubo agrupadas por valor
+        self._inicios = {}       # valor i -> linhas[inicios[i]:inicios[i + 1]]
+        for dim, coluna in DIMENSOES_FILTRO.items():
+            cod, cats = codigos(cubo[coluna])
+            cats = [str(c) for c in cats]
+            self._codigos[dim] = cod
+            self._categorias[dim] = cats
+            self._posicao[dim] = {c: i for i, c in enumerate(cats)}
+            # linhas órfãs (código -1) ficam fora das listas
+            validos = np.flatnonzero(cod >= 0)
+            self._linhas[dim] = validos[np.argsort(cod[validos], kind="stable")]
+            self._inicios[dim] = np.concatenate(
+                [[0], np.cumsum(np.bincount(cod[validos], minlength=len(cats)))]).astype(np.int64)
+
+        conc = cubo["qtd_concludentes"].to_numpy(dtype=float)
+        insc = cubo["qtd_inscritos"].to_numpy(dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            numericas = {
+                "qtd_concludentes": conc,
+                "qtd_turmas": cubo["qtd_turmas"].to_numpy(dtype=float),
+                "taxa_conclusao": np.where(insc > 0, conc / insc, np.nan),
+            }
+        self._ordem = {}
+        self._ordenados = {}
+        self.limites = {}
+        for col, v in numericas.items():
+            ordem = np.argsort(v, kind="stable")   # NaN vai para o fim
+            self._ordem[col] = ordem
+            self._ordenados[col] = v[ordem]
+            finitos = v[np.isfinite(v)]
+            self.limites[col] = (float(finitos.min()), float(finitos.max())) if len(finitos) else (0.0, 0.0)
+
+        # bitsets/máscaras/opções resolvidos: num cache próprio ou no compartilhado
+        # do processo (aí `prefixo` separa as versões, ex.: ("filtros", versão))
+        self._cache = cache if cache is not None else LRUCache(max_bytes=16 * 1024 * 1024, max_entries=512)
+        self._prefixo = tuple(prefixo)
+
+    # ---- resolução ----
+    def _todos(self) -> np.ndarray:
+        bits = np.full(self._nbytes_bits, 0xFF, dtype=np.uint8)
+        sobra = self._nbytes_bits * 8 - self.n
+        if sobra:
+            bits[-1] = (0xFF << sobra) & 0xFF
+        return bits
+
+    def _bits_linhas(self, linhas: np.ndarray) -> np.ndarray:
+        presentes = np.zeros(self.n, dtype=bool)
+        presentes[linhas] = True
+        return np.packbits(presentes)
+
+    def _bits_valores(self, dim: str, idx: list) -> np.ndarray:
+        # OR dos valores escolhidos: junta as listas deles num bitset só
+        linhas, inicios = self._linhas[dim], self._inicios[dim]
+        return self._bits_linhas(np.concatenate([linhas[inicios[i]:inicios[i + 1]] for i in idx]))
+
+    def _bits_faixa(self, coluna: str, lo: float, hi: float) -> np.ndarray:
+        ordenados = self._ordenados[coluna]
+        i = np.searchsorted(ordenados, lo, side="left")
+        j = np.searchsorted(ordenados, hi, side="right")
+        return self._bits_linhas(self._ordem[coluna][i:j])
+
+    def _resolver(self, filtro: Filtro) -> np.ndarray:
+        bits = self._todos()
+        for dim in DIMENSOES_FILTRO:
+            selecionados = filtro.valores(dim)
+            if not selecionados:
+                continue
+            pos = self._posicao[dim]
+            idx = [pos[v] for v in selecionados if v in pos]
+            if not idx:
+                bits[:] = 0
+                break
+            bits &= self._bits_valores(dim, idx)
+        for coluna, lo, hi in filtro.faixas:
+            if coluna in self._ordem:
+                bits &= self._bits_faixa(coluna, lo, hi)
+        bits.flags.writeable = False
+        return bits
+
+    def bits(self, filtro: Filtro) -> np.ndarray:
+        """Bitset (empacotado) das linhas do cubo que passam no filtro."""
+        return self._cache.get_or_build(self._prefixo + ("bits", filtro), lambda: self._resolver(filtro))
+
+    def mascara(self, filtro: Filtro) -> np.ndarray | None:
+        """Máscara booleana sobre as linhas do cubo (None = sem filtro)."""
+        if not filtro.ativo:
+            return None
+
+        def _montar():
+            m = np.unpackbits(self.bits(filtro), count=self.n).view(bool)
+            m.flags.writeable = False
+            return m
+
+        return self._cache.get_or_build(self._prefixo + ("mascara", filtro), _montar)
+
+    def contagem(self, filtro: Filtro) -> int:
+        return int(np.unpackbits(self.bits(filtro), count=self.n).sum())
+
+    # ---- opções cruzadas dos seletores ----
+    def opcoes(self, dimensao: str, filtro: Filtro | None = None) -> list:
+        """Valores da dimensão presentes nas linhas que passam nas *outras* dimensões."""
+        base = (filtro or Filtro()).sem(dimensao)
+
+        def _montar():
+            cats = self._categorias[dimensao]
+            cod = self._codigos[dimensao]
+            if base.ativo:
+                # valor presente <=> aparece em alguma linha que passa no filtro
+                cod = cod[self.mascara(base)]
+            presentes = np.bincount(cod[cod >= 0], minlength=len(cats)) > 0
+            return sorted(cats[i] for i in np.flatnonzero(presentes))
+
+        return self._cache.get_or_build(self._prefixo + ("opcoes", dimensao, base), _montar)
@@ -0,0 +1,345 @@
+"""Geometria dos municípios em vários níveis de detalhe (LOD).
+
+Etapa offline: lê ``data/municipios_latlon.geojson``, quantiza as coordenadas
+numa grade inteira, extrai a topologia (arcos compartilhados entre
+municípios vizinhos) e simplifica cada arco uma única vez por nível. Como as
+fronteiras comuns usam o mesmo arco, a simplificação não abre buracos nem
+sobreposições entre vizinhos. Cada nível é gravado como TopoJSON:
+
+    python -m qualificacao.geometria
+
+Em tempo de execução o app escolhe o nível pelo zoom do mapa e decodifica o
+TopoJSON de volta para GeoJSON com coordenadas já arredondadas.
+"""
+import json
+import math
+import os
+
+ORIGEM_PADRAO = "data/municipios_latlon.geojson"
+DESTINO_PADRAO = "data"
+QUANTIZACAO = 100_000
+# properties das feições que vão para o mapa (tooltip/popup)
+PROPRIEDADES_MAPA = ("NM_MUN",)
+
+# nível -> (tolerância de simplificação em graus, zoom máximo atendido)
+NIVEIS_LOD = {
+    2: (0.004, 7),
+    1: (0.001, 9),
+    0: (0.0, None),
+}
+
+
+def caminho_nivel(nivel: int, destino: str = DESTINO_PADRAO) -> str:
+    return os.path.join(destino, f"municipios_lod{nivel}.topojson")
+
+
+def nivel_para_zoom(zoom) -> int:
+    """Nível de detalhe adequado ao zoom do Leaflet (2 = mais simplificado)."""
+    for nivel in sorted(NIVEIS_LOD, reverse=True):
+        zoom_max = NIVEIS_LOD[nivel][1]
+        if zoom_max is None or (zoom is not None and zoom <= zoom_max):
+            return nivel
+    return 0
+
+
+# =========================
+# Topologia
+# =========================
+
+def _aneis(geometry):
+    """Lista de polígonos (cada um = lista de anéis) de Polygon/MultiPolygon."""
+    if geometry["type"] == "Polygon":
+        return [geometry["coordinates"]]
+    if geometry["type"] == "MultiPolygon":
+        return geometry["coordinates"]
+    raise ValueError(f"geometria não suportada: {geometry['type']}")
+
+
+def _quantizar_anel(anel, x0, y0, kx, ky):
+    pts = []
+    for x, y in anel:
+        p = (round((x - x0) / kx), round((y - y0) / ky))
+        if not pts or p != pts[-1]:
+            pts.append(p)
+    if pts[0] != pts[-1]:
+        pts.append(pts[0])
+    return pts
+
+
+def _juncoes(aneis_q):
+    """Pontos onde o conjunto de vizinhos muda (início/fim de arcos)."""
+    vizinhos = {}
+    juncoes = set()
+    for anel in aneis_q:
+        n = len(anel) - 1
+        for i in range(n):
+            p = anel[i]
+            viz = frozenset((anel[i - 1], anel[i + 1]))
+            anterior = vizinhos.get(p)
+            if anterior is None:
+                vizinhos[p] = viz
+            elif anterior != viz:
+                juncoes.add(p)
+    return juncoes
+
+
+def _cortar_anel(anel, juncoes):
+    pts = anel[:-1]
+    idx = [i for i, p in enumerate(pts) if p in juncoes]
+    if not idx:
+        # anel sem junções: começa no menor ponto para coincidir com o vizinho
+        i0 = min(range(len(pts)), key=pts.__getitem__)
+        pts = pts[i0:] + pts[:i0]
+        return [pts + [pts[0]]]
+    i0 = idx[0]
+    pts = pts[i0:] + pts[:i0]
+    cortes = [i - i0 for i in idx] + [len(pts)]
+    pts = pts + [pts[0]]
+    return [pts[a:b + 1] for a, b in zip(cortes, cortes[1:])]
+
+
+def build_topologia(geojson: dict, quantizacao: int = QUANTIZACAO) -> dict:
+    """Topologia quantizada (sem simplificação) do FeatureCollection."""
+    xs, ys = [], []
+    for feat in geojson["features"]:
+        for poligono in _aneis(feat["geometry"]):
+            for anel in poligono:
+                for x, y in anel:
+                    xs.append(x)
+                    ys.append(y)
+    x0, x1, y0, y1 = min(xs), max(xs), min(ys), max(ys)
+    kx = (x1 - x0) / (quantizacao - 1) or 1.0
+    ky = (y1 - y0) / (quantizacao - 1) or 1.0
+
+    feats_q = []
+    todos_aneis = []
+    for feat in geojson["features"]:
+        poligonos = []
+        for poligono in _aneis(feat["geometry"]):
+            aneis = [_quantizar_anel(a, x0, y0, kx, ky) for a in poligono]
+            aneis = [a for a in aneis if len(a) >= 4]
+            if aneis:
+                poligonos.append(aneis)
+                todos_aneis.extend(aneis)
+        feats_q.append((feat.get("properties") or {}, poligonos))
+
+    juncoes = _juncoes(todos_aneis)
+    arcos, indice = [], {}
+
+    def registrar(arco):
+        chave = tuple(arco)
+        if chave in indice:
+            return indice[chave]
+        reverso = tuple(reversed(arco))
+        if reverso in indice:
+            return ~indice[reverso]
+        indice[chave] = len(arcos)
+        arcos.append(list(arco))
+        return indice[chave]
+
+    geometrias = []
+    for props, poligonos in feats_q:
+        arcs_pol = [[[registrar(arco) for arco in _cortar_anel(anel, juncoes)] for anel in aneis]
+                    for aneis in poligonos]
+        if len(arcs_pol) == 1:
+            geom = {"type": "Polygon", "arcs": arcs_pol[0]}
+        else:
+            geom = {"type": "MultiPolygon", "arcs": arcs_pol}
+        geom["properties"] = props
+        geometrias.append(geom)
+
+    return {
+        "type": "Topology",
+        "transform": {"scale": [kx, ky], "translate": [x0, y0]},
+        "objects": {"municipios": {"type": "GeometryCollection", "geometries": geometrias}},
+        "arcs": arcos,
+    }
+
+
+# =========================
+# Simplificação (Douglas-Peucker por arco)
+# =========================
+
+def _dist2_segmento(p, a, b):
+    (px, py), (ax, ay), (bx, by) = p, a, b
+    dx, dy = bx - ax, by - ay
+    if dx == 0 and dy == 0:
+        return (px - ax) ** 2 + (py - ay) ** 2
+    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / (dx * dx + dy * dy)))
+    qx, qy = ax + t * dx, ay + t * dy
+    return (px - qx) ** 2 + (py - qy) ** 2
+
+
+def _douglas_peucker(pts, tol2, manter_min):
+    n = len(pts)
+    manter = [False] * n
+    manter[0] = manter[-1] = True
+    pilha = [(0, n - 1)]
+    while pilha:
+        a, b = pilha.pop()
+        if b - a < 2:
+            continue
+        i_max, d_max = -1, -1.0
+        for i in range(a + 1, b):
+            d = _dist2_segmento(pts[i], pts[a], pts[b])
+            if d > d_max:
+                i_max, d_max = i, d
+        if d_max > tol2:
+            manter[i_max] = True
+            pilha.append((a, i_max))
+            pilha.append((i_max, b))
+
+    # arcos reduzidos demais degeneram o anel: força os pontos mais salientes
+    while sum(manter) < min(manter_min, n):
+        mantidos = [i for i, k in enumerate(manter) if k]
+        i_max, d_max = -1, -1.0
+        for a, b in zip(mantidos, mantidos[1:]):
+            for i in range(a + 1, b):
+                d = _dist2_segmento(pts[i], pts[a], pts[b])
+                if d > d_max:
+                    i_max, d_max = i, d
+        manter[i_max] = True
+    return [p for p, k in zip(pts, manter) if k]
+
+
+def simplificar(topologia: dict, tolerancia: float) -> dict:
+    """Cópia da topologia com cada arco simplificado (tolerância em graus)."""
+    kx, ky = topologia["transform"]["scale"]
+    tol = tolerancia / min(kx, ky)
+    arcos = []
+    for arco in topologia["arcs"]:
+        if tol <= 0 or len(arco) <= 3:
+            arcos.append(arco)
+            continue
+        fechado = arco[0] == arco[-1]
+        arcos.append(_douglas_peucker(arco, tol * tol, 4 if fechado else 3))
+    return {**topologia, "arcs": arcos}
+
+
+# =========================
+# Codificação TopoJSON
+# =========================
+
+def codificar(topologia: dict) -> dict:
+    """Aplica delta-encoding nos arcos (formato TopoJSON quantizado)."""
+    arcos = []
+    for arco in topologia["arcs"]:
+        px, py = 0, 0
+        delta = []
+        for x, y in arco:
+            delta.append([x - px, y - py])
+            px, py = x, y
+        arcos.append(delta)
+    return {**topologia, "arcs": arcos}
+
+
+def _casas_decimais(kx, ky):
+    return max(0, int(math.ceil(-math.log10(min(kx, ky)))))
+
+
+def topojson_para_geojson(topo: dict, objeto: str = "municipios") -> dict:
+    """Decodifica um TopoJSON quantizado em FeatureCollection GeoJSON."""
+    kx, ky = topo["transform"]["scale"]
+    x0, y0 = topo["transform"]["translate"]
+    casas = _casas_decimais(kx, ky)
+
+    arcos = []
+    for arco in topo["arcs"]:
+        x = y = 0
+        pts = []
+        for dx, dy in arco:
+            x += dx
+            y += dy
+            pts.append([round(x * kx + x0, casas), round(y * ky + y0, casas)])
+        arcos.append(pts)
+
+    def anel(indices):
+        pts = []
+        for i in indices:
+            arco = arcos[i] if i >= 0 else arcos[~i][::-1]
+            pts.extend(arco if not pts else arco[1:])
+        return pts
+
+    features = []
+    for geom in topo["objects"][objeto]["geometries"]:
+        if geom["type"] == "Polygon":
+            coords = [anel(a) for a in geom["arcs"]]
+        else:
+            coords = [[anel(a) for a in pol] for pol in geom["arcs"]]
+        features.append({
+            "type": "Feature",
+            "properties": dict(geom.get("properties") or {}),
+            "geometry": {"type": geom["type"], "coordinates": coords},
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+class GeometriaMunicipios:
+    """Geometria compartilhada (nunca alterada) + nomes canônicos na ordem das feições.
+
+    A posição da feição é o id da tabela de municípios (a ordem é a mesma em
+    todos os níveis): os valores de cada camada chegam num array já alinhado
+    (`cubo.valores_municipios`) e só são unidos às properties no momento de
+    serializar o mapa.
+    """
+
+    def __init__(self, geojson: dict):
+        from qualificacao.municipios import nome_canonico
+
+        self.geojson = geojson
+        self.nomes = [nome_canonico(f["properties"]["NM_MUN"]) for f in geojson["features"]]
+        # properties que o mapa usa (tooltip/popup), separadas uma vez por nível:
+        # cada render só acrescenta as colunas da camada, sem copiar o resto do GeoJSON
+        self._propriedades = [
+            tuple((c, f["properties"][c]) for c in PROPRIEDADES_MAPA if c in f["properties"])
+            for f in geojson["features"]
+        ]
+
+    def __len__(self):
+        return len(self.nomes)
+
+    def com_propriedades(self, **colunas) -> dict:
+        """FeatureCollection rasa: geometria compartilhada + PROPRIEDADES_MAPA e `colunas` por feição."""
+        feats = self.geojson["features"]
+        nomes = tuple(colunas)
+        valores = zip(*colunas.values()) if colunas else [()] * len(feats)
+        return {
+            "type": "FeatureCollection",
+            "features": [
+                {"type": "Feature", "geometry": f["geometry"],
+                 "properties": dict(base + tuple(zip(nomes, vals)))}
+                for f, base, vals in zip(feats, self._propriedades, valores)
+            ],
+        }
+
+
+def gerar_niveis(origem: str = ORIGEM_PADRAO, destino: str = DESTINO_PADRAO,
+                 quantizacao: int = QUANTIZACAO) -> dict:
+    """Gera um TopoJSON por nível de detalhe; retorna {nível: bytes}."""
+    with open(origem, "r", encoding="utf-8") as f:
+        geojson = json.load(f)
+    topologia = build_topologia(geojson, quantizacao)
+
+    tamanhos = {}
+    for nivel, (tolerancia, _) in NIVEIS_LOD.items():
+        topo = codificar(simplificar(topologia, tolerancia))
+        caminho = caminho_nivel(nivel, destino)
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump(topo, f, ensure_ascii=False, separators=(",", ":"))
+        tamanhos[nivel] = os.path.getsize(caminho)
+    return tamanhos
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Gera os níveis de detalhe (TopoJSON) dos municípios.")
+    parser.add_argument("--origem", default=ORIGEM_PADRAO)
+    parser.add_argument("--destino", default=DESTINO_PADRAO)
+    parser.add_argument("--quantizacao", type=int, default=QUANTIZACAO)
+    args = parser.parse_args()
+
+    original = os.path.getsize(args.origem)
+    print(f"{args.origem}: {original / 1024:.0f} KiB")
+    for nivel, nbytes in sorted(gerar_niveis(args.origem, args.destino, args.quantizacao).items()):
+        print(f"  LOD {nivel}: {nbytes / 1024:.0f} KiB ({original / nbytes:.1f}x menor)")
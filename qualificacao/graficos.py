@@ -0,0 +1,62 @@
+"""Specs Vega-Lite dos gráficos de barras do app.
+
+Os gráficos são montados como dicionários e exibidos com
+`st.vega_lite_chart` — o mesmo resultado do Altair, sem importar o Altair
+(e sua validação de schema) no caminho do primeiro render.
+"""
+import pandas as pd
+
+COR_BARRAS = "#cf2e26"
+
+
+def _campo(nome: str, tipo: str, titulo: str | None = None) -> dict:
+    campo = {"field": nome, "type": tipo}
+    if titulo is not None:
+        campo["title"] = titulo
+    return campo
+
+
+def barras_horizontais(df: pd.DataFrame, x: str, y: str, titulo_x: str, titulo_y: str,
+                       tooltip=(), altura: int = 400, cor: str = COR_BARRAS) -> dict:
+    """Barras horizontais de `x` (quantitativo) por `y` (nominal), ordenadas por `x`.
+
+    `tooltip`: campos, ou tuplas (campo, título); numéricos viram quantitativos.
+    """
+    dicas = []
+    for item in tooltip or (y, x):
+        nome, titulo = item if isinstance(item, tuple) else (item, None)
+        tipo = "quantitative" if pd.api.types.is_numeric_dtype(df[nome]) else "nominal"
+        dicas.append(_campo(nome, tipo, titulo))
+
+    dados = df[list(dict.fromkeys([x, y, *(d["field"] for d in dicas)]))].copy()
+    for col in dados.columns:
+        if not pd.api.types.is_numeric_dtype(dados[col]):
+            dados[col] = dados[col].astype(str)
+
+    return {
+        "data": {"values": dados.to_dict(orient="records")},
+        "mark": {"type": "bar", "color": cor},
+        "encoding": {
+            "x": _campo(x, "quantitative", titulo_x),
+            "y": {**_campo(y, "nominal", titulo_y), "sort": "-x"},
+            "tooltip": dicas,
+        },
+        "height": altura,
+    }
+
+
+def linha_temporal(df: pd.DataFrame, x: str, y: str, titulo_x: str, titulo_y: str,
+                   altura: int = 300, cor: str = COR_BARRAS) -> dict:
+    """Linha de `y` por `x` (ordinal, na ordem das linhas de `df`), com pontos."""
+    dados = df[[x, y]].copy()
+    dados[x] = dados[x].astype(str)
+    return {
+        "data": {"values": dados.to_dict(orient="records")},
+        "mark": {"type": "line", "point": True, "color": cor},
+        "encoding": {
+            "x": {**_campo(x, "ordinal", titulo_x), "sort": None},
+            "y": _campo(y, "quantitative", titulo_y),
+            "tooltip": [_campo(x, "ordinal", titulo_x), _campo(y, "quantitative", titulo_y)],
+        },
+        "height": altura,
+    }
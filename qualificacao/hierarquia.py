@@ -0,0 +1,125 @@
+"""Rollups hierárquicos Lote → Município → Curso.
+
+O programa é gerido por lote. Uma vez por versão do dataset, o cubo é
+ordenado por (Nº LOTE, Município, CURSO) e somado em três níveis: lote,
+lote × município e lote × município × curso, com as métricas e taxas dos
+cards de KPI. Cada grupo de um nível ocupa um intervalo contíguo do nível
+seguinte. Descer na hierarquia (ou colorir o mapa por lote) é só fatiar por
+`iloc`: depois de montado, nenhum groupby.
+"""
+import numpy as np
+import pandas as pd
+
+from qualificacao.cubo import COLUNA_CAMADA, METRICAS, codigos
+from qualificacao.kpis import adicionar_taxas
+
+NIVEIS = ("lote", "lote_municipio", "lote_municipio_curso")
+SOMAS = METRICAS + ["n_registros"]
+
+
+def _inicios(*cods) -> np.ndarray:
+    """Início de cada grupo em códigos já ordenados (muda qualquer um deles)."""
+    n = len(cods[0])
+    muda = np.zeros(n, dtype=bool)
+    if n:
+        muda[0] = True
+        for c in cods:
+            muda[1:] |= c[1:] != c[:-1]
+    return np.flatnonzero(muda)
+
+
+def _somar(valores: dict, inicios: np.ndarray) -> dict:
+    if not len(inicios):
+        return {c: np.zeros(0, dtype=np.int64) for c in valores}
+    return {c: np.add.reduceat(v, inicios) for c, v in valores.items()}
+
+
+def _fins(inicios: np.ndarray, n: int) -> np.ndarray:
+    return np.append(inicios[1:], n)
+
+
+class Hierarquia:
+    """Os três níveis somados e os intervalos de um nível no seguinte."""
+
+    def __init__(self, cubo: pd.DataFrame):
+        base = cubo.sort_values(["Nº LOTE", "Município", "CURSO"], kind="stable").reset_index(drop=True)
+        cod_lote, _ = codigos(base["Nº LOTE"])
+        cod_mun, _ = codigos(base["Município"])
+        cod_curso, cursos = codigos(base["CURSO"])
+        somas = {c: base[c].to_numpy(dtype=np.int64) if c in base else np.ones(len(base), dtype=np.int64)
+                 for c in SOMAS}
+
+        # nível 3: o próprio cubo (uma linha por lote × município × curso)
+        colunas = ["Nº LOTE", "Município", "CURSO"] + (["id_municipio"] if "id_municipio" in base else [])
+        self.lote_municipio_curso = adicionar_taxas(
+            pd.concat([base[colunas], pd.DataFrame(somas)], axis=1))
+
+        # nível 2: lote × município, somando intervalos contíguos do nível 3
+        ini3 = _inicios(cod_lote, cod_mun)
+        nivel2 = pd.DataFrame({c: base[c].to_numpy()[ini3] for c in colunas[:2] + colunas[3:]})
+        nivel2["cursos"] = np.diff(np.append(ini3, len(base)))
+        for c, v in _somar(somas, ini3).items():
+            nivel2[c] = v
+        self.lote_municipio = adicionar_taxas(nivel2)
+
+        # nível 1: lote, somando intervalos contíguos do nível 2
+        lote2 = cod_lote[ini3]
+        ini2 = _inicios(lote2)
+        nivel1 = pd.DataFrame({"Nº LOTE": nivel2["Nº LOTE"].to_numpy()[ini2]})
+        nivel1["municipios"] = np.diff(np.append(ini2, len(nivel2)))
+        # cursos distintos do lote: pares (lote, curso) únicos
+        n_cursos = max(len(cursos), 1)
+        pares = np.unique(cod_lote.astype(np.int64) * n_cursos + cod_curso)
+        por_lote = np.bincount(pares // n_cursos, minlength=int(cod_lote.max(initial=-1)) + 1)
+        nivel1["cursos"] = por_lote[cod_lote[ini3][ini2]] if len(ini2) else np.zeros(0, dtype=np.int64)
+        for c, v in _somar({c: nivel2[c].to_numpy() for c in SOMAS}, ini2).items():
+            nivel1[c] = v
+        self.lotes = adicionar_taxas(nivel1)
+
+        self._lote = {str(lote): i for i, lote in enumerate(self.lotes["Nº LOTE"])}
+        self._ini2, self._fim2 = ini2, _fins(ini2, len(nivel2))
+        self._lote_mun = {(str(lote), str(mun)): j for j, (lote, mun) in
+                          enumerate(zip(nivel2["Nº LOTE"], nivel2["Município"]))}
+        self._ini3, self._fim3 = ini3, _fins(ini3, len(base))
+
+    @property
+    def nbytes(self) -> int:
+        return int(sum(df.memory_usage(deep=True).sum()
+                       for df in (self.lotes, self.lote_municipio, self.lote_municipio_curso)))
+
+    def nomes_lotes(self) -> list:
+        return [str(lote) for lote in self.lotes["Nº LOTE"]]
+
+    def lote(self, lote) -> pd.Series | None:
+        """Linha do nível 1 (métricas do lote)."""
+        i = self._lote.get(str(lote))
+        return None if i is None else self.lotes.iloc[i]
+
+    def municipios(self, lote) -> pd.DataFrame:
+        """Nível 2: municípios do lote (fatia contígua)."""
+        i = self._lote.get(str(lote))
+        if i is None:
+            return self.lote_municipio.iloc[0:0]
+        return self.lote_municipio.iloc[self._ini2[i]:self._fim2[i]]
+
+    def cursos(self, lote, municipio) -> pd.DataFrame:
+        """Nível 3: cursos do município dentro do lote (fatia contígua)."""
+        j = self._lote_mun.get((str(lote), str(municipio)))
+        if j is None:
+            return self.lote_municipio_curso.iloc[0:0]
+        return self.lote_municipio_curso.iloc[self._ini3[j]:self._fim3[j]]
+
+    def valores_mapa(self, lote, camada: str, n_municipios: int) -> np.ndarray:
+        """Valor da camada por id de município, só com o lote (lido do nível 2)."""
+        arr = np.zeros(n_municipios)
+        fatia = self.municipios(lote)
+        if camada not in COLUNA_CAMADA or "id_municipio" not in fatia:
+            return arr
+        ids = fatia["id_municipio"].to_numpy()
+        ok = ids >= 0
+        if COLUNA_CAMADA[camada] is None:
+            arr[ids[ok]] = 1.0
+        else:
+            # dois nomes da base no mesmo município (alias) somam
+            np.add.at(arr, ids[ok], fatia[COLUNA_CAMADA[camada]].to_numpy(dtype=float)[ok])
+        return arr
@@ -0,0 +1,164 @@
+"""Ingestão da base agregada para um arquivo colunar (Parquet).
+
+O CSV é lido, validado e normalizado uma única vez: Município em UPPER,
+Município/CURSO/Nº LOTE como categóricos e as contagens como inteiros
+compactos. O Parquet guarda a impressão digital do CSV de origem e só é
+refeito quando o CSV muda; nos demais starts o app só lê o Parquet. As
+contagens chegam ao pandas sem cópia (apontam para os buffers do Arrow) e
+cada coluna do Arrow é liberada assim que convertida: o pico de memória da
+carga é uma base, não duas.
+
+    python -m qualificacao.ingestao
+"""
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+CSV_PADRAO = "data/agrupado_cursos_concluidos_em_execucao_sem_sebrae.csv"
+CATEGORICAS = ["Nº LOTE", "Município", "CURSO"]
+CONTAGENS = ["qtd_turmas", "qtd_inscritos", "qtd_vagas", "qtd_concludentes"]
+_CHAVE_META = b"qualificacao.origem"
+
+
+def caminho_parquet(csv: str) -> str:
+    return os.path.splitext(csv)[0] + ".parquet"
+
+
+def hash_arquivo(caminho: str) -> str:
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def ler_csv(csv: str) -> pd.DataFrame:
+    """Lê e normaliza o CSV agregado (mesmas regras do antigo load_data)."""
+    df = pd.read_csv(
+        csv,
+        encoding="utf-8",
+        sep=",",
+        dtype={"Nº LOTE": "string", "Município": "string", "CURSO": "string"},
+    )
+    # se vier uma coluna sem nome (índice exportado), descarte:
+    if df.columns[0].startswith(("Unnamed", ",")) or df.columns[0] == "":
+        df = df.drop(columns=[df.columns[0]])
+    return normalizar(df)
+
+
+def normalizar(df: pd.DataFrame) -> pd.DataFrame:
+    """Valida colunas, normaliza município e compacta os tipos."""
+    faltando = [c for c in ["Município", "CURSO"] if c not in df.columns]
+    if faltando:
+        raise ValueError(f"colunas obrigatórias ausentes: {faltando}")
+
+    df = df.copy()
+    if "Nº LOTE" not in df.columns:
+        df["Nº LOTE"] = ""
+    df["Município"] = df["Município"].str.strip().str.upper()
+    for col in CATEGORICAS:
+        df[col] = df[col].astype("string").fillna("").astype("category")
+    for col in CONTAGENS:
+        if col in df.columns:
+            valores = pd.to_numeric(df[col], errors="coerce").fillna(0)
+        else:
+            valores = pd.Series(0, index=df.index)
+        if (valores < 0).any():
+            raise ValueError(f"valores negativos em {col}")
+        df[col] = valores.round().astype("int32")
+    return df[CATEGORICAS + CONTAGENS].reset_index(drop=True)
+
+
+def _origem(csv: str) -> dict:
+    st = os.stat(csv)
+    return {"mtime_ns": st.st_mtime_ns, "tamanho": st.st_size}
+
+
+def _origem_gravada(parquet: str) -> dict | None:
+    import pyarrow.parquet as pq
+
+    try:
+        meta = pq.read_schema(parquet).metadata or {}
+    except (OSError, ValueError):
+        return None
+    bruto = meta.get(_CHAVE_META)
+    return json.loads(bruto) if bruto else None
+
+
+def ingerir(csv: str = CSV_PADRAO, parquet: str | None = None) -> str:
+    """Grava o Parquet normalizado do CSV; retorna o caminho gravado."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    parquet = parquet or caminho_parquet(csv)
+    df = ler_csv(csv)
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    origem = {**_origem(csv), "sha256": hash_arquivo(csv)}
+    meta = dict(tabela.schema.metadata or {})
+    meta[_CHAVE_META] = json.dumps(origem).encode("utf-8")
+    tabela = tabela.replace_schema_metadata(meta)
+
+    # grava ao lado e troca de uma vez (leitores nunca veem arquivo parcial)
+    tmp = parquet + ".tmp"
+    pq.write_table(tabela, tmp, compression="zstd")
+    os.replace(tmp, parquet)
+    return parquet
+
+
+def _regravar_origem(parquet: str, origem: dict):
+    """Troca só a impressão digital gravada no Parquet (sem reler o CSV)."""
+    import pyarrow.parquet as pq
+
+    tabela = pq.read_table(parquet)
+    meta = dict(tabela.schema.metadata or {})
+    meta[_CHAVE_META] = json.dumps(origem).encode("utf-8")
+    tmp = parquet + ".tmp"
+    pq.write_table(tabela.replace_schema_metadata(meta), tmp, compression="zstd")
+    os.replace(tmp, parquet)
+
+
+def precisa_reingerir(csv: str, parquet: str) -> bool:
+    gravada = _origem_gravada(parquet)
+    if gravada is None:
+        return True
+    atual = _origem(csv)
+    if atual["mtime_ns"] == gravada.get("mtime_ns") and atual["tamanho"] == gravada.get("tamanho"):
+        return False
+    # mtime mudou (cópia, checkout...): só refaz se o conteúdo mudou de fato
+    sha256 = hash_arquivo(csv)
+    if sha256 != gravada.get("sha256"):
+        return True
+    # mesmo conteúdo: grava o mtime novo para os próximos starts não refazerem o hash
+    _regravar_origem(parquet, {**atual, "sha256": sha256})
+    return False
+
+
+def garantir_parquet(csv: str = CSV_PADRAO, parquet: str | None = None) -> tuple[str, dict]:
+    """Refaz o Parquet se o CSV mudou; retorna (caminho, origem gravada)."""
+    parquet = parquet or caminho_parquet(csv)
+    if os.path.exists(csv) and (not os.path.exists(parquet) or precisa_reingerir(csv, parquet)):
+        ingerir(csv, parquet)
+    return parquet, _origem_gravada(parquet) or {}
+
+
+def carregar_dataset(csv: str = CSV_PADRAO, parquet: str | None = None) -> pd.DataFrame:
+    """DataFrame normalizado, lido do Parquet (refeito se o CSV mudou)."""
+    import pyarrow.parquet as pq
+
+    parquet, _ = garantir_parquet(csv, parquet)
+    # split_blocks: colunas sem nulos (as contagens) viram arrays sobre os buffers do Arrow,
+    # somente leitura; self_destruct: cada coluna do Arrow é solta logo depois de convertida
+    return pq.read_table(parquet, memory_map=True).to_pandas(split_blocks=True, self_destruct=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Gera o Parquet normalizado da base agregada.")
+    parser.add_argument("--csv", default=CSV_PADRAO)
+    parser.add_argument("--parquet", default=None)
+    args = parser.parse_args()
+    destino = ingerir(args.csv, args.parquet)
+    print(f"{destino}: {os.path.getsize(destino) / 1024:.0f} KiB")
@@ -0,0 +1,137 @@
+"""Cronometragem das etapas de cada rerun (diagnóstico).
+
+Ligada por ``QUALIFICACAO_DIAGNOSTICO=1``. Cada rerun (ou rerun só do
+fragmento do mapa) vira um registro com o tempo de cada etapa, valores
+como bytes do mapa e nº de feições, e as estatísticas dos caches. Os
+registros vão para um JSONL rotativo (``QUALIFICACAO_DIAGNOSTICO_LOG``) e
+para um histórico curto por sessão, mostrado no painel de admin.
+
+Desligada, `etapa()` devolve sempre o mesmo contexto nulo e `registrar()`
+não faz nada: o custo é uma leitura de ContextVar por chamada.
+"""
+import contextlib
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from collections import deque
+
+_NULO = contextlib.nullcontext()
+_atual = contextvars.ContextVar("qualificacao_rerun", default=None)
+
+
+class Rerun:
+    """Medições de uma execução do script (ou do fragmento)."""
+
+    def __init__(self, sessao: str, tipo: str):
+        self.sessao = sessao
+        self.tipo = tipo
+        self.inicio = time.perf_counter()
+        self.etapas = {}
+        self.valores = {}
+        self.token = None       # devolvido pelo ContextVar.set, para restaurar no fim
+
+    @contextlib.contextmanager
+    def etapa(self, nome: str):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.etapas[nome] = self.etapas.get(nome, 0.0) + (time.perf_counter() - t)
+
+    def registro(self) -> dict:
+        return {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "sessao": self.sessao,
+            "tipo": self.tipo,
+            "total_ms": round((time.perf_counter() - self.inicio) * 1000, 3),
+            "etapas_ms": {k: round(v * 1000, 3) for k, v in self.etapas.items()},
+            "valores": self.valores,
+        }
+
+
+class Instrumentacao:
+    def __init__(self, ativo: bool, log: str | None = None, max_bytes: int = 5 * 1024 * 1024,
+                 backups: int = 5, historico: int = 50):
+        self.ativo = ativo
+        self._historico = {}          # sessão -> deque de registros
+        self._max_historico = historico
+        self._lock = threading.Lock()
+        self._fontes = {}             # nome -> função que devolve stats de um cache
+        self._logger = None
+        if ativo and log:
+            os.makedirs(os.path.dirname(log) or ".", exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                log, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._logger = logging.getLogger(f"qualificacao.diagnostico.{id(self)}")
+            self._logger.propagate = False
+            self._logger.setLevel(logging.INFO)
+            self._logger.addHandler(handler)
+
+    @classmethod
+    def do_ambiente(cls) -> "Instrumentacao":
+        ativo = os.environ.get("QUALIFICACAO_DIAGNOSTICO", "").lower() in ("1", "true", "sim")
+        log = os.environ.get("QUALIFICACAO_DIAGNOSTICO_LOG", "logs/diagnostico.jsonl")
+        return cls(ativo, log)
+
+    def fonte_cache(self, nome: str, stats):
+        """Registra um cache cujas estatísticas entram em cada registro."""
+        self._fontes[nome] = stats
+
+    def iniciar(self, sessao: str, tipo: str = "script", aninhar: bool = False) -> Rerun | None:
+        """Começa a medir; com `aninhar`, reaproveita a medição em curso (fragmento)."""
+        if not self.ativo:
+            return None
+        if aninhar and _atual.get() is not None:
+            return None
+        rerun = Rerun(sessao, tipo)
+        rerun.token = _atual.set(rerun)
+        return rerun
+
+    @contextlib.contextmanager
+    def rerun(self, sessao: str, tipo: str = "script", aninhar: bool = False):
+        """`iniciar`/`finalizar` em volta de um bloco; fecha também quando st.rerun/st.stop saem por exceção."""
+        rerun = self.iniciar(sessao, tipo, aninhar)
+        try:
+            yield rerun
+        finally:
+            self.finalizar(rerun)
+
+    def finalizar(self, rerun: Rerun | None) -> dict | None:
+        if rerun is None:
+            return None
+        if rerun.token is not None:
+            try:
+                _atual.reset(rerun.token)
+            except ValueError:
+                # token de outro contexto: só não deixa a medição pendurada
+                if _atual.get() is rerun:
+                    _atual.set(None)
+            rerun.token = None
+        rerun.valores["caches"] = {nome: stats() for nome, stats in self._fontes.items()}
+        reg = rerun.registro()
+        with self._lock:
+            self._historico.setdefault(rerun.sessao, deque(maxlen=self._max_historico)).append(reg)
+        if self._logger is not None:
+            self._logger.info(json.dumps(reg, ensure_ascii=False, default=str))
+        return reg
+
+    def historico(self, sessao: str) -> list:
+        with self._lock:
+            return list(self._historico.get(sessao, ()))
+
+
+def etapa(nome: str):
+    """Contexto que cronometra `nome` no rerun atual (nulo se desligado)."""
+    rerun = _atual.get()
+    return _NULO if rerun is None else rerun.etapa(nome)
+
+
+def registrar(chave: str, valor):
+    rerun = _atual.get()
+    if rerun is not None:
+        rerun.valores[chave] = valor
@@ -0,0 +1,111 @@
+"""Motor único de KPIs do programa.
+
+Todos os indicadores (totais, cobertura, taxas, médias por turma) e os
+recortes por município, curso e lote saem de uma única passada vetorizada
+(`np.bincount` sobre os códigos categóricos do cubo). O resultado é um
+objeto imutável, seguro para cache.
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from qualificacao.cubo import METRICAS, codigos
+
+DIMENSOES = {"municipio": "Município", "curso": "CURSO", "lote": "Nº LOTE"}
+
+
+def _razao(num, den):
+    return (num / den) if den > 0 else None
+
+
+@dataclass(frozen=True)
+class ResultadoKPIs:
+    municipios_atendidos: int
+    total_municipios_ce: int | None
+    cobertura: float | None
+    cursos_distintos: int
+    lotes_distintos: int
+    total_turmas: int
+    total_concludentes: int
+    total_inscritos: int
+    total_vagas: int
+    taxa_conclusao_inscritos: float | None
+    taxa_conclusao_vagas: float | None
+    media_concludentes_por_turma: float | None
+    # recortes: índice = valor da dimensão, colunas = métricas + taxas
+    por_municipio: pd.DataFrame = field(repr=False, compare=False)
+    por_curso: pd.DataFrame = field(repr=False, compare=False)
+    por_lote: pd.DataFrame = field(repr=False, compare=False)
+
+    def recorte(self, dimensao: str) -> pd.DataFrame:
+        """Recorte por "municipio", "curso" ou "lote"."""
+        return {"municipio": self.por_municipio, "curso": self.por_curso,
+                "lote": self.por_lote}[dimensao]
+
+    def top(self, dimensao: str, metrica: str = "qtd_concludentes", n: int = 10) -> pd.DataFrame:
+        """Top N da dimensão pela métrica, no formato (coluna da dimensão, métrica)."""
+        rec = self.recorte(dimensao)
+        top = rec.sort_values(metrica, ascending=False, kind="stable").head(n)[[metrica]]
+        return top.rename_axis(DIMENSOES[dimensao]).reset_index()
+
+    @property
+    def nbytes(self) -> int:
+        return int(sum(df.memory_usage(deep=True).sum() for df in (self.por_municipio, self.por_curso, self.por_lote)))
+
+    def as_dict(self) -> dict:
+        return {k: v for k, v in self.__dict__.items() if not isinstance(v, pd.DataFrame)}
+
+
+def adicionar_taxas(rec: pd.DataFrame) -> pd.DataFrame:
+    """Acrescenta (in-place) as taxas dos cards a um recorte com as métricas somadas."""
+    turmas, inscritos, vagas = (rec[c].to_numpy(dtype=float) for c in ("qtd_turmas", "qtd_inscritos", "qtd_vagas"))
+    conc = rec["qtd_concludentes"].to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rec["taxa_conclusao_inscritos"] = np.where(inscritos > 0, conc / inscritos, np.nan)
+        rec["taxa_conclusao_vagas"] = np.where(vagas > 0, conc / vagas, np.nan)
+        rec["media_concludentes_por_turma"] = np.where(turmas > 0, conc / turmas, np.nan)
+    return rec
+
+
+def _recorte(codigos, categorias, pesos: dict, n_registros) -> pd.DataFrame:
+    n = len(categorias)
+    dados = {m: np.bincount(codigos, weights=w, minlength=n) for m, w in pesos.items()}
+    dados["n_registros"] = np.bincount(codigos, weights=n_registros, minlength=n)
+    rec = pd.DataFrame(dados, index=pd.Index(categorias.astype(str)))
+    return adicionar_taxas(rec[rec["n_registros"] > 0].astype("int64"))
+
+
+def calcular_kpis(cubo: pd.DataFrame, total_municipios_ce: int | None = None,
+                  mascara: np.ndarray | None = None) -> ResultadoKPIs:
+    """KPIs do cubo; `mascara` (bool por linha do cubo) restringe o cálculo sem copiar linhas."""
+    peso = np.ones(len(cubo)) if mascara is None else np.asarray(mascara, dtype=float)
+    pesos = {m: cubo[m].to_numpy(dtype=float) * peso for m in METRICAS}
+    n_registros = (cubo["n_registros"].to_numpy(dtype=float) if "n_registros" in cubo else np.ones(len(cubo))) * peso
+
+    recortes = {}
+    for nome, coluna in DIMENSOES.items():
+        cod, categorias = codigos(cubo[coluna])
+        validos = cod >= 0
+        recortes[nome] = _recorte(cod[validos], categorias,
+                                  {m: w[validos] for m, w in pesos.items()}, n_registros[validos])
+
+    tot = {m: int(round(w.sum())) for m, w in pesos.items()}
+    municipios_atendidos = len(recortes["municipio"])
+    return ResultadoKPIs(
+        municipios_atendidos=municipios_atendidos,
+        total_municipios_ce=total_municipios_ce,
+        cobertura=_razao(municipios_atendidos, total_municipios_ce or 0),
+        cursos_distintos=len(recortes["curso"]),
+        lotes_distintos=len(recortes["lote"]),
+        total_turmas=tot["qtd_turmas"],
+        total_concludentes=tot["qtd_concludentes"],
+        total_inscritos=tot["qtd_inscritos"],
+        total_vagas=tot["qtd_vagas"],
+        taxa_conclusao_inscritos=_razao(tot["qtd_concludentes"], tot["qtd_inscritos"]),
+        taxa_conclusao_vagas=_razao(tot["qtd_concludentes"], tot["qtd_vagas"]),
+        media_concludentes_por_turma=_razao(tot["qtd_concludentes"], tot["qtd_turmas"]),
+        por_municipio=recortes["municipio"],
+        por_curso=recortes["curso"],
+        por_lote=recortes["lote"],
+    )
@@ -0,0 +1,69 @@
+"""Localização ponto -> município para os cliques no mapa.
+
+Caminho rápido: o `st_folium` devolve, com o clique, o texto do tooltip da
+feição (``last_object_clicked_tooltip``), cuja primeira linha é o NM_MUN; o
+id sai dele pela tabela de municípios. Fallback (tooltip ausente): índice
+espacial (STRtree) sobre geometrias preparadas, construído uma vez por
+processo e só quando algum clique precisar dele. A posição da geometria na
+árvore é o próprio id do município.
+"""
+import re
+
+import numpy as np
+
+
+def municipio_do_tooltip(texto: str | None, municipios) -> int | None:
+    """id do município pelo texto do tooltip clicado (rótulo "Município:" e o nome primeiro), sem geometria."""
+    # conforme o navegador, rótulo e valor vêm na mesma linha (tab) ou em linhas separadas
+    partes = [p.strip() for p in re.split(r"[\t\r\n]+", str(texto or "")) if p.strip()]
+    if not partes:
+        return None
+    rotulo, sep, nome = partes[0].partition(":")
+    nome = nome.strip() if sep else rotulo
+    if not nome and len(partes) > 1:
+        nome = partes[1]
+    i = municipios.id_de(nome)
+    return i if i >= 0 else None
+
+
+class LocalizadorMunicipios:
+    """Índice espacial dos municípios (EPSG:4326) para consultas ponto-em-polígono."""
+
+    def __init__(self, geojson: dict, tolerancia: float = 0.0001):
+        import shapely
+        from shapely.geometry import shape
+
+        feats = geojson["features"]
+        self.tolerancia = tolerancia
+        self._geoms = np.array([shape(f["geometry"]) for f in feats], dtype=object)
+        shapely.prepare(self._geoms)
+        self._arvore = shapely.STRtree(self._geoms)
+
+    def localizar(self, lon: float, lat: float) -> int | None:
+        return self.localizar_varios([lon], [lat])[0]
+
+    def localizar_varios(self, lons, lats) -> list:
+        """id do município de cada ponto (None fora do estado), em uma consulta vetorizada."""
+        import shapely
+
+        pts = shapely.points(np.asarray(lons, dtype=float), np.asarray(lats, dtype=float))
+        idx = np.full(len(pts), -1, dtype=np.int64)
+
+        i_pt, i_geom = self._arvore.query(pts, predicate="intersects")
+        # na fronteira entre dois municípios, fica o primeiro
+        idx[i_pt[::-1]] = i_geom[::-1]
+
+        # cliques na borda (~10m): município mais próximo dentro da tolerância
+        faltando = np.flatnonzero(idx < 0)
+        if len(faltando) and self.tolerancia:
+            j_pt, j_geom = self._arvore.query_nearest(
+                pts[faltando], max_distance=self.tolerancia, all_matches=False)
+            idx[faltando[j_pt]] = j_geom
+
+        return [int(i) if i >= 0 else None for i in idx]
+
+    def resolver(self, evt: dict | None) -> int | None:
+        """id do município para um evento de clique do st_folium (None sem lat/lng ou fora do estado)."""
+        if not evt or "lat" not in evt or "lng" not in evt:
+            return None
+        return self.localizar(evt["lng"], evt["lat"])
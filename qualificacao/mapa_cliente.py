@@ -0,0 +1,142 @@
+"""Mapa com filtro de cursos e troca de camada feitos no navegador.
+
+Componente próprio (``componentes/mapa_cliente``: HTML + JS puro, com
+Leaflet). O navegador recebe, uma única vez, dois JSON publicados em
+``static/mapa_cliente`` (servidos em ``/app/static``, nome = hash do
+conteúdo, então o cache HTTP vale para sempre):
+
+- a geometria (LOD mais leve), com o id do município como id da feição;
+- a tabela Município × CURSO com códigos inteiros no lugar dos nomes:
+  colunas ``m`` (id do município), ``c`` (código do curso), ``n``
+  (registros), ``conc`` (concludentes) e ``turmas``.
+
+Filtrar cursos, trocar entre as quatro camadas e recolorir (mesmas regras de
+`classificacao`) acontecem no navegador, sem rerun. O servidor só volta a ser
+chamado no clique em um município, para abrir o modal.
+
+Os demais filtros (lote, município, faixas) continuam no servidor: mudam a
+tabela publicada, não o componente.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from qualificacao.classificacao import COR_AUSENTE, COR_COM, COR_SEM, CONFIG_CAMADAS
+from qualificacao.cubo import COLUNA_CAMADA, codigos
+
+DESTINO_PADRAO = "static/mapa_cliente"
+URL_PADRAO = "app/static/mapa_cliente"
+FRONTEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "componentes", "mapa_cliente")
+
+# camada -> coluna da tabela publicada (None = presença)
+COLUNA_TABELA = {"n_registros": "n", "qtd_concludentes": "conc", "qtd_turmas": "turmas"}
+
+_componente = None
+
+
+def tabela_cliente(cubo: pd.DataFrame, mascara: np.ndarray | None = None) -> dict:
+    """Município × CURSO somado (linhas da `mascara`), com códigos inteiros."""
+    ids = cubo["id_municipio"].to_numpy() if "id_municipio" in cubo else np.full(len(cubo), -1)
+    cod_curso, cursos = codigos(cubo["CURSO"])
+    ok = (ids >= 0) & (cod_curso >= 0)
+    if mascara is not None:
+        ok &= np.asarray(mascara, dtype=bool)
+    ids, cod_curso = ids[ok].astype(np.int64), cod_curso[ok].astype(np.int64)
+
+    # só os cursos que aparecem, recodificados 0..k-1 em ordem alfabética
+    usados, cod_curso = np.unique(cod_curso, return_inverse=True)
+    n_cursos = max(len(usados), 1)
+    pares, inverso = np.unique(ids * n_cursos + cod_curso, return_inverse=True)
+    somas = {
+        COLUNA_TABELA[col]: np.bincount(inverso, weights=cubo[col].to_numpy(dtype=float)[ok],
+                                        minlength=len(pares)).round().astype(np.int64).tolist()
+        for col in COLUNA_TABELA
+    }
+    return {
+        "cursos": [str(c) for c in np.asarray(cursos)[usados]],
+        "m": (pares // n_cursos).tolist(),
+        "c": (pares % n_cursos).tolist(),
+        **somas,
+    }
+
+
+def geometria_cliente(geometria) -> dict:
+    """FeatureCollection com id = id do município e só o nome como propriedade."""
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {"type": "Feature", "id": i, "properties": {"nome": nome}, "geometry": f["geometry"]}
+            for i, (nome, f) in enumerate(zip(geometria.nomes, geometria.geojson["features"]))
+        ],
+    }
+
+
+def configuracao() -> dict:
+    """Regras de cor de cada camada (paletas do branca, quebras fixas, pisos)."""
+    from branca.colormap import linear
+
+    camadas = {}
+    for camada, coluna in COLUNA_CAMADA.items():
+        cfg = {"coluna": COLUNA_TABELA.get(coluna)}
+        if camada in CONFIG_CAMADAS:
+            paleta, fixas, piso_max, cinza = CONFIG_CAMADAS[camada]
+            base = getattr(linear, paleta)
+            cfg.update(paleta=[list(c) for c in base.colors], indice=list(base.index),
+                       fixas=fixas, piso=piso_max, cinza=cinza)
+        camadas[camada] = cfg
+    return {"camadas": camadas, "cores": {"com": COR_COM, "sem": COR_SEM, "ausente": COR_AUSENTE}}
+
+
+def publicar(conteudo: dict, prefixo: str, destino: str = DESTINO_PADRAO, max_arquivos: int = 256) -> str:
+    """Grava o JSON (nome = hash do conteúdo) se ainda não existir; retorna o nome do arquivo.
+
+    Além de `max_arquivos` com o mesmo prefixo, os mais antigos são apagados.
+    """
+    dados = json.dumps(conteudo, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    nome = f"{prefixo}-{hashlib.sha1(dados).hexdigest()[:16]}.json"
+    caminho = os.path.join(destino, nome)
+    if not os.path.exists(caminho):
+        os.makedirs(destino, exist_ok=True)
+        tmp = f"{caminho}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(dados)
+        os.replace(tmp, caminho)
+        arquivos = sorted((e for e in os.scandir(destino)
+                           if e.name.startswith(prefixo + "-") and e.name.endswith(".json") and e.name != nome),
+                          key=lambda e: e.stat().st_mtime)
+        for e in arquivos[:max(len(arquivos) + 1 - max_arquivos, 0)]:
+            os.remove(e.path)
+    else:
+        os.utime(caminho)
+    return nome
+
+
+def publicado(nome: str, destino: str = DESTINO_PADRAO) -> bool:
+    return os.path.exists(os.path.join(destino, nome))
+
+
+def mapa_cliente(geometria: str, tabela: str, camada: str, esquema: str = "fixo", cursos=(),
+                 config: dict | None = None, map_state: dict | None = None, altura: int = 600,
+                 url: str = URL_PADRAO, key=None):
+    """Exibe o componente; retorna o último clique ({municipio, cursos, camada, clique}) ou None."""
+    global _componente
+    if _componente is None:
+        import streamlit.components.v1 as components
+
+        _componente = components.declare_component("mapa_cliente", path=FRONTEND)
+    return _componente(
+        base=url.rstrip("/") + "/",
+        geometria=geometria,
+        tabela=tabela,
+        camada=camada,
+        esquema=esquema,
+        cursos=list(cursos),
+        config=config or configuracao(),
+        mapa=map_state or {},
+        altura=altura,
+        key=key,
+        default=None,
+    )
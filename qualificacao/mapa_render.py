@@ -0,0 +1,182 @@
+"""Serialização do mapa folium em um payload reaproveitável.
+
+`st_folium` renderiza o mapa inteiro (HTML, JS do Leaflet e GeoJSON) a cada
+chamada. Aqui a renderização é feita uma vez e o resultado — apenas strings —
+pode ser compartilhado entre sessões e reenviado ao componente sem refazer
+o trabalho.
+
+folium, branca e streamlit_folium só são importados quando um mapa é de fato
+renderizado ou exibido (não pesam no start do app).
+
+O reenvio usa funções internas do streamlit_folium (versão fixada em
+``requirements.txt``). Se alguma faltar, o payload guarda o próprio mapa e a
+exibição cai no `st_folium` público, sem o reaproveitamento.
+"""
+import functools
+import logging
+from dataclasses import dataclass, field
+
+log = logging.getLogger(__name__)
+
+# internos do streamlit_folium usados aqui (testados com 0.27.*)
+_INTERNOS = ("_get_html", "_get_header", "_get_map_string", "_get_feature_group_string",
+             "get_full_id", "_component_func", "generate_js_hash")
+
+
+@dataclass(frozen=True)
+class MapaRenderizado:
+    script: str
+    header: str
+    html: str
+    map_id: str
+    feature_group: str | None
+    css_links: tuple
+    js_links: tuple
+    bounds: list
+    zoom: int | None
+    n_features: int = 0
+    nbytes: int = field(default=0, compare=False)
+    # só sem os internos: o folium.Map e as camadas, exibidos pelo st_folium público
+    mapa: object = field(default=None, repr=False, compare=False)
+    feature_groups: tuple = field(default=(), repr=False, compare=False)
+
+
+@functools.cache
+def _stf():
+    """O módulo streamlit_folium, ou None se faltar algum dos internos usados aqui."""
+    import streamlit_folium as stf
+
+    faltando = [nome for nome in _INTERNOS if not hasattr(stf, nome)]
+    if faltando:
+        log.warning("streamlit_folium sem %s: mapas exibidos pelo st_folium, sem reaproveitar a renderização",
+                    ", ".join(faltando))
+        return None
+    return stf
+
+
+def _links(folium_map):
+    import branca
+    import folium.elements
+
+    def walk(fig):
+        if isinstance(fig, branca.colormap.ColorMap):
+            yield fig
+        if isinstance(fig, folium.elements.JSCSSMixin):
+            yield fig
+        if hasattr(fig, "_children"):
+            for child in fig._children.values():
+                yield from walk(child)
+
+    css_links, js_links = [], []
+    for elem in walk(folium_map):
+        if isinstance(elem, branca.colormap.ColorMap):
+            # d3 é necessário para a legenda do colormap
+            js_links.insert(0, "https://cdnjs.cloudflare.com/ajax/libs/d3/3.5.5/d3.min.js")
+            js_links.insert(0, "https://d3js.org/d3.v4.min.js")
+        css_links.extend(href for _, href in getattr(elem, "default_css", []))
+        js_links.extend(src for _, src in getattr(elem, "default_js", []))
+    return tuple(dict.fromkeys(css_links)), tuple(dict.fromkeys(js_links))
+
+
+def renderizar_mapa(m, feature_groups=(), n_features: int = 0) -> MapaRenderizado:
+    """Renderiza `m` (folium.Map; mesmo procedimento do `st_folium`) e congela o resultado."""
+    stf = _stf()
+    if stf is None:
+        html = m.get_root().render()
+        return MapaRenderizado(
+            script="", header="", html="", map_id="", feature_group=None, css_links=(), js_links=(),
+            bounds=[[None, None], [None, None]], zoom=m.options.get("zoom"), n_features=n_features,
+            nbytes=len(html), mapa=m, feature_groups=tuple(feature_groups),
+        )
+
+    m.get_root().render()
+    m.render()
+    html = stf._get_html(m)
+    header = stf._get_header(m)
+    script = stf._get_map_string(m)
+    map_id = stf.get_full_id(m)
+
+    feature_group = None
+    if feature_groups:
+        feature_group = "".join(
+            stf._get_feature_group_string(fg, map=m, idx=idx)
+            for idx, fg in enumerate(feature_groups)
+        )
+
+    try:
+        bounds = m.get_bounds()
+    except AttributeError:
+        bounds = [[None, None], [None, None]]
+
+    css_links, js_links = _links(m)
+    nbytes = sum(len(s) for s in (script, header, html, feature_group or ""))
+    return MapaRenderizado(
+        script=script, header=header, html=html, map_id=map_id,
+        feature_group=feature_group, css_links=css_links, js_links=js_links,
+        bounds=bounds, zoom=m.options.get("zoom"), n_features=n_features,
+        nbytes=nbytes,
+    )
+
+
+def chave_componente(payload: MapaRenderizado, key: str | None = None) -> str | None:
+    """Chave do componente (e do valor dele em `st.session_state`): a do `st_folium`; None sem os internos."""
+    stf = _stf()
+    if stf is None or payload.mapa is not None:
+        return None
+    return stf.generate_js_hash(payload.script, key, False)
+
+
+def st_folium_renderizado(payload: MapaRenderizado, *, height: int = 700, width=None,
+                          returned_objects=None, key: str | None = None):
+    """Equivalente ao `st_folium`, mas a partir de um payload já renderizado."""
+    stf = _stf()
+    if stf is None or payload.mapa is not None:
+        import streamlit_folium
+
+        return streamlit_folium.st_folium(
+            payload.mapa, feature_group_to_add=list(payload.feature_groups) or None, height=height,
+            width=width, returned_objects=returned_objects, key=key)
+
+    (sw_lat, sw_lng), (ne_lat, ne_lng) = payload.bounds
+    _defaults = {
+        "last_clicked": None,
+        "last_object_clicked": None,
+        "last_object_clicked_count": None,
+        "last_object_clicked_tooltip": None,
+        "last_object_clicked_popup": None,
+        "all_drawings": None,
+        "last_active_drawing": None,
+        "bounds": {"_southWest": {"lat": sw_lat, "lng": sw_lng},
+                   "_northEast": {"lat": ne_lat, "lng": ne_lng}},
+        "zoom": payload.zoom,
+        "last_circle_radius": None,
+        "last_circle_polygon": None,
+        "selected_layers": None,
+        "selected_tags": None,
+        "last_geocoder_result": None,
+    }
+    defaults = {
+        k: v for k, v in _defaults.items()
+        if returned_objects is None or k in returned_objects
+    }
+
+    return stf._component_func(
+        script=payload.script,
+        header=payload.header,
+        html=payload.html,
+        id=payload.map_id,
+        key=chave_componente(payload, key),
+        height=height,
+        width=width,
+        returned_objects=returned_objects,
+        default=defaults,
+        zoom=None,
+        center=None,
+        feature_group=payload.feature_group,
+        return_on_hover=False,
+        layer_control=None,
+        pixelated=False,
+        css_links=list(payload.css_links),
+        js_links=list(payload.js_links),
+        wrap_longitude=False,
+    )
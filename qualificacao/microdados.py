@@ -0,0 +1,425 @@
+"""Agregação dos microdados de matrícula em streaming, com anexação incremental.
+
+Os microdados têm uma linha por inscrição (aluno × turma). Eles viram a base
+agregada que o app lê (``Nº LOTE, Município, CURSO, qtd_turmas,
+qtd_inscritos, qtd_vagas, qtd_concludentes``) em duas etapas:
+
+1. cada arquivo é reduzido a parciais por turma (inscritos, concludentes e
+   vagas), gravadas em ``<estado>/parciais/<sha256>.parquet``;
+2. as parciais de todos os arquivos são combinadas (turma → curso) e o CSV
+   agregado é regravado de uma vez. O `Atualizador` do app detecta a troca.
+
+A memória fica limitada pelo número de turmas, não de linhas. Com DuckDB
+instalado (``pip install duckdb``), a etapa 1 é uma consulta fora da memória
+e multi-thread (``memory_limit`` e ``temp_directory`` para derramar em disco).
+Sem ele, o CSV é lido em blocos pelo leitor em streaming do pyarrow e cada
+bloco é reduzido com o group_by do Arrow; os arquivos são repartidos entre
+processos.
+
+O manifesto (``<estado>/manifesto.json``) registra o hash de cada arquivo
+já agregado. Rodar de novo só processa arquivos novos ou alterados; um
+arquivo alterado substitui a própria parcial. Cópias idênticas de um arquivo
+já agregado são ignoradas.
+
+    python -m qualificacao.microdados data/microdados/*.csv --sep ";" --encoding latin-1
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from qualificacao.ingestao import CSV_PADRAO, hash_arquivo
+from qualificacao.municipios import chave_nome
+
+ESTADO_PADRAO = "data/microdados_estado"
+
+# coluna lógica -> nome na exportação (lote e vagas são opcionais)
+COLUNAS_PADRAO = {
+    "lote": "Nº LOTE",
+    "municipio": "Município",
+    "curso": "CURSO",
+    "turma": "ID_TURMA",
+    "vagas": "VAGAS_TURMA",
+    "situacao": "SITUACAO",
+}
+OBRIGATORIAS = ("municipio", "curso", "turma", "situacao")
+# situações (comparadas sem acento/pontuação) que contam como concludente
+SITUACOES_CONCLUIDO = ("CONCLUIDO", "CONCLUIDA", "CONCLUDENTE", "APROVADO")
+
+CHAVES_TURMA = ["lote", "municipio", "curso", "turma"]
+SAIDA = ["Nº LOTE", "Município", "CURSO", "qtd_turmas", "qtd_inscritos", "qtd_vagas", "qtd_concludentes"]
+
+
+def motor_disponivel(motor: str = "auto") -> str:
+    """Motor da etapa 1: DuckDB se pedido/instalado; senão o leitor do pyarrow."""
+    if motor in ("auto", "duckdb"):
+        try:
+            import duckdb  # noqa: F401
+            return "duckdb"
+        except ImportError:
+            if motor == "duckdb":
+                raise
+    return "arrow"
+
+
+def colunas_do_arquivo(caminho: str, sep: str = ",", encoding: str = "utf-8") -> list:
+    """Cabeçalho do arquivo (lê só o primeiro bloco)."""
+    import pyarrow.parquet as pq
+    from pyarrow import csv as pacsv
+
+    if caminho.endswith(".parquet"):
+        return pq.read_schema(caminho).names
+    leitor = pacsv.open_csv(caminho, read_options=pacsv.ReadOptions(encoding=encoding, block_size=1 << 16),
+                            parse_options=pacsv.ParseOptions(delimiter=sep))
+    return leitor.schema.names
+
+
+def _resolver_colunas(caminho: str, colunas: dict, sep: str, encoding: str) -> dict:
+    """coluna lógica -> coluna presente no arquivo (None para opcional ausente)."""
+    presentes = set(colunas_do_arquivo(caminho, sep, encoding))
+    faltando = [colunas[c] for c in OBRIGATORIAS if colunas[c] not in presentes]
+    if faltando:
+        raise ValueError(f"{caminho}: colunas obrigatórias ausentes: {faltando}")
+    return {c: (nome if nome in presentes else None) for c, nome in colunas.items()}
+
+
+# =========================
+# Etapa 1: arquivo -> parciais por turma
+# =========================
+
+def _texto(lote, coluna):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if coluna is None:
+        return pa.nulls(lote.num_rows, pa.string()).fill_null("")
+    return pc.utf8_trim_whitespace(lote.column(coluna).fill_null(""))
+
+
+def _concluiu(situacao, concluido):
+    """1 por inscrição concludente; normaliza cada situação distinta uma vez."""
+    import pyarrow as pa
+
+    alvo = {chave_nome(s) for s in concluido}
+    cod = situacao.dictionary_encode()
+    marcados = pa.array([int(chave_nome(v) in alvo) for v in cod.dictionary.to_pylist()], pa.int64())
+    return marcados.take(cod.indices)
+
+
+def _numero(texto):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    valido = pc.match_substring_regex(texto, r"^[+-]?[0-9]+([.,][0-9]*)?$")
+    return pc.cast(pc.replace_substring(pc.if_else(valido, texto, "0"), ",", "."), pa.float64())
+
+
+def _somar_turmas(tabela, contar: bool):
+    """Agrupa por turma: inscritos (linhas ou soma), concludentes (soma) e vagas (maior)."""
+    agg = [("concludentes", "sum"), ("vagas", "max"), ("concludentes", "count") if contar else ("inscritos", "sum")]
+    r = tabela.group_by(CHAVES_TURMA, use_threads=False).aggregate(agg)
+    inscritos = "concludentes_count" if contar else "inscritos_sum"
+    return r.select(CHAVES_TURMA + [inscritos, "concludentes_sum", "vagas_max"]).rename_columns(
+        CHAVES_TURMA + ["inscritos", "concludentes", "vagas"])
+
+
+def parciais_de_bloco(lote, colunas: dict, concluido=SITUACOES_CONCLUIDO):
+    """Parciais por turma (tabela Arrow) de um bloco de linhas; uma linha = uma inscrição."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    vagas = _numero(_texto(lote, colunas["vagas"])) if colunas.get("vagas") else pa.nulls(
+        lote.num_rows, pa.float64()).fill_null(0.0)
+    tabela = pa.table({
+        "lote": _texto(lote, colunas.get("lote")),
+        "municipio": pc.utf8_upper(_texto(lote, colunas["municipio"])),
+        "curso": _texto(lote, colunas["curso"]),
+        "turma": _texto(lote, colunas["turma"]),
+        "concludentes": _concluiu(_texto(lote, colunas["situacao"]), concluido),
+        "vagas": vagas,
+    })
+    return _somar_turmas(tabela, contar=True)
+
+
+def combinar_turmas(parciais: pd.DataFrame) -> pd.DataFrame:
+    """Soma parciais da mesma turma (vagas: a maior informada)."""
+    return (parciais.groupby(CHAVES_TURMA, as_index=False, sort=False, observed=True)
+                    .agg(inscritos=("inscritos", "sum"), concludentes=("concludentes", "sum"),
+                         vagas=("vagas", "max")))
+
+
+def _blocos_arrow(caminho: str, nomes: list, sep: str, encoding: str, bloco_mb: int):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from pyarrow import csv as pacsv
+
+    if caminho.endswith(".parquet"):
+        yield from pq.ParquetFile(caminho).iter_batches(batch_size=1 << 16, columns=nomes)
+        return
+    # o leitor lê vários blocos adiante: a memória acompanha o tamanho do bloco
+    yield from pacsv.open_csv(
+        caminho,
+        read_options=pacsv.ReadOptions(encoding=encoding, block_size=bloco_mb << 20),
+        parse_options=pacsv.ParseOptions(delimiter=sep),
+        convert_options=pacsv.ConvertOptions(include_columns=nomes,
+                                             column_types={c: pa.string() for c in nomes}),
+    )
+
+
+def agregar_arquivo_arrow(caminho: str, colunas: dict, concluido=SITUACOES_CONCLUIDO, sep: str = ",",
+                          encoding: str = "utf-8", bloco_mb: int = 1, compactar_em: int = 500_000) -> pd.DataFrame:
+    """Parciais por turma lendo o arquivo em blocos (memória ~ blocos lidos adiante + turmas)."""
+    import pyarrow as pa
+
+    nomes = [n for n in colunas.values() if n is not None]
+    acumulado, linhas = [], 0
+    for bloco in _blocos_arrow(caminho, nomes, sep, encoding, bloco_mb):
+        acumulado.append(parciais_de_bloco(bloco, colunas, concluido))
+        linhas += acumulado[-1].num_rows
+        if linhas > compactar_em:
+            # mantém o acumulado no tamanho do nº de turmas já vistas
+            acumulado = [_somar_turmas(pa.concat_tables(acumulado), contar=False)]
+            linhas = acumulado[0].num_rows
+    if not acumulado:
+        return _parciais_vazias()
+    df = _somar_turmas(pa.concat_tables(acumulado), contar=False).to_pandas()
+    return df.astype({"inscritos": "int64", "concludentes": "int64", "vagas": "float64"})
+
+
+def _ident(nome: str) -> str:
+    return '"' + nome.replace('"', '""') + '"'
+
+
+def agregar_arquivo_duckdb(caminho: str, colunas: dict, concluido=SITUACOES_CONCLUIDO, sep: str = ",",
+                           encoding: str = "utf-8", con=None) -> pd.DataFrame:
+    """Parciais por turma numa consulta DuckDB (fora da memória, multi-thread)."""
+    import duckdb
+
+    con = con or duckdb.connect()
+    texto = lambda c: (f"trim(coalesce(CAST({_ident(colunas[c])} AS VARCHAR), ''))"
+                       if colunas.get(c) else "''")
+    # mesma normalização de chave_nome: sem acento, pontuação vira espaço, maiúsculas
+    situacao = (f"trim(regexp_replace(upper(strip_accents({texto('situacao')})), '[^0-9A-Z]+', ' ', 'g'))")
+    # vírgula decimal aceita como em _numero
+    vagas = (f"TRY_CAST(replace(trim(CAST({_ident(colunas['vagas'])} AS VARCHAR)), ',', '.') AS DOUBLE)"
+             if colunas.get("vagas") else "0.0")
+    if caminho.endswith(".parquet"):
+        origem = "read_parquet(?)"
+    else:
+        delim = sep.replace("'", "''")
+        origem = f"read_csv(?, delim = '{delim}', header = true, all_varchar = true, encoding = '{encoding}')"
+    alvo = ", ".join("'" + chave_nome(s).replace("'", "''") + "'" for s in concluido)
+    sql = f"""
+        SELECT {texto('lote')} AS lote,
+               upper({texto('municipio')}) AS municipio,
+               {texto('curso')} AS curso,
+               {texto('turma')} AS turma,
+               count(*) AS inscritos,
+               count(*) FILTER (WHERE {situacao} IN ({alvo})) AS concludentes,
+               coalesce(max({vagas}), 0.0) AS vagas
+        FROM {origem}
+        GROUP BY ALL
+    """
+    df = con.execute(sql, [caminho]).df()
+    return df.astype({"inscritos": "int64", "concludentes": "int64", "vagas": "float64"})
+
+
+def _parciais_vazias() -> pd.DataFrame:
+    return pd.DataFrame({c: pd.Series(dtype="string") for c in CHAVES_TURMA}
+                        | {"inscritos": pd.Series(dtype="int64"), "concludentes": pd.Series(dtype="int64"),
+                           "vagas": pd.Series(dtype="float64")})
+
+
+def _gravar_parquet(df: pd.DataFrame, destino: str):
+    tmp = destino + ".tmp"
+    df.to_parquet(tmp, index=False, compression="zstd")
+    os.replace(tmp, destino)
+
+
+def _tarefa_arrow(caminho: str, destino: str, colunas: dict, concluido, sep, encoding, bloco_mb) -> int:
+    # roda num processo do pool: grava a parcial e devolve o nº de inscrições
+    df = agregar_arquivo_arrow(caminho, colunas, concluido, sep, encoding, bloco_mb)
+    _gravar_parquet(df, destino)
+    return int(df["inscritos"].sum())
+
+
+# =========================
+# Etapa 2: parciais -> base agregada
+# =========================
+
+def agregar_cursos(turmas: pd.DataFrame) -> pd.DataFrame:
+    """Turmas -> linhas da base agregada (Nº LOTE × Município × CURSO)."""
+    cursos = (turmas.groupby(["lote", "municipio", "curso"], as_index=False, sort=True, observed=True)
+                    .agg(qtd_turmas=("turma", "size"), qtd_inscritos=("inscritos", "sum"),
+                         qtd_vagas=("vagas", "sum"), qtd_concludentes=("concludentes", "sum")))
+    cursos["qtd_vagas"] = cursos["qtd_vagas"].round().astype("int64")
+    return cursos.rename(columns={"lote": "Nº LOTE", "municipio": "Município", "curso": "CURSO"})[SAIDA]
+
+
+def gravar_agregado(parciais: list, saida: str) -> pd.DataFrame:
+    """Combina as parciais (arquivos Parquet) e troca o CSV agregado de uma vez."""
+    tabelas = [pd.read_parquet(p) for p in parciais]
+    turmas = combinar_turmas(pd.concat(tabelas, ignore_index=True)) if tabelas else _parciais_vazias()
+    base = agregar_cursos(turmas)
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    tmp = saida + ".tmp"
+    base.to_csv(tmp, index=False, encoding="utf-8")
+    os.replace(tmp, saida)
+    return base
+
+
+# =========================
+# Estado incremental
+# =========================
+
+def _ler_manifesto(estado: str) -> dict:
+    try:
+        with open(os.path.join(estado, "manifesto.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"config": None, "arquivos": {}}
+
+
+def _gravar_manifesto(estado: str, manifesto: dict):
+    caminho = os.path.join(estado, "manifesto.json")
+    with open(caminho + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=2)
+    os.replace(caminho + ".tmp", caminho)
+
+
+def atualizar(arquivos, estado: str = ESTADO_PADRAO, saida: str = CSV_PADRAO, colunas: dict | None = None,
+              concluido=SITUACOES_CONCLUIDO, motor: str = "auto", processos: int | None = None,
+              memoria_mb: int = 1024, sep: str = ",", encoding: str = "utf-8", refazer: bool = False) -> dict:
+    """Agrega os arquivos novos/alterados e regrava `saida`; retorna um relatório."""
+    inicio = time.perf_counter()
+    colunas = {**COLUNAS_PADRAO, **(colunas or {})}
+    processos = processos or os.cpu_count() or 1
+    motor = motor_disponivel(motor)
+    dir_parciais = os.path.join(estado, "parciais")
+    os.makedirs(dir_parciais, exist_ok=True)
+
+    config = {"colunas": colunas, "concluido": sorted(chave_nome(s) for s in concluido)}
+    manifesto = {"config": config, "arquivos": {}} if refazer else _ler_manifesto(estado)
+    if manifesto["config"] not in (None, config):
+        raise ValueError("colunas/situações diferentes das usadas no estado atual: rode com --refazer")
+    manifesto["config"] = config
+    registrados = manifesto["arquivos"]
+
+    # o que é novo ou mudou (hash só quando mtime/tamanho mudaram)
+    pendentes, ignorados, removidos = [], [], []
+    for caminho in dict.fromkeys(os.path.abspath(a) for a in arquivos):
+        info = os.stat(caminho)
+        atual = registrados.get(caminho)
+        if atual and (atual["mtime_ns"], atual["tamanho"]) == (info.st_mtime_ns, info.st_size):
+            ignorados.append(caminho)
+            continue
+        sha = hash_arquivo(caminho)
+        outros = {c for c, r in registrados.items() if r["sha256"] == sha}
+        if outros:
+            # já agregado (este mesmo arquivo tocado, ou uma cópia): não conta de novo
+            if caminho in outros:
+                atual.update(mtime_ns=info.st_mtime_ns, tamanho=info.st_size)
+            elif atual:
+                # mudou e virou cópia de outro: a parcial da versão antiga não pode ficar na saída
+                del registrados[caminho]
+                removidos.append(caminho)
+                continue
+            ignorados.append(caminho)
+            continue
+        pendentes.append((caminho, sha, info))
+
+    # etapa 1: uma parcial por arquivo pendente
+    linhas = {}
+    if pendentes:
+        resolvidas = {c: _resolver_colunas(c, colunas, sep, encoding) for c, _, _ in pendentes}
+        destino = {c: os.path.join(dir_parciais, f"{sha}.parquet") for c, sha, _ in pendentes}
+        if motor == "duckdb":
+            import duckdb
+
+            con = duckdb.connect()
+            con.execute(f"SET threads = {int(processos)}")
+            con.execute(f"SET memory_limit = '{int(memoria_mb)}MB'")
+            con.execute("SET preserve_insertion_order = false")
+            con.execute(f"SET temp_directory = '{os.path.abspath(os.path.join(estado, 'tmp'))}'")
+            for caminho, _, _ in pendentes:
+                df = agregar_arquivo_duckdb(caminho, resolvidas[caminho], concluido, sep, encoding, con)
+                _gravar_parquet(df, destino[caminho])
+                linhas[caminho] = int(df["inscritos"].sum())
+            con.close()
+        else:
+            workers = min(processos, len(pendentes))
+            bloco_mb = min(2, max(1, memoria_mb // (256 * workers)))
+            args = [(c, destino[c], resolvidas[c], tuple(concluido), sep, encoding, bloco_mb)
+                    for c, _, _ in pendentes]
+            if workers == 1:
+                for a in args:
+                    linhas[a[0]] = _tarefa_arrow(*a)
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    for a, n in zip(args, pool.map(_tarefa_arrow, *zip(*args))):
+                        linhas[a[0]] = n
+
+    for caminho, sha, info in pendentes:
+        registrados[caminho] = {"sha256": sha, "mtime_ns": info.st_mtime_ns, "tamanho": info.st_size,
+                                "linhas": linhas[caminho], "agregado_em": time.time()}
+
+    # parciais de versões anteriores (arquivo alterado ou --refazer) saem do disco
+    em_uso = {f"{r['sha256']}.parquet" for r in registrados.values()}
+    for nome in os.listdir(dir_parciais):
+        if nome.endswith(".parquet") and nome not in em_uso:
+            os.remove(os.path.join(dir_parciais, nome))
+
+    # etapa 2: base agregada (só quando algo mudou ou a saída não existe)
+    base = None
+    if pendentes or removidos or refazer or not os.path.exists(saida):
+        base = gravar_agregado([os.path.join(dir_parciais, n) for n in sorted(em_uso)], saida)
+    _gravar_manifesto(estado, manifesto)
+    return {
+        "motor": motor,
+        "novos": [c for c, _, _ in pendentes],
+        "ignorados": ignorados,
+        "removidos": removidos,
+        "linhas_lidas": sum(linhas.values()),
+        "linhas_total": sum(r["linhas"] for r in registrados.values()),
+        "linhas_saida": None if base is None else len(base),
+        "segundos": time.perf_counter() - inicio,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+
+    parser = argparse.ArgumentParser(description="Agrega microdados de matrícula na base do app (incremental).")
+    parser.add_argument("arquivos", nargs="+", help="CSV/Parquet de inscrições (aceita glob)")
+    parser.add_argument("--estado", default=ESTADO_PADRAO)
+    parser.add_argument("--saida", default=CSV_PADRAO)
+    parser.add_argument("--motor", choices=["auto", "duckdb", "arrow"], default="auto")
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument("--memoria-mb", type=int, default=1024)
+    parser.add_argument("--sep", default=",")
+    parser.add_argument("--encoding", default="utf-8")
+    parser.add_argument("--coluna", action="append", default=[], metavar="LOGICA=NOME",
+                        help=f"nome da coluna na exportação ({', '.join(COLUNAS_PADRAO)})")
+    parser.add_argument("--concluido", action="append", default=None, metavar="SITUACAO",
+                        help="situação que conta como concludente (repetível)")
+    parser.add_argument("--refazer", action="store_true", help="descarta o estado e agrega tudo de novo")
+    args = parser.parse_args()
+
+    colunas = {}
+    for par in args.coluna:
+        logica, _, nome = par.partition("=")
+        if logica not in COLUNAS_PADRAO or not nome:
+            parser.error(f"--coluna inválida: {par}")
+        colunas[logica] = nome
+    arquivos = sorted({a for padrao in args.arquivos for a in (glob.glob(padrao) or [padrao])})
+
+    r = atualizar(arquivos, args.estado, args.saida, colunas, args.concluido or SITUACOES_CONCLUIDO,
+                  args.motor, args.processos, args.memoria_mb, args.sep, args.encoding, args.refazer)
+    print(f"motor {r['motor']}: {len(r['novos'])} arquivo(s) agregado(s), {len(r['ignorados'])} sem mudança, "
+          f"{len(r['removidos'])} retirado(s) por duplicar outro; "
+          f"{r['linhas_lidas']:,} inscrições lidas ({r['linhas_total']:,} no total) em {r['segundos']:.1f} s")
+    if r["linhas_saida"] is not None:
+        print(f"{args.saida}: {r['linhas_saida']} linhas")
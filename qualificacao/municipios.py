@@ -0,0 +1,126 @@
+"""Tabela-dimensão dos municípios, com chave inteira.
+
+Montada uma vez a partir do GeoJSON. Cada município ganha um id, que é a
+posição da feição (a mesma em todos os LOD). Também guarda o código IBGE
+(CD_MUN, quando existe), o nome canônico e chaves sem acento para casar
+grafias diferentes.
+
+Na carga, a base é traduzida para ids (`codificar`) e os nomes que não
+casam entram num relatório (`nao_encontrados`). A partir daí, mapa, SVG,
+modal e cliques juntam por indexação de arrays, sem comparar strings.
+
+    python -m qualificacao.municipios   # relatório dos nomes da base sem município
+"""
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# grafias alternativas/antigas -> chave do nome oficial
+ALIASES = {
+    "ITAPAGE": "ITAPAJE",
+}
+
+
+def nome_canonico(nome) -> str:
+    """Nome como exibido no app (o do GeoJSON, em maiúsculas)."""
+    return " ".join(str(nome).split()).upper()
+
+
+def chave_nome(nome) -> str:
+    """Chave de comparação: sem acentos, pontuação e espaços repetidos."""
+    sem_acento = unicodedata.normalize("NFKD", str(nome)).encode("ascii", "ignore").decode("ascii")
+    return " ".join(re.sub(r"[^0-9A-Za-z]+", " ", sem_acento).split()).upper()
+
+
+def _codigo_ibge(valor) -> int:
+    try:
+        return int(str(valor).strip())
+    except (TypeError, ValueError):
+        return -1
+
+
+class TabelaMunicipios:
+    """id (posição da feição) -> código IBGE, nome canônico; nome/código -> id."""
+
+    def __init__(self, nomes, codigos_ibge=None):
+        self.nomes = np.array([nome_canonico(n) for n in nomes], dtype=object)
+        n = len(self.nomes)
+        self.codigos_ibge = np.array(
+            [_codigo_ibge(c) for c in codigos_ibge] if codigos_ibge is not None else [-1] * n,
+            dtype=np.int64,
+        )
+        self._por_chave = {}
+        for i, nome in enumerate(self.nomes):
+            self._por_chave.setdefault(chave_nome(nome), i)
+        for alias, chave in ALIASES.items():
+            if chave in self._por_chave:
+                self._por_chave.setdefault(alias, self._por_chave[chave])
+        self._por_ibge = {int(c): i for i, c in enumerate(self.codigos_ibge) if c >= 0}
+
+    @classmethod
+    def de_geojson(cls, geojson: dict) -> "TabelaMunicipios":
+        feats = geojson["features"]
+        props = [f.get("properties") or {} for f in feats]
+        return cls(
+            nomes=[p.get("NM_MUN", "") for p in props],
+            codigos_ibge=[p.get("CD_MUN") for p in props],
+        )
+
+    def __len__(self):
+        return len(self.nomes)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.codigos_ibge.nbytes + sum(len(n) for n in self.nomes))
+
+    def id_de(self, valor) -> int:
+        """id do município por código IBGE, nome (com ou sem acento) ou alias; -1 se não houver."""
+        if valor is None:
+            return -1
+        texto = str(valor).strip()
+        if texto.isdigit() and int(texto) in self._por_ibge:
+            return self._por_ibge[int(texto)]
+        return self._por_chave.get(chave_nome(texto), -1)
+
+    def codificar(self, serie: pd.Series) -> np.ndarray:
+        """id (int32) de cada linha; -1 = não encontrado. Resolve cada nome distinto uma vez."""
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            cod, categorias = serie.cat.codes.to_numpy(), serie.cat.categories
+        else:
+            cod, categorias = pd.factorize(serie)
+        ids = np.array([self.id_de(c) for c in categorias] + [-1], dtype=np.int32)
+        # código -1 (ausente) cai na sentinela do fim do array
+        return ids[cod]
+
+    def nao_encontrados(self, serie: pd.Series) -> pd.DataFrame:
+        """Nomes da base sem município correspondente, com o nº de linhas de cada um."""
+        ids = self.codificar(serie)
+        faltando = serie[ids < 0].astype("string").fillna("")
+        contagem = faltando.value_counts(sort=True)
+        return contagem.rename_axis("Município").reset_index(name="linhas")
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from qualificacao.geometria import ORIGEM_PADRAO
+    from qualificacao.ingestao import CSV_PADRAO, carregar_dataset
+
+    parser = argparse.ArgumentParser(description="Relatório de municípios da base sem correspondência no GeoJSON.")
+    parser.add_argument("--csv", default=CSV_PADRAO)
+    parser.add_argument("--geojson", default=ORIGEM_PADRAO)
+    args = parser.parse_args()
+
+    with open(args.geojson, "r", encoding="utf-8") as f:
+        tabela = TabelaMunicipios.de_geojson(json.load(f))
+    relatorio = tabela.nao_encontrados(carregar_dataset(args.csv)["Município"])
+    sem_ibge = int((tabela.codigos_ibge < 0).sum())
+    print(f"{len(tabela)} municípios no GeoJSON ({sem_ibge} sem código IBGE)")
+    if relatorio.empty:
+        print("todos os municípios da base foram encontrados")
+    else:
+        print(f"{len(relatorio)} nome(s) sem correspondência:")
+        print(relatorio.to_string(index=False))
@@ -0,0 +1,182 @@
+"""Série de períodos: uma partição (CSV agregado) por mês, semestre ou edital.
+
+Cada CSV de `data/periodos/` (QUALIFICACAO_PERIODOS) é um período, com o
+mesmo layout do CSV agregado. O nome do arquivo é o rótulo e a ordem
+alfabética é a ordem do tempo (`2024-S1.csv`, `2024-S2.csv`, `2025-S1.csv`...).
+
+Cada partição vira Parquet e cubo uma única vez (`Dataset.carregar_periodos`
+reaproveita o que não mudou: chegar um período novo só processa ele). A
+`SeriePeriodos` alinha esses cubos num conjunto único de chaves
+(Município × CURSO × Nº LOTE), com códigos na ordem de chegada, e guarda as
+linhas de cada período. Cabendo em `max_bytes`, guarda também as somas
+acumuladas período a período: o cubo de um intervalo é a diferença de dois
+acumulados, com custo proporcional ao número de chaves e não ao tamanho do
+histórico. Sem os acumulados, é um bincount sobre as linhas do intervalo.
+Um período novo no fim (`acrescentar`) só agrega o cubo dele e soma ao
+último acumulado.
+"""
+import copy
+import os
+
+import numpy as np
+import pandas as pd
+
+from qualificacao.cubo import CHAVES, METRICAS, codigos
+from qualificacao.kpis import adicionar_taxas
+
+PERIODOS_PADRAO = "data/periodos"
+SOMAS = METRICAS + ["n_registros"]
+
+
+def listar_periodos(diretorio: str = PERIODOS_PADRAO) -> list:
+    """[(rótulo, caminho)] dos CSVs do diretório, em ordem; vazio se ele não existe."""
+    try:
+        nomes = sorted(n for n in os.listdir(diretorio) if n.lower().endswith(".csv"))
+    except OSError:
+        return []
+    return [(os.path.splitext(n)[0], os.path.join(diretorio, n)) for n in nomes]
+
+
+def assinatura_periodos(diretorio: str = PERIODOS_PADRAO) -> tuple:
+    """(rótulo, mtime, tamanho) de cada partição: muda quando alguma entra, sai ou muda."""
+    itens = []
+    for rotulo, caminho in listar_periodos(diretorio):
+        info = os.stat(caminho)
+        itens.append((rotulo, info.st_mtime_ns, info.st_size))
+    return tuple(itens)
+
+
+class SeriePeriodos:
+    """Cubos por período alinhados às mesmas chaves, somados por intervalo.
+
+    Imutável: `acrescentar` devolve outra série que compartilha os arrays
+    desta (os handles antigos continuam valendo para quem ainda os usa).
+    """
+
+    def __init__(self, rotulos, cubos, municipios=None, max_bytes: int = 64 * 1024 * 1024):
+        self.rotulos = []
+        self._municipios = municipios
+        self._max_bytes = max_bytes
+        # chaves na ordem de chegada: o código de uma chave não muda quando entra um período
+        self._indice = pd.MultiIndex.from_arrays([pd.Index([], dtype=object)] * len(CHAVES), names=CHAVES)
+        self._codigos = []      # por período: código de cada linha do cubo
+        self._valores = []      # por período: SOMAS de cada linha do cubo
+        self._acumulado = []    # por período p: somas de 0..p (chaves conhecidas até p × SOMAS); None = sem
+        self._totais = []       # por período: SOMAS, municípios e cursos distintos
+        for rotulo, cubo in zip(rotulos, cubos):
+            self._incluir(rotulo, cubo)
+        self._montar_chaves()
+
+    def acrescentar(self, rotulo: str, cubo: pd.DataFrame) -> "SeriePeriodos":
+        """Nova série com mais um período no fim; custa o cubo novo e as chaves, não o histórico."""
+        serie = copy.copy(self)
+        serie.rotulos = self.rotulos.copy()
+        serie._codigos = self._codigos.copy()
+        serie._valores = self._valores.copy()
+        serie._acumulado = None if self._acumulado is None else self._acumulado.copy()
+        serie._totais = self._totais.copy()
+        serie._incluir(rotulo, cubo)
+        serie._montar_chaves()
+        return serie
+
+    def _incluir(self, rotulo: str, cubo: pd.DataFrame):
+        chaves = pd.MultiIndex.from_frame(cubo[CHAVES].astype(str))
+        cod = self._indice.get_indexer(chaves)
+        novas = cod < 0
+        if novas.any():
+            cod_novas, unicas = chaves[novas].factorize()
+            cod[novas] = len(self._indice) + cod_novas
+            self._indice = self._indice.append(unicas).set_names(CHAVES)
+        cod = cod.astype(np.int64)
+        valores = cubo[SOMAS].to_numpy(dtype=np.int64)
+        self.rotulos.append(rotulo)
+        self._codigos.append(cod)
+        self._valores.append(valores)
+
+        presentes = valores[:, SOMAS.index("n_registros")] > 0
+        totais = dict(zip(SOMAS, valores.sum(axis=0).tolist()))
+        totais["municipios"] = cubo["Município"][presentes].nunique()
+        totais["cursos"] = cubo["CURSO"][presentes].nunique()
+        self._totais.append(totais)
+
+        if self._acumulado is not None:
+            # acumulado novo = anterior (completado com zeros nas chaves novas) + este período
+            soma = self._bincount(cod, valores)
+            if self._acumulado:
+                anterior = self._acumulado[-1]
+                soma[:len(anterior)] += anterior
+            if sum(a.nbytes for a in self._acumulado) + soma.nbytes <= self._max_bytes:
+                soma.flags.writeable = False
+                self._acumulado.append(soma)
+            else:
+                self._acumulado = None
+
+    def _montar_chaves(self):
+        # `chaves` (e o que sai de `somar`/`cubo`) ficam em ordem de chave, como no build_cubo
+        self._ordem = np.asarray(self._indice.argsort(), dtype=np.int64)
+        chaves = self._indice.take(self._ordem).to_frame(index=False)
+        for col in CHAVES:
+            chaves[col] = chaves[col].astype("category")
+        if self._municipios is not None:
+            chaves["id_municipio"] = self._municipios.codificar(chaves["Município"])
+        self.chaves = chaves
+
+    def __len__(self):
+        return len(self.rotulos)
+
+    @property
+    def nbytes(self) -> int:
+        extra = sum(a.nbytes for a in self._acumulado) if self._acumulado is not None else 0
+        return int(sum(c.nbytes for c in self._codigos) + sum(v.nbytes for v in self._valores) + extra)
+
+    def indice(self, rotulo: str) -> int:
+        return self.rotulos.index(rotulo)
+
+    def _bincount(self, cod: np.ndarray, valores: np.ndarray) -> np.ndarray:
+        return np.stack([np.bincount(cod, weights=valores[:, k], minlength=len(self._indice))
+                         for k in range(len(SOMAS))], axis=1).astype(np.int64)
+
+    def somar(self, inicio: int, fim: int) -> np.ndarray:
+        """Somas (chaves × SOMAS) dos períodos `inicio`..`fim` (posições, inclusive)."""
+        if self._acumulado is not None:
+            somas = np.zeros((len(self._indice), len(SOMAS)), dtype=np.int64)
+            ate_fim = self._acumulado[fim]
+            somas[:len(ate_fim)] = ate_fim
+            if inicio > 0:
+                antes = self._acumulado[inicio - 1]
+                somas[:len(antes)] -= antes
+        else:
+            somas = self._bincount(np.concatenate(self._codigos[inicio:fim + 1]),
+                                   np.concatenate(self._valores[inicio:fim + 1]))
+        return somas[self._ordem]
+
+    def cubo(self, inicio: int, fim: int) -> pd.DataFrame:
+        """Cubo do intervalo, no layout do `build_cubo` (só chaves com registros nele)."""
+        somas = self.somar(inicio, fim)
+        presentes = somas[:, SOMAS.index("n_registros")] > 0
+        cubo = self.chaves[presentes].reset_index(drop=True)
+        for col in CHAVES:
+            cubo[col] = cubo[col].cat.remove_unused_categories()
+        for k, col in enumerate(SOMAS):
+            cubo[col] = somas[presentes, k]
+        return cubo
+
+    def totais(self) -> pd.DataFrame:
+        """Uma linha por período: métricas, municípios atendidos, cursos distintos e taxas."""
+        dados = pd.DataFrame(self._totais, index=pd.Index(self.rotulos, name="Período"), dtype="int64")
+        return adicionar_taxas(dados)
+
+    def comparar(self, a: str, b: str, dimensao: str = "Município",
+                 metrica: str = "qtd_concludentes") -> pd.DataFrame:
+        """`metrica` por valor da dimensão nos períodos `a` e `b`, com a variação de a para b."""
+        cod, categorias = codigos(self.chaves[dimensao])
+        k, r = SOMAS.index(metrica), SOMAS.index("n_registros")
+        somas = [self.somar(i, i) for i in (self.indice(a), self.indice(b))]
+        va, vb = (np.bincount(cod, weights=s[:, k], minlength=len(categorias)) for s in somas)
+        presentes = sum(np.bincount(cod, weights=s[:, r], minlength=len(categorias)) for s in somas) > 0
+        df = pd.DataFrame({"periodo_a": va, "periodo_b": vb},
+                          index=pd.Index(categorias.astype(str), name=dimensao))[presentes].astype("int64")
+        df["variacao"] = df["periodo_b"] - df["periodo_a"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            df["variacao_pct"] = np.where(df["periodo_a"] > 0, df["variacao"] / df["periodo_a"], np.nan)
+        return df
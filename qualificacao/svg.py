@@ -0,0 +1,94 @@
+"""Mapa coroplético estático em SVG, renderizado no servidor.
+
+Sem Leaflet, sem tiles e sem GeoJSON no navegador: uma string SVG com um
+`<path>` por município, as mesmas cores de `classificacao` e a legenda
+desenhada no próprio SVG (serve para relatórios, PDF e impressão).
+
+Os caminhos projetados dependem só da geometria e são calculados uma vez
+(`MapaSVG`); cada camada/filtro só troca as cores.
+"""
+import math
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+FILL_OPACITY = 0.75
+LARGURA_LEGENDA = 190
+
+
+def _fmt(x: float) -> str:
+    return f"{x:.1f}".rstrip("0").rstrip(".")
+
+
+class MapaSVG:
+    """Caminhos SVG (projeção equiretangular ajustada à latitude média)."""
+
+    def __init__(self, geometria, largura: int = 760, margem: int = 10):
+        self.geometria = geometria
+        feats = geometria.geojson["features"]
+        aneis = [[np.asarray(a, dtype=float) for a in _aneis(f["geometry"])] for f in feats]
+
+        todos = np.concatenate([a[:, :2] for partes in aneis for a in partes])
+        lons, lats = todos[:, 0], todos[:, 1]
+        lon0, lon1, lat0, lat1 = lons.min(), lons.max(), lats.min(), lats.max()
+        kx = math.cos(math.radians((lat0 + lat1) / 2))
+        escala = (largura - 2 * margem) / max((lon1 - lon0) * kx, 1e-12)
+
+        self.largura = largura
+        self.altura = int(math.ceil((lat1 - lat0) * escala + 2 * margem))
+
+        def xy(c):
+            x = margem + (c[:, 0] - lon0) * kx * escala
+            y = margem + (lat1 - c[:, 1]) * escala
+            return " ".join(f"{_fmt(a)},{_fmt(b)}" for a, b in zip(x, y))
+
+        self.caminhos = ["".join(f"M{xy(anel)}Z" for anel in partes) for partes in aneis]
+
+    def renderizar(self, cores, titulos=None, legenda=(), titulo: str = "") -> str:
+        """SVG completo; `cores` e `titulos` alinhados às feições."""
+        titulos = titulos if titulos is not None else self.geometria.nomes
+        largura = self.largura + (LARGURA_LEGENDA if legenda else 0)
+        partes = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {largura} {self.altura}" '
+            f'width="100%" style="max-width:{largura}px" font-family="sans-serif" font-size="12">',
+            f"<title>{escape(titulo)}</title>" if titulo else "",
+            f'<g stroke="#333" stroke-width="0.5" fill-opacity="{FILL_OPACITY}" fill-rule="evenodd">',
+        ]
+        partes += [
+            f'<path d="{d}" fill="{_cor(c)}"><title>{escape(str(t))}</title></path>'
+            for d, c, t in zip(self.caminhos, cores, titulos)
+        ]
+        partes.append("</g>")
+        if legenda:
+            partes.append(_legenda(legenda, self.largura + 10, titulo))
+        partes.append("</svg>")
+        return "".join(partes)
+
+
+def _aneis(geom: dict) -> list:
+    if geom["type"] == "Polygon":
+        return list(geom["coordinates"])
+    if geom["type"] == "MultiPolygon":
+        return [anel for poligono in geom["coordinates"] for anel in poligono]
+    return []
+
+
+def _cor(cor: str) -> str:
+    # #RRGGBBAA -> #RRGGBB (nem todo leitor de SVG/PDF aceita alfa no hex)
+    cor = str(cor)
+    return cor[:7] if cor.startswith("#") and len(cor) == 9 else cor
+
+
+def _legenda(itens, x: int, titulo: str) -> str:
+    partes = [f'<g transform="translate({x},20)">']
+    if titulo:
+        partes.append(f'<text x="0" y="0" font-weight="bold">{escape(titulo)}</text>')
+    for i, (cor, rotulo) in enumerate(itens):
+        y = 12 + i * 20
+        partes.append(
+            f'<rect x="0" y="{y}" width="16" height="12" fill="{_cor(cor)}" '
+            f'fill-opacity="{FILL_OPACITY}" stroke="#333" stroke-width="0.5"/>'
+            f'<text x="22" y="{y + 10}">{escape(rotulo)}</text>'
+        )
+    partes.append("</g>")
+    return "".join(partes)
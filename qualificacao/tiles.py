@@ -0,0 +1,238 @@
+"""Modo de tiles vetoriais (Mapbox Vector Tiles) para a camada municipal.
+
+Etapa offline: recorta a geometria dos municípios em tiles MVT e grava um
+diretório ``static/tiles/{z}/{x}/{y}.pbf``, servido pelo próprio Streamlit
+(``server.enableStaticServing``) ou por qualquer servidor de arquivos:
+
+    python -m qualificacao.tiles --zmin 5 --zmax 11
+
+No app (``QUALIFICACAO_TILES_URL=/app/static/tiles/{z}/{x}/{y}.pbf``) o mapa
+deixa de embutir o GeoJSON: o navegador baixa e guarda os tiles uma vez e cada
+troca de camada/filtro envia só a tabela município -> cor.
+"""
+import json
+import math
+import os
+
+CAMADA_MVT = "municipios"
+EXTENT = 4096
+BUFFER = 64
+DESTINO_PADRAO = "static/tiles"
+
+
+# =========================
+# Codificação protobuf (MVT 2.1)
+# =========================
+
+def _varint(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+
+def _zigzag(n: int) -> int:
+    return (n << 1) ^ (n >> 31)
+
+
+def _campo(numero: int, tipo: int) -> bytes:
+    return _varint((numero << 3) | tipo)
+
+
+def _bytes(numero: int, dados: bytes) -> bytes:
+    return _campo(numero, 2) + _varint(len(dados)) + dados
+
+
+def _packed(numero: int, valores) -> bytes:
+    return _bytes(numero, b"".join(_varint(v) for v in valores))
+
+
+def _comandos_poligono(aneis) -> list:
+    """Sequência MoveTo/LineTo/ClosePath de anéis já orientados (sem repetir o ponto final)."""
+    cmds = []
+    cx = cy = 0
+    for anel in aneis:
+        x, y = anel[0]
+        cmds += [(1 & 0x7) | (1 << 3), _zigzag(x - cx), _zigzag(y - cy)]
+        cx, cy = x, y
+        cmds.append((2 & 0x7) | ((len(anel) - 1) << 3))
+        for x, y in anel[1:]:
+            cmds += [_zigzag(x - cx), _zigzag(y - cy)]
+            cx, cy = x, y
+        cmds.append((7 & 0x7) | (1 << 3))
+    return cmds
+
+
+def codificar_tile(features, camada: str = CAMADA_MVT, extent: int = EXTENT) -> bytes:
+    """Codifica [(id, {prop: str}, [anéis em coordenadas do tile])] numa camada MVT."""
+    chaves, valores = [], []
+    idx_chave, idx_valor = {}, {}
+    corpo = b""
+    for fid, props, aneis in features:
+        tags = []
+        for k, v in props.items():
+            if k not in idx_chave:
+                idx_chave[k] = len(chaves)
+                chaves.append(k)
+            if v not in idx_valor:
+                idx_valor[v] = len(valores)
+                valores.append(v)
+            tags += [idx_chave[k], idx_valor[v]]
+        feat = (_campo(1, 0) + _varint(fid)
+                + _packed(2, tags)
+                + _campo(3, 0) + _varint(3)  # POLYGON
+                + _packed(4, _comandos_poligono(aneis)))
+        corpo += _bytes(2, feat)
+
+    layer = _campo(15, 0) + _varint(2) + _bytes(1, camada.encode("utf-8")) + corpo
+    for k in chaves:
+        layer += _bytes(3, k.encode("utf-8"))
+    for v in valores:
+        layer += _bytes(4, _bytes(1, str(v).encode("utf-8")))
+    layer += _campo(5, 0) + _varint(extent)
+    return _bytes(3, layer)
+
+
+# =========================
+# Recorte em tiles
+# =========================
+
+def _lonlat_para_tile(lon, lat, z):
+    n = 2 ** z
+    x = (lon + 180.0) / 360.0 * n
+    lat_r = math.radians(max(min(lat, 85.0511), -85.0511))
+    y = (1.0 - math.asinh(math.tan(lat_r)) / math.pi) / 2.0 * n
+    return x, y
+
+
+def _aneis_tile(geom):
+    """Anéis inteiros e orientados (exterior com área positiva) de um (Multi)Polygon."""
+    from shapely.geometry import Polygon
+    from shapely.geometry.polygon import orient
+
+    aneis = []
+    poligonos = getattr(geom, "geoms", [geom])
+    for pol in poligonos:
+        if not isinstance(pol, Polygon) or pol.is_empty:
+            continue
+        pol = orient(pol, sign=1.0)
+        for anel in [pol.exterior, *pol.interiors]:
+            pts = []
+            for x, y in anel.coords[:-1]:
+                p = (int(round(x)), int(round(y)))
+                if not pts or p != pts[-1]:
+                    pts.append(p)
+            if len(pts) > 1 and pts[0] == pts[-1]:
+                pts.pop()
+            if len(set(pts)) >= 3:
+                aneis.append(pts)
+    return aneis
+
+
+def gerar_tiles(geojson_por_zoom, zmin: int, zmax: int, destino: str = DESTINO_PADRAO) -> int:
+    """Grava os tiles de zmin..zmax; `geojson_por_zoom(z)` fornece a geometria do nível."""
+    import shapely
+    from shapely.geometry import shape
+
+    from qualificacao.municipios import nome_canonico
+
+    total = 0
+    for z in range(zmin, zmax + 1):
+        geojson = geojson_por_zoom(z)
+        geoms = [shape(f["geometry"]) for f in geojson["features"]]
+        nomes = [nome_canonico(f["properties"]["NM_MUN"]) for f in geojson["features"]]
+        arvore = shapely.STRtree(geoms)
+        minx, miny, maxx, maxy = shapely.total_bounds(geoms)
+        tx0, ty0 = (int(v) for v in _lonlat_para_tile(minx, maxy, z))
+        tx1, ty1 = (int(v) for v in _lonlat_para_tile(maxx, miny, z))
+
+        n = 2 ** z
+        for tx in range(tx0, tx1 + 1):
+            for ty in range(ty0, ty1 + 1):
+                lon0 = tx / n * 360.0 - 180.0
+                lon1 = (tx + 1) / n * 360.0 - 180.0
+                lat0 = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (ty + 1) / n))))
+                lat1 = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+                candidatos = arvore.query(shapely.box(lon0, lat0, lon1, lat1))
+                features = []
+                for i in sorted(candidatos):
+                    g = shapely.transform(geoms[i], lambda c, tx=tx, ty=ty: _coords_tile(c, z, tx, ty))
+                    g = shapely.clip_by_rect(g, -BUFFER, -BUFFER, EXTENT + BUFFER, EXTENT + BUFFER)
+                    aneis = _aneis_tile(g)
+                    if aneis:
+                        features.append((int(i), {"NM_MUN": nomes[i]}, aneis))
+                if not features:
+                    continue
+                pasta = os.path.join(destino, str(z), str(tx))
+                os.makedirs(pasta, exist_ok=True)
+                with open(os.path.join(pasta, f"{ty}.pbf"), "wb") as f:
+                    f.write(codificar_tile(features))
+                total += 1
+    return total
+
+
+def _coords_tile(coords, z, tx, ty):
+    import numpy as np
+
+    n = 2 ** z
+    lon, lat = coords[:, 0], np.clip(coords[:, 1], -85.0511, 85.0511)
+    x = (lon + 180.0) / 360.0 * n
+    y = (1.0 - np.arcsinh(np.tan(np.radians(lat))) / np.pi) / 2.0 * n
+    return np.column_stack([(x - tx) * EXTENT, (y - ty) * EXTENT])
+
+
+# =========================
+# Camada no folium
+# =========================
+
+def camada_vetorial(url: str, cores: dict, cor_padrao: str, zoom_max_nativo: int = 11):
+    """Camada Leaflet.VectorGrid que pinta cada município pela tabela `cores` (NM_MUN -> cor)."""
+    from folium.plugins import VectorGridProtobuf
+
+    options = """{
+        "vectorTileLayerStyles": {
+            "%(camada)s": (function() {
+                var cores = %(cores)s;
+                return function(p, z) {
+                    return {fill: true, fillColor: cores[p.NM_MUN] || "%(padrao)s",
+                            color: "#333", weight: 0.7, fillOpacity: 0.75};
+                };
+            })()
+        },
+        "interactive": true,
+        "maxNativeZoom": %(zmax)d
+    }""" % {"camada": CAMADA_MVT, "cores": json.dumps(cores, ensure_ascii=False),
+            "padrao": cor_padrao, "zmax": zoom_max_nativo}
+    return VectorGridProtobuf(url, name="Municípios", options=options)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from qualificacao.geometria import ORIGEM_PADRAO, caminho_nivel, nivel_para_zoom, topojson_para_geojson
+
+    parser = argparse.ArgumentParser(description="Gera tiles MVT dos municípios.")
+    parser.add_argument("--origem", default=ORIGEM_PADRAO)
+    parser.add_argument("--destino", default=DESTINO_PADRAO)
+    parser.add_argument("--zmin", type=int, default=5)
+    parser.add_argument("--zmax", type=int, default=11)
+    args = parser.parse_args()
+
+    with open(args.origem, "r", encoding="utf-8") as f:
+        original = json.load(f)
+
+    def geojson_por_zoom(z):
+        # usa o nível simplificado quando gerado (python -m qualificacao.geometria)
+        caminho = caminho_nivel(nivel_para_zoom(z), os.path.dirname(args.origem))
+        if os.path.exists(caminho):
+            with open(caminho, "r", encoding="utf-8") as f:
+                return topojson_para_geojson(json.load(f))
+        return original
+
+    n = gerar_tiles(geojson_por_zoom, args.zmin, args.zmax, args.destino)
+    print(f"{n} tiles gravados em {args.destino}")
@@ -1,17 +1,49 @@
 import pandas as pd
 import numpy as np
 import streamlit as st
-from streamlit_folium import st_folium
-import folium
+import html
 import json
-import geopandas as gpd
-import branca.colormap as cm
-import copy
-import altair as alt
-
-
-from branca.colormap import linear
-from branca.element import MacroElement, Template
+import os
+import time
+import uuid
+
+# folium/branca (mapa) são importados só ao montar o mapa
+
+from qualificacao.atualizacao import Atualizador
+from qualificacao.aquecimento import Aquecimento, FiltrosPopulares
+from qualificacao.cache import LRUCache
+from qualificacao.classificacao import COR_COM, COR_SEM, ESQUEMAS, classificar
+from qualificacao.cubo import CAMADAS, valores_camada, valores_municipios
+from qualificacao.dataset import HASH_FUNCS, Dataset, versao_periodos
+from qualificacao.detalhe import COLUNAS_DETALHE, IndiceMunicipios, montar_detalhe
+from qualificacao.exportacao import FORMATOS, Exportador
+from qualificacao.filtros import FAIXAS, Filtro, IndiceFiltros
+from qualificacao.graficos import barras_horizontais, linha_temporal
+from qualificacao.hierarquia import Hierarquia
+from qualificacao.geometria import (
+    NIVEIS_LOD,
+    GeometriaMunicipios,
+    caminho_nivel,
+    nivel_para_zoom,
+    topojson_para_geojson,
+)
+from qualificacao.ingestao import CSV_PADRAO
+from qualificacao.instrumentacao import Instrumentacao, etapa, registrar
+from qualificacao.kpis import calcular_kpis
+from qualificacao.localizador import LocalizadorMunicipios, municipio_do_tooltip
+from qualificacao.mapa_cliente import (
+    configuracao,
+    geometria_cliente,
+    mapa_cliente,
+    publicado,
+    publicar,
+    tabela_cliente,
+)
+from qualificacao.mapa_render import chave_componente, renderizar_mapa, st_folium_renderizado
+from qualificacao.municipios import TabelaMunicipios
+from qualificacao.periodos import PERIODOS_PADRAO, assinatura_periodos, listar_periodos
+from qualificacao.svg import MapaSVG
+from qualificacao.tiles import camada_vetorial
 
 # Configurações iniciais do Streamlit
 st.set_page_config(layout="wide")
@@ -42,29 +74,269 @@ st.markdown(
 )
 
 
-@st.cache_data
+@st.cache_resource
 def load_geojson():
+    # objeto único, compartilhado entre sessões: nunca alterar in-place
     with open("data/municipios_latlon.geojson", "r", encoding="utf-8") as f:
         return json.load(f)
 
-@st.cache_data
-def load_data():
-    df = pd.read_csv(
-        "data/agrupado_cursos_concluidos_em_execucao_sem_sebrae.csv",
-        encoding="utf-8",
-        sep=",",
-        dtype={"Nº LOTE": "string", "Município": "string"},
+@st.cache_resource
+def load_geometria(nivel: int):
+    # geometria simplificada/quantizada (python -m qualificacao.geometria);
+    # sem os arquivos gerados, o mapa usa o GeoJSON original
+    caminho = caminho_nivel(nivel)
+    if not os.path.exists(caminho):
+        return GeometriaMunicipios(load_geojson())
+    with open(caminho, "r", encoding="utf-8") as f:
+        return GeometriaMunicipios(topojson_para_geojson(json.load(f)))
+
+@st.cache_resource
+def tabela_municipios():
+    # dimensão dos municípios (id = posição da feição, código IBGE, nome, aliases)
+    return TabelaMunicipios.de_geojson(load_geojson())
+
+@st.cache_resource
+def diretorio_periodos():
+    # modo série (QUALIFICACAO_PERIODOS com ao menos um CSV), decidido uma vez por processo
+    diretorio = os.environ.get("QUALIFICACAO_PERIODOS", PERIODOS_PADRAO)
+    return diretorio if listar_periodos(diretorio) else None
+
+@st.cache_resource(max_entries=2)
+def load_dataset(versao: str):
+    # base + cubo de uma versão dos dados, compartilhados (somente leitura) entre sessões;
+    # o cubo já vem com id_municipio (junções com a geometria por índice)
+    if diretorio_periodos():
+        return Dataset.carregar_periodos(diretorio_periodos(), versao, municipios=tabela_municipios())
+    return Dataset.carregar(CSV_QUALIFICACAO, versao, municipios=tabela_municipios())
+
+@st.cache_resource(on_release=lambda a: a.parar())
+def atualizador():
+    # troca de versão em segundo plano quando o CSV (ou um período) muda (QUALIFICACAO_ATUALIZACAO_S;
+    # 0 = verifica a cada rerun, sem thread); caches da nova versão já aquecidos
+    periodos = diretorio_periodos()
+    origem = dict(versao=versao_periodos, assinatura=assinatura_periodos) if periodos else {}
+    return Atualizador(
+        periodos or CSV_QUALIFICACAO,
+        carregar=load_dataset,
+        aquecer=aquecer_caches,
+        intervalo=float(os.environ.get("QUALIFICACAO_ATUALIZACAO_S", "30")),
+        **origem,
+    ).iniciar()
+
+# handles por versão nos caches abaixo: a atual, a anterior (troca) e os recortes de período em uso
+VERSOES_EM_CACHE = 6
+
+@st.cache_resource(max_entries=VERSOES_EM_CACHE, hash_funcs=HASH_FUNCS)
+def recorte_periodo(ds: Dataset, inicio: str, fim: str):
+    # intervalo do slider: diferença de somas acumuladas por período, sem reagrupar a base
+    return ds.recorte(inicio, fim)
+
+def aquecer_caches(ds: Dataset):
+    # roda na thread do atualizador: a nova versão só entra com o plano inteiro pronto
+    aquecimento(ds).aguardar()
+
+@st.cache_resource(max_entries=2, hash_funcs=HASH_FUNCS, on_release=lambda a: a.parar())
+def aquecimento(ds: Dataset):
+    # plano da versão num pool de threads (QUALIFICACAO_AQUECIMENTO_THREADS); não espera:
+    # as sessões usam o que já estiver pronto e constroem (uma vez) o que faltar
+    threads = int(os.environ.get("QUALIFICACAO_AQUECIMENTO_THREADS", "4"))
+    return Aquecimento(threads, rotulo=ds.versao[:8]).iniciar(plano_aquecimento(ds))
+
+def plano_aquecimento(ds: Dataset) -> list:
+    # (nome, tarefa) por prioridade: índices, KPIs, Top 10 e a visão inicial antes das demais camadas
+    # e dos filtros de cursos mais usados (sem histórico: os cursos com mais concludentes)
+    n = len(tabela_municipios())
+    esquema = ESQUEMAS[0]
+    plano = [
+        ("indice_filtros", lambda: indice_filtros(ds)),
+        ("kpis", lambda: compute_kpis(ds, n)),
+        ("top:curso", lambda: grafico_top(ds, "curso")),
+        ("top:municipio", lambda: grafico_top(ds, "municipio")),
+        ("hierarquia", lambda: hierarquia(ds)),
+        ("indice_municipios", lambda: indice_municipios(ds)),
+        (f"mapa:{CAMADAS[0]}", lambda: mapa_payload(ds, CAMADAS[0], esquema, Filtro())),
+        ("mapa_navegador", lambda: tabela_mapa_navegador(ds, Filtro())),
+    ]
+    plano += [(f"mapa:{c}", lambda c=c: mapa_payload(ds, c, esquema, Filtro()))
+              for c in CAMADAS[1:]]
+    if ds.periodos is not None and len(ds.periodos) > 1:
+        a, b = ds.periodos.rotulos[-2:]
+        plano += [("periodos", lambda: totais_periodos(ds)),
+                  (f"comparacao:{a}:{b}", lambda: comparacao_periodos(ds, a, b, "qtd_concludentes"))]
+
+    k = int(os.environ.get("QUALIFICACAO_AQUECIMENTO_FILTROS", "3"))
+    selecoes = filtros_populares().mais_usados(k)
+    if len(selecoes) < k:
+        top = compute_kpis(ds, n).top("curso", n=k)["CURSO"].astype(str)
+        selecoes += [(c,) for c in top if (c,) not in selecoes][:k - len(selecoes)]
+    for cursos in selecoes:
+        filtro = Filtro().com_cursos(cursos)
+        rotulo = " + ".join(cursos)
+        plano.append((f"kpis:{rotulo}", lambda f=filtro: compute_kpis(ds, None, f)))
+        plano += [(f"mapa:{c}:{rotulo}", lambda c=c, f=filtro: mapa_payload(ds, c, esquema, f))
+                  for c in CAMADAS]
+    return plano
+
+@st.cache_resource
+def filtros_populares():
+    # seleções de cursos aplicadas, contadas em disco para o aquecimento do próximo processo
+    return FiltrosPopulares(os.environ.get("QUALIFICACAO_FILTROS_POPULARES", "logs/filtros_populares.json"))
+
+@st.cache_resource
+def resultados():
+    # store único do processo: KPIs, filtros, mapas, SVG e detalhes do modal,
+    # sob um teto global de bytes (LRU + TTL) e cota própria para os mapas
+    mb = lambda var, padrao: int(float(os.environ.get(var, padrao)) * 1024 * 1024)
+    cota_mapas = mb("QUALIFICACAO_MAPA_CACHE_MB", "64")
+    return LRUCache(
+        max_bytes=mb("QUALIFICACAO_CACHE_MB", "256"),
+        ttl=float(os.environ.get("QUALIFICACAO_CACHE_TTL_S", "3600")) or None,
+        cotas={"mapa": cota_mapas, "svg": cota_mapas},
     )
-    # se vier uma coluna sem nome (índice exportado), descarte:
-    if df.columns[0].startswith(("Unnamed", ",")) or df.columns[0] == "":
-        df = df.drop(columns=[df.columns[0]])
-    # normaliza município
-    df["Município"] = df["Município"].str.strip().str.upper()
-    # garante numéricos
-    for col in ("qtd_concludentes", "qtd_turmas"):
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype(int)
-    return df
+
+@st.cache_resource(max_entries=VERSOES_EM_CACHE, hash_funcs=HASH_FUNCS)
+def indice_filtros(ds: Dataset):
+    # linhas por valor de CURSO/Município/Nº LOTE, uma vez por versão dos dados
+    return IndiceFiltros(ds.cubo, cache=resultados(), prefixo=("filtros", ds.versao))
+
+@st.cache_resource(max_entries=VERSOES_EM_CACHE, hash_funcs=HASH_FUNCS)
+def indice_municipios(ds: Dataset):
+    # intervalo de linhas do cubo de cada município
+    return IndiceMunicipios(ds.cubo, len(tabela_municipios()))
+
+@st.cache_resource(max_entries=VERSOES_EM_CACHE, hash_funcs=HASH_FUNCS)
+def hierarquia(ds: Dataset):
+    # rollups Lote → Município → Curso, uma vez por versão (drill-down só fatia)
+    return Hierarquia(ds.cubo)
+
+def valores_mapa(ds: Dataset, camada, filtro: Filtro):
+    # valor da camada por feição; filtro de um único lote sai direto do rollup
+    n = len(tabela_municipios())
+    if filtro == Filtro(lotes=filtro.lotes) and len(filtro.lotes) == 1:
+        return hierarquia(ds).valores_mapa(filtro.lotes[0], camada, n)
+    return valores_municipios(ds.cubo, camada, n, indice_filtros(ds).mascara(filtro))
+
+def detalhe_municipio(ds: Dataset, id_municipio: int, filtro):
+    # detalhes do modal por (versão, município, filtro), compartilhados entre sessões
+    return resultados().get_or_build(
+        ("detalhe", ds.versao, id_municipio, filtro),
+        lambda: montar_detalhe(ds.cubo, indice_municipios(ds), id_municipio,
+                               tabela_municipios().nomes[id_municipio], indice_filtros(ds).mascara(filtro)),
+    )
+
+@st.cache_resource
+def exportador():
+    # arquivos exportados ficam em disco (LRU por bytes), em static/: o download sai do
+    # disco pela rota estática (/app/static), sem passar pela memória do servidor
+    max_mb = float(os.environ.get("QUALIFICACAO_EXPORT_CACHE_MB", "256"))
+    return Exportador(max_bytes=int(max_mb * 1024 * 1024), diretorio=EXPORTACOES_DIR, url=EXPORTACOES_URL)
+
+def botoes_exportacao(rotulo: str, chave, montar_df, nome_base: str):
+    # cada formato só é gerado no clique; (visão, filtro) repetidos reaproveitam o arquivo
+    exp = exportador()
+    with st.popover(rotulo):
+        for formato, (mime, ext) in FORMATOS.items():
+            url = exp.url(chave, formato)
+            if url is None and st.button(f"Gerar {formato.upper()}", key=f"exportar_{nome_base}_{formato}",
+                                         use_container_width=True):
+                caminho = exp.arquivo(chave, formato, montar_df)
+                url = exp.url(chave, formato)
+                if url is None:
+                    # maior que o cache de exportações: vai pela memória e é apagado depois de lido
+                    st.download_button(f"⬇️ {formato.upper()}", data=exp.dados(chave, formato, montar_df, caminho),
+                                       file_name=nome_base + ext, mime=mime, on_click="ignore",
+                                       key=f"baixar_{nome_base}_{formato}", use_container_width=True)
+            if url is not None:
+                st.markdown(f'<a href="{url}" download="{html.escape(nome_base + ext)}">⬇️ {formato.upper()}</a>',
+                            unsafe_allow_html=True)
+
+@st.cache_resource
+def mapa_svg_base():
+    # caminhos SVG projetados uma vez, sobre a geometria mais leve
+    return MapaSVG(load_geometria(max(NIVEIS_LOD)))
+
+@st.cache_resource
+def mapa_navegador_base():
+    # geometria (LOD mais leve) e regras de cor do mapa no navegador, publicadas uma vez
+    return publicar(geometria_cliente(load_geometria(max(NIVEIS_LOD))), "geometria"), configuracao()
+
+def tabela_mapa_navegador(ds: Dataset, filtro: Filtro):
+    # Município × CURSO publicada em static/ por (versão, filtro sem cursos); o navegador baixa uma vez
+    chave = ("mapa_navegador", ds.versao, filtro)
+    montar = lambda: publicar(tabela_cliente(ds.cubo, indice_filtros(ds).mascara(filtro)), "tabela")
+    nome = resultados().get_or_build(chave, montar)
+    if not publicado(nome):
+        # arquivo antigo já apagado do disco: publica de novo
+        nome = resultados().put(chave, montar())
+    return nome
+
+@st.cache_resource
+def localizador_municipios():
+    # índice ponto-em-polígono (EPSG:4326), criado só no primeiro clique sem tooltip
+    return LocalizadorMunicipios(load_geojson())
+
+@st.cache_resource
+def instrumentacao():
+    # diagnóstico por etapa (QUALIFICACAO_DIAGNOSTICO=1); desligado, custo ~zero
+    instr = Instrumentacao.do_ambiente()
+    instr.fonte_cache("resultados", lambda: resultados().stats())
+    instr.fonte_cache("exportacoes", lambda: exportador().stats())
+    return instr
+
+def painel_diagnostico(instr: Instrumentacao, sessao: str, ds: Dataset):
+    # só para admin: ?admin=<QUALIFICACAO_ADMIN_TOKEN>
+    token = os.environ.get("QUALIFICACAO_ADMIN_TOKEN")
+    if not instr.ativo or not token or st.query_params.get("admin") != token:
+        return
+    historico = instr.historico(sessao)
+    if not historico:
+        return
+    with st.sidebar.expander("Diagnóstico", expanded=False):
+        ultimo = historico[-1]
+        st.caption(f"Último {ultimo['tipo']}: {ultimo['total_ms']:.0f} ms")
+        st.dataframe(
+            pd.Series(ultimo["etapas_ms"], name="ms").sort_values(ascending=False).round(1),
+            use_container_width=True,
+        )
+        totais = np.array([r["total_ms"] for r in historico])
+        st.caption(
+            f"Sessão: {len(totais)} reruns • p50 {np.percentile(totais, 50):.0f} ms • "
+            f"p90 {np.percentile(totais, 90):.0f} ms"
+        )
+        st.json({k: v for k, v in ultimo["valores"].items()}, expanded=False)
+        if AQUECER_NO_INICIO:
+            aq = aquecimento(ds)
+            p = aq.progresso()
+            st.caption(f"Aquecimento: {p['prontas']}/{p['total']} em {p['segundos']:.1f} s"
+                       + (f" • {p['erros']} erro(s)" if p["erros"] else ""))
+            st.dataframe(pd.DataFrame(aq.tempos(), columns=["tarefa", "status", "ms"]).round(1),
+                         hide_index=True, use_container_width=True)
+        if ds.nao_encontrados is not None and len(ds.nao_encontrados):
+            st.caption(f"{len(ds.nao_encontrados)} município(s) da base sem correspondência no GeoJSON")
+            st.dataframe(ds.nao_encontrados, hide_index=True, use_container_width=True)
+
+# base agregada (QUALIFICACAO_CSV permite apontar outra, ex.: benchmarks)
+CSV_QUALIFICACAO = os.environ.get("QUALIFICACAO_CSV", CSV_PADRAO)
+
+# aquecimento em paralelo no primeiro run do processo (0 desliga; trocas de versão sempre aquecem)
+AQUECER_NO_INICIO = os.environ.get("QUALIFICACAO_AQUECIMENTO", "1") != "0"
+
+# posição inicial do mapa (e a do mapa aquecido a cada nova versão dos dados)
+MAPA_INICIAL = {"center": [-5.3159, -39.2129], "zoom": 7}
+
+# exportações servidas direto do disco (server.enableStaticServing)
+EXPORTACOES_DIR = "static/exportacoes"
+EXPORTACOES_URL = "app/static/exportacoes"
+
+# modo tiles vetoriais (python -m qualificacao.tiles), ex.: /app/static/tiles/{z}/{x}/{y}.pbf
+TILES_URL = os.environ.get("QUALIFICACAO_TILES_URL")
+
+def add_legenda(m, classes):
+    if classes.binaria:
+        # Binário: 1 = verde, 0/ausente = amarelo (legenda categórica)
+        add_binary_legend(m, classes.camada, color_on=COR_COM, color_off=COR_SEM)
+    else:
+        classes.colormap().add_to(m)
 
 def add_binary_legend(m, title="Legenda", label_on="Com qualificação", label_off="Sem qualificação",
                       color_on="#238b45", color_off="#e0e0e0"):
@@ -89,85 +361,17 @@ def add_binary_legend(m, title="Legenda", label_on="Com qualificação", label_o
             </div>
             {% endmacro %}
     """
+    from branca.element import MacroElement, Template
+
     MacroElement._template = Template(html)
     m.get_root().add_child(MacroElement())
 
 
-@st.cache_data
-def compute_kpis_with_tops(df_qualificacao: pd.DataFrame, geojson_data: dict):
-    # Normalizações básicas
-    df = df_qualificacao.copy()
-    if "Município" in df.columns:
-        df["Município"] = df["Município"].astype(str).str.strip().str.upper()
-    else:
-        df["Município"] = ""
-
-    # total de municípios do CE a partir do GeoJSON
-    try:
-        total_municipios_ce = len({f["properties"]["NM_MUN"].strip().upper()
-                                   for f in geojson_data["features"]})
-    except Exception:
-        total_municipios_ce = None
-
-    # KPIs básicos com segurança de colunas
-    tem = df["Município"].nunique()
-
-    cursos_distintos = df["CURSO"].nunique() if "CURSO" in df.columns else 0
-    total_turmas = int(df.get("qtd_turmas", pd.Series(dtype=float)).fillna(0).sum())
-    total_concludentes= int(df.get("qtd_concludentes", pd.Series(dtype=float)).fillna(0).sum())
-    total_inscritos = float(df.get("qtd_inscritos", pd.Series(dtype=float)).fillna(0).sum())
-    total_vagas = float(df.get("qtd_vagas", pd.Series(dtype=float)).fillna(0).sum())
-
-    # taxas (evitando div/0)
-    taxa_conclusao_inscritos = (total_concludentes/ total_inscritos) if total_inscritos > 0 else None
-    taxa_conclusao_vagas = (total_concludentes/ total_vagas) if total_vagas > 0 else None
-    media_concludentes_por_turma = (total_concludentes/ total_turmas) if total_turmas > 0 else None
-
-    cobertura = (tem / total_municipios_ce) if total_municipios_ce else None
-
-    kpis = dict(
-        municipios_atendidos=tem,
-        total_municipios_ce=total_municipios_ce,
-        cobertura=cobertura,
-        cursos_distintos=cursos_distintos,
-        total_turmas=total_turmas,
-        total_concludentes=total_concludentes,
-        taxa_conclusao_inscritos=taxa_conclusao_inscritos,
-        taxa_conclusao_vagas=taxa_conclusao_vagas,
-        media_concludentes_por_turma=media_concludentes_por_turma,
-    )
-
-    # Rankings (Top N)
-    top_cursos = pd.DataFrame()
-    top_municipios = pd.DataFrame()
-
-    if {"CURSO", "qtd_concludentes"}.issubset(df.columns):
-        top_cursos = (df.groupby("CURSO", as_index=False)["qtd_concludentes"]
-                        .sum().sort_values("qtd_concludentes", ascending=False).head(10))
-
-    if {"Município", "qtd_concludentes"}.issubset(df.columns):
-        top_municipios = (df.groupby("Município", as_index=False)["qtd_concludentes"]
-                            .sum().sort_values("qtd_concludentes", ascending=False).head(10))
-
-    return kpis, top_cursos, top_municipios
-
-
-def fmt_pct(x):
-    return f"{x:.1%}" if x is not None else "—"
-
-
-# Dados
-geojson_raw = load_geojson()
-geojson_data = copy.deepcopy(geojson_raw)  # trabalha numa cópia
-df_qualificacao = load_data()
-kpis, top_cursos, top_municipios = compute_kpis_with_tops(df_qualificacao, geojson_data)
 
 # =========================
 # KPIs gerais do programa (helpers)
 # =========================
 
-import pandas as pd
-
 # Paleta (ajuste se tiver o manual da marca)
 BRAND_GREEN = "#238B45"   # verde principal (mapa)
 BRAND_BLUE  = "#5C7DBD"   # azul da marca (aproximação)
@@ -208,51 +412,187 @@ def fmt_int(x):  # 8.046 etc (ponto como separador de milhar)
 def fmt_pct(x):
     return f"{x:.1%}" if (x is not None) else "—"
 
-@st.cache_data
-def compute_kpis(df_qualificacao: pd.DataFrame, geojson_data: dict):
-    """Agrega KPIs a partir da base e do GeoJSON de municípios."""
-    df = df_qualificacao.copy()
+def compute_kpis(ds: Dataset, total_municipios_ce: int | None, filtro: Filtro = Filtro()):
+    """KPIs, recortes e rankings do programa (opcionalmente só do `filtro`)."""
+    return resultados().get_or_build(
+        ("kpis", ds.versao, total_municipios_ce, filtro),
+        lambda: calcular_kpis(ds.cubo, total_municipios_ce, indice_filtros(ds).mascara(filtro)),
+    )
 
-    # Normaliza município
-    if "Município" in df.columns:
-        df["Município"] = df["Município"].astype(str).str.strip().str.upper()
-    else:
-        df["Município"] = ""
+def grafico_top(ds: Dataset, dimensao: str):
+    # spec do Top 10 do panorama ("curso" ou "municipio"), por versão; None sem dados
+    def _montar():
+        top = compute_kpis(ds, len(tabela_municipios())).top(dimensao)
+        if top.empty:
+            return None
+        coluna, rotulo = {"curso": ("CURSO", "Curso"), "municipio": ("Município", "Município")}[dimensao]
+        return barras_horizontais(top, "qtd_concludentes", coluna, "concludentes", rotulo,
+                                  tooltip=(coluna, ("qtd_concludentes", "concludentes")), altura=420)
+    return resultados().get_or_build(("grafico_top", ds.versao, dimensao), _montar)
+
+def totais_periodos(ds: Dataset) -> pd.DataFrame:
+    # uma linha por período da série (métricas, municípios, cursos e taxas)
+    return resultados().get_or_build(("periodos", ds.versao), lambda: ds.periodos.totais().reset_index())
+
+def comparacao_periodos(ds: Dataset, a: str, b: str, metrica: str) -> pd.DataFrame:
+    # métrica por município nos períodos a e b, maiores variações primeiro
+    def _montar():
+        comp = ds.periodos.comparar(a, b, "Município", metrica).reset_index()
+        return comp.sort_values("variacao", key=abs, ascending=False, kind="stable").reset_index(drop=True)
+    return resultados().get_or_build(("comparacao", ds.versao, a, b, metrica), _montar)
+
+def opcoes_filtro(indice: IndiceFiltros, dimensao: str, filtro: Filtro) -> list:
+    # opções cruzadas com as demais dimensões + o que já está selecionado
+    return sorted(set(indice.opcoes(dimensao, filtro)) | set(filtro.valores(dimensao)))
+
+def aplicar_filtros(indice: IndiceFiltros):
+    # callback do "Aplicar": roda antes do rerun, então as opções já saem cruzadas
+    ss = st.session_state
+    faixas = {}
+    for coluna in FAIXAS:
+        valor = ss.get(f"filtro_faixa_{coluna}")
+        if valor is not None and tuple(valor) != indice.limites[coluna]:
+            faixas[coluna] = valor
+    # no mapa do navegador não há multiselect de cursos: mantém os já escolhidos
+    cursos = ss.get("filtro_cursos", ss.get("filtro_mapa", Filtro()).cursos)
+    ss.filtro_mapa = Filtro.criar(cursos, ss.get("filtro_municipios", []),
+                                  ss.get("filtro_lotes", []), faixas)
+    filtros_populares().registrar(ss.filtro_mapa.cursos)
+
+
+# --- Fragmento: visão por lote (drill-down Lote → Município → Curso) ---
+ROTULOS_ROLLUP = {
+    "Nº LOTE": "Lote",
+    "Município": "Município",
+    "CURSO": "Curso",
+    "municipios": "Municípios",
+    "cursos": "Cursos",
+    "qtd_turmas": "Turmas",
+    "qtd_inscritos": "Inscritos",
+    "qtd_vagas": "Vagas",
+    "qtd_concludentes": "Concludentes",
+    "taxa_conclusao_inscritos": "Conclusão/inscritos",
+    "taxa_conclusao_vagas": "Conclusão/vagas",
+    "media_concludentes_por_turma": "Concludentes/turma",
+}
+
+def tabela_rollup(df: pd.DataFrame, colunas: list) -> pd.DataFrame:
+    return df[[c for c in colunas if c in df.columns]].rename(columns=ROTULOS_ROLLUP)
 
-    # total de municípios do CE a partir do GeoJSON
-    try:
-        total_municipios_ce = len({f["properties"]["NM_MUN"].strip().upper()
-                                   for f in geojson_data["features"]})
-    except Exception:
-        total_municipios_ce = None
-
-    municipios_atendidos = df["Município"].nunique()
-    cursos_distintos = df["CURSO"].nunique() if "CURSO" in df.columns else 0
-    total_turmas = int(df.get("qtd_turmas", pd.Series(dtype=float)).fillna(0).sum())
-    total_concluintes = int(df.get("qtd_concludentes", pd.Series(dtype=float)).fillna(0).sum())
-    total_inscritos = float(df.get("qtd_inscritos", pd.Series(dtype=float)).fillna(0).sum())
-    total_vagas = float(df.get("qtd_vagas", pd.Series(dtype=float)).fillna(0).sum())
-
-    cobertura = (municipios_atendidos / total_municipios_ce) if total_municipios_ce else None
-    taxa_conclusao_inscritos = (total_concluintes / total_inscritos) if total_inscritos > 0 else None
-    media_concluintes_por_turma = (total_concluintes / total_turmas) if total_turmas > 0 else None
-
-    return {
-        "municipios_atendidos": municipios_atendidos,
-        "total_municipios_ce": total_municipios_ce,
-        "cursos_distintos": cursos_distintos,
-        "total_turmas": total_turmas,
-        "total_concluintes": total_concluintes,
-        "cobertura": cobertura,
-        "taxa_conclusao_inscritos": taxa_conclusao_inscritos,
-        "media_concluintes_por_turma": media_concluintes_por_turma,
-    }
-    
+@st.fragment
+def lotes_fragment(ds, lote=None):
+    # cada nível sai de um rollup pré-computado: selecionar linhas só fatia
+    h = hierarquia(ds)
+    st.markdown(
+        """
+        <h2 style='display:flex; align-items:center; color:#4a595e; margin-top:18px;'>
+            <span style='font-size:1.5em; margin-right:8px;'>📦</span>
+            Visão por Lote
+        </h2>
+        """,
+        unsafe_allow_html=True
+    )
+    metricas = ["qtd_turmas", "qtd_inscritos", "qtd_vagas", "qtd_concludentes",
+                "taxa_conclusao_inscritos", "taxa_conclusao_vagas", "media_concludentes_por_turma"]
+
+    with etapa("visao_lote"):
+        if lote is None:
+            st.caption("Selecione um lote na barra lateral para detalhar por município e curso; o mapa acompanha.")
+            st.dataframe(tabela_rollup(h.lotes, ["Nº LOTE", "municipios", "cursos", *metricas]),
+                         hide_index=True, use_container_width=True)
+            botoes_exportacao("⬇️ Lotes", (ds.versao, "lotes"), lambda: h.lotes, "qualificacao_lotes")
+            return
+
+        resumo = h.lote(lote)
+        if resumo is None:
+            st.info(f"O lote {lote} não está na versão atual dos dados.")
+            return
+        c1, c2, c3, c4 = st.columns(4)
+        with c1:
+            kpi_card("Municípios atendidos", fmt_int(resumo["municipios"]))
+        with c2:
+            kpi_card("Qtd de Cursos", fmt_int(resumo["cursos"]), color="#f7e350", bg=BG_YELLOW)
+        with c3:
+            kpi_card("Total de concludentes", fmt_int(resumo["qtd_concludentes"]), color="#4a595e", bg=BG_GRAY)
+        with c4:
+            kpi_card("Total de turmas", fmt_int(resumo["qtd_turmas"]), color="#cf2e26", bg=BG_RED)
+
+        st.markdown(f"#### Municípios do {lote}")
+        municipios = h.municipios(lote)
+        evento = st.dataframe(
+            tabela_rollup(municipios, ["Município", "cursos", *metricas]),
+            hide_index=True, use_container_width=True,
+            on_select="rerun", selection_mode="single-row", key=f"lote_municipios_{lote}",
+        )
+        linhas = evento.selection.rows if evento else []
+        if not linhas:
+            st.caption("Selecione um município na tabela para ver os cursos.")
+            return
+
+        municipio = municipios["Município"].iloc[linhas[0]]
+        st.markdown(f"#### Cursos em {str(municipio).title()} ({lote})")
+        cursos = h.cursos(lote, municipio)
+        st.dataframe(tabela_rollup(cursos, ["CURSO", *metricas]), hide_index=True, use_container_width=True)
+        botoes_exportacao("⬇️ Cursos", (ds.versao, "lote_cursos", lote, str(municipio)),
+                          lambda: cursos, f"{lote}_{municipio}_cursos")
+
+
+# --- Fragmento: evolução e comparação entre períodos (modo série) ---
+METRICAS_PERIODO = ["qtd_concludentes", "qtd_turmas", "qtd_inscritos", "qtd_vagas"]
+
+@st.fragment
+def periodos_fragment(ds):
+    # tudo sai das somas por período já prontas na série: trocar métrica ou períodos não reagrupa a base
+    rotulos = ds.periodos.rotulos
+    st.markdown(
+        """
+        <h2 style='display:flex; align-items:center; color:#4a595e; margin-top:18px;'>
+            <span style='font-size:1.5em; margin-right:8px;'>📅</span>
+            Evolução por período
+        </h2>
+        """,
+        unsafe_allow_html=True
+    )
+    totais = totais_periodos(ds)
+    colm, cola, colb, _ = st.columns([1, 1, 1, 2])
+    metrica = colm.selectbox("Métrica", METRICAS_PERIODO, format_func=ROTULOS_ROLLUP.get, key="periodo_metrica")
+    a = cola.selectbox("Comparar", rotulos, index=len(rotulos) - 2, key="periodo_a")
+    b = colb.selectbox("com", rotulos, index=len(rotulos) - 1, key="periodo_b")
+
+    with etapa("graficos_periodos"):
+        st.vega_lite_chart(linha_temporal(totais, "Período", metrica, "Período", ROTULOS_ROLLUP[metrica]),
+                           use_container_width=True)
+    if a == b:
+        st.info("Escolha dois períodos diferentes para comparar.")
+        return
+
+    linha_a, linha_b = (totais.iloc[rotulos.index(p)] for p in (a, b))
+    for col, m in zip(st.columns(3), [metrica, "municipios", "cursos"]):
+        delta = int(linha_b[m]) - int(linha_a[m])
+        col.metric(f"{ROTULOS_ROLLUP[m]} ({b})", fmt_int(linha_b[m]),
+                   delta=f"{'+' if delta >= 0 else '−'}{fmt_int(abs(delta))} vs {a}")
+
+    st.markdown(f"#### {ROTULOS_ROLLUP[metrica]} por município: {a} → {b}")
+    comp = comparacao_periodos(ds, a, b, metrica)
+    tabela = comp.rename(columns={"periodo_a": a, "periodo_b": b, "variacao": "Variação",
+                                  "variacao_pct": "Variação (%)"})
+    st.dataframe(tabela, hide_index=True, use_container_width=True,
+                 column_config={"Variação (%)": st.column_config.NumberColumn(format="percent")})
+    botoes_exportacao("⬇️ Comparação", (ds.versao, "comparacao", a, b, metrica), lambda: tabela,
+                      "qualificacao_comparacao_periodos")
 
 
 # --- Fragmento: mapa + filtros ---
 @st.fragment
-def mapa_fragment(geojson_data, camada_atual, df_base):
+def mapa_fragment(camada_atual, ds, esquema="fixo", leve=False, lote=None, navegador=False):
+    # rerun só do fragmento ganha registro próprio
+    with instrumentacao().rerun(st.session_state.get("sessao_diagnostico", "-"), "fragmento", aninhar=True):
+        mapa_conteudo(camada_atual, ds, esquema, leve, lote, navegador)
+
+
+def mapa_conteudo(camada_atual, ds, esquema, leve, lote, navegador):
+    cubo_base = ds.cubo
+
     # cabeçalho
     st.markdown(
         """
@@ -265,273 +605,250 @@ def mapa_fragment(geojson_data, camada_atual, df_base):
     )
 
     # --- filtros em formulário (evita rerun a cada clique) ---
+    indice = indice_filtros(ds)
+    filtro_atual = st.session_state.get("filtro_mapa", Filtro())
     with st.form("filtros_mapa", clear_on_submit=False):
         colf1, colf2 = st.columns([3, 1])
         with colf1:
-            cursos_opcoes = sorted(df_base["CURSO"].dropna().astype(str).unique().tolist())
-            cursos_sel = st.multiselect(
-                "Filtrar por curso",
-                options=cursos_opcoes,
-                default=st.session_state.get("cursos_sel_mapa", []),
-                placeholder="Selecione um ou mais cursos…",
-            )
+            if navegador:
+                st.caption("Cursos e camada são escolhidos no painel do mapa, sem recarregar a página.")
+            else:
+                st.multiselect(
+                    "Filtrar por curso",
+                    key="filtro_cursos",
+                    options=opcoes_filtro(indice, "curso", filtro_atual),
+                    default=list(filtro_atual.cursos),
+                    placeholder="Selecione um ou mais cursos…",
+                )
         with colf2:
             st.write("")
-            aplicar = st.form_submit_button("Aplicar", use_container_width=True)
+            st.form_submit_button("Aplicar", use_container_width=True,
+                                  on_click=aplicar_filtros, args=(indice,))
+
+        with st.expander("Mais filtros", expanded=bool(filtro_atual.lotes or filtro_atual.municipios or filtro_atual.faixas)):
+            colf3, colf4 = st.columns(2)
+            with colf3:
+                st.multiselect(
+                    "Nº do lote",
+                    key="filtro_lotes",
+                    options=opcoes_filtro(indice, "lote", filtro_atual),
+                    default=list(filtro_atual.lotes),
+                    placeholder="Todos os lotes",
+                    disabled=lote is not None,
+                    help="Definido pelo lote selecionado na barra lateral." if lote is not None else None,
+                )
+            with colf4:
+                st.multiselect(
+                    "Município",
+                    key="filtro_municipios",
+                    options=opcoes_filtro(indice, "municipio", filtro_atual),
+                    default=list(filtro_atual.municipios),
+                    placeholder="Todos os municípios",
+                    format_func=str.title,
+                )
+            for col_faixa, (coluna, rotulo) in zip(st.columns(len(FAIXAS)), FAIXAS.items()):
+                lo, hi = indice.limites[coluna]
+                if hi <= lo:
+                    continue
+                taxa = coluna.startswith("taxa")
+                tipo = float if taxa else int
+                atual = filtro_atual.faixa(coluna) or (lo, hi)
+                col_faixa.slider(
+                    rotulo,
+                    key=f"filtro_faixa_{coluna}",
+                    min_value=tipo(lo),
+                    max_value=tipo(hi),
+                    value=(tipo(atual[0]), tipo(atual[1])),
+                    format="%.2f" if taxa else "%d",
+                )
 
-    # persiste/recupera seleção
-    if aplicar:
-        st.session_state.cursos_sel_mapa = cursos_sel
-    cursos_atuais = st.session_state.get("cursos_sel_mapa", [])
+    # lote da barra lateral: restringe o mapa (no lugar do filtro de lotes)
+    filtro_atual = filtro_atual.com_lote(lote)
+    # mapa do navegador: o servidor filtra o resto, os cursos ficam com o navegador
+    cursos_navegador = filtro_atual.cursos
+    if navegador:
+        filtro_atual = filtro_atual.sem("curso")
 
-    # aplica filtro
-    df_filtrado = (
-        df_base if not cursos_atuais
-        else df_base[df_base["CURSO"].isin(cursos_atuais)]
-    )
+    # aplica filtro: máscara sobre o cubo (índices pré-computados, sem copiar linhas)
+    with etapa("filtros"):
+        mascara = indice.mascara(filtro_atual)
 
-    if cursos_atuais:
+    if filtro_atual.ativo:
+        with etapa("kpis"):
+            atendidos = compute_kpis(ds, None, filtro_atual).municipios_atendidos
         st.caption(
-            f"Filtro ativo: {len(cursos_atuais)} curso(s) • "
-            f"Municípios com oferta: {df_filtrado['Município'].nunique()}"
+            f"Filtro ativo: {filtro_atual.descricao()} • "
+            f"Municípios com oferta: {atendidos}"
         )
 
-    # constrói o mapa com a base (filtrada ou não)
-    m, geo = build_map(geojson_data, camada_atual, df_filtrado)
-
-    st_data = st_folium(
-        m,
-        width="100%",
-        height=600,
-        use_container_width=True,
-        # mantém somente clique, evitando reruns por zoom/pan
-        returned_objects=["last_object_clicked"],
-        feature_group_to_add=[geo],
-    )
+    cole1, cole2, _ = st.columns([1, 1, 3])
+    with cole1:
+        botoes_exportacao(
+            "⬇️ Dados filtrados",
+            (ds.versao, "dados", filtro_atual),
+            lambda: (cubo_base if mascara is None else cubo_base[mascara])[COLUNAS_DETALHE],
+            "qualificacao_dados_filtrados",
+        )
+    with cole2:
+        botoes_exportacao(
+            "⬇️ Valores da camada",
+            (ds.versao, "camada", camada_atual, filtro_atual),
+            lambda: (valores_camada(cubo_base, camada_atual, mascara)
+                     .rename_axis("Município").reset_index(name=camada_atual)),
+            "qualificacao_valores_camada",
+        )
+
+    # modo leve: SVG estático gerado no servidor (sem Leaflet/tiles/GeoJSON no navegador)
+    if leve:
+        with etapa("mapa_svg"):
+            svg = resultados().get_or_build(
+                ("svg", ds.versao, camada_atual, esquema, filtro_atual),
+                lambda: build_svg(camada_atual, valores_mapa(ds, camada_atual, filtro_atual), esquema),
+            )
+        registrar("mapa_bytes", len(svg))
+        st.markdown(svg, unsafe_allow_html=True)
+        cols1, cols2, _ = st.columns([1, 1, 3])
+        with cols1:
+            st.download_button("⬇️ Baixar mapa (SVG)", data=svg, file_name="mapa_qualificacao.svg",
+                               mime="image/svg+xml", on_click="ignore", use_container_width=True)
+        with cols2:
+            if st.button("Abrir mapa interativo", on_click=desligar_mapa_leve, use_container_width=True):
+                st.rerun()
+        return
 
-        # --- clique no mapa -> abre modal com base FILTRADA ---
     if "mun_clicked" not in st.session_state:
         st.session_state.mun_clicked = None
-
-    evt = (st_data or {}).get("last_object_clicked")
     mun = None
 
-    if evt and isinstance(evt, dict):
-        # 1) tenta pegar das properties (se vierem)
-        props = evt.get("properties") if "properties" in evt else {}
-        mun = (props or {}).get("NM_MUN")
+    if navegador:
+        # geometria e tabela baixadas uma vez; filtro de cursos, camada e cores no navegador
+        with etapa("mapa_navegador"):
+            geometria, config = mapa_navegador_base()
+            evento = mapa_cliente(geometria, tabela_mapa_navegador(ds, filtro_atual), camada_atual, esquema,
+                                  cursos=cursos_navegador, config=config, map_state=MAPA_INICIAL,
+                                  key="mapa_navegador_componente")
+
+        # --- clique (único retorno ao servidor) -> modal com os cursos escolhidos no navegador ---
+        if evento and evento.get("clique") != st.session_state.get("mapa_navegador_clique"):
+            st.session_state.mapa_navegador_clique = evento.get("clique")
+            filtro_atual = filtro_atual.com_cursos(evento.get("cursos") or ())
+            camada_atual = evento.get("camada") or camada_atual
+            st.session_state.filtro_mapa = (st.session_state.get("filtro_mapa", Filtro())
+                                            .com_cursos(filtro_atual.cursos))
+            st.session_state.mun_clicked = None   # clique novo sempre abre
+            mun = int(evento["municipio"])
+    else:
+        # constrói o mapa com a base (filtrada ou não) — ou reaproveita do cache
+        payload = mapa_payload(ds, camada_atual, esquema, filtro_atual)
+        # zoom atual no navegador (último valor do componente): fora do nível inicial, manda a
+        # camada no nível de detalhe dele; o script do mapa é o mesmo em todos os níveis, então
+        # o componente só troca a camada e mantém a vista
+        # (sem os internos do streamlit_folium não há chave: fica no nível inicial)
+        chave = chave_componente(payload)
+        zoom = (st.session_state.get(chave) or {}).get("zoom") if chave else None
+        if zoom is not None and not TILES_URL and nivel_para_zoom(zoom) != nivel_para_zoom(MAPA_INICIAL["zoom"]):
+            payload = mapa_payload(ds, camada_atual, esquema, filtro_atual, zoom)
+        registrar("mapa_bytes", payload.nbytes)
+        registrar("mapa_feicoes", payload.n_features)
+
+        with etapa("st_folium"):
+            st_data = st_folium_renderizado(
+                payload,
+                height=600,
+                # clique (posição e tooltip) e zoom (o componente já espera o fim do movimento);
+                # pan não gera rerun
+                returned_objects=["last_object_clicked", "last_object_clicked_tooltip", "zoom"],
+            )
 
-        # 2) fallback: ponto-em-polígono quando só vem lat/lng
-        if not mun and ("lat" in evt and "lng" in evt):
-            # pequena tolerância para cliques na borda (~10m)
-            pt = gpd.points_from_xy([evt["lng"]], [evt["lat"]], crs="EPSG:4326")[0]
-            poly = gdf_muns[gdf_muns.intersects(pt.buffer(0.0001))]
-            if not poly.empty:
-                mun = str(poly.iloc[0]["NM_MUN"]).strip().upper()
+        # --- clique no mapa -> abre modal com base FILTRADA ---
+        evt = (st_data or {}).get("last_object_clicked")
+
+        if evt and isinstance(evt, dict):
+            # 1) nome do município no tooltip da feição clicada, pela tabela de municípios
+            mun = municipio_do_tooltip(st_data.get("last_object_clicked_tooltip"), tabela_municipios())
+            # 2) fallback: ponto-em-polígono pela posição do clique
+            if mun is None:
+                mun = localizador_municipios().resolver(evt)
+
+    # link direto: ?municipio=NOME (com ou sem acento) ou código IBGE abre o modal (uma vez)
+    link = st.query_params.pop("municipio", None)
+    if link:
+        i = tabela_municipios().id_de(link)
+        if i < 0:
+            st.toast(f"Município não encontrado: {link}")
+        mun = i if i >= 0 else None
+        st.session_state.mun_clicked = None
 
-    if mun and mun != st.session_state.mun_clicked:
+    if mun is not None and mun != st.session_state.mun_clicked:
         st.session_state.mun_clicked = mun
-        show_municipio_dialog(mun, df_filtrado, camada_atual)
-
-
-
-
-# =========================
-# HOME: Panorama do Programa
-# =========================
-
-st.markdown(
-    "<h2 style='color:#4a595e; font-weight:700; margin:0'>"
-    "<span style='font-size:1.5em; margin-right:8px;'>📊</span>"
-    "Panorama do Programa"
-    "</h2>",
-    unsafe_allow_html=True,
-)
+        show_municipio_dialog(mun, ds, filtro_atual, camada_atual)
 
-kpis = compute_kpis(df_qualificacao, geojson_data)
 
-c1, c2, c3, c4 = st.columns(4)
-with c1:
-    kpi_card("Municípios atendidos", fmt_int(kpis["municipios_atendidos"]))
-with c2:
-    cov_help = (f"{kpis['municipios_atendidos']}/{kpis['total_municipios_ce']} municípios do CE") if kpis["total_municipios_ce"] else None
-    kpi_card("Cobertura no CE", fmt_pct(kpis["cobertura"]), color=BRAND_BLUE, bg=BG_BLUE, help_text=cov_help)
-with c3:
-    kpi_card("Qtd de Cursos", fmt_int(kpis["cursos_distintos"]), color="#f7e350", bg=BG_YELLOW)
-with c4:
-    kpi_card("Total de concludentes", fmt_int(kpis["total_concluintes"]), color= "#4a595e", bg=BG_GRAY)
 
-# <<< inserindo espaçamento entre linhas >>>
-st.markdown("<div style='margin-top:18px;'></div>", unsafe_allow_html=True)
 
-c5, c6 = st.columns(2)
-with c5:
-    kpi_card("Total de turmas", fmt_int(kpis["total_turmas"]), color="#cf2e26", bg=BG_RED)
-with c6:
-    med = f"{kpis['media_concluintes_por_turma']:.1f}" if kpis["media_concluintes_por_turma"] else "—"
-    kpi_card("Média de concludentes por turma", med, color=BRAND_GREEN, bg=BG_GREEN)
+def mapa_payload(ds: Dataset, camada, esquema, filtro: Filtro, zoom=None):
+    # mapa renderizado por (versão, camada, esquema, filtro, nível de detalhe), compartilhado
+    # entre sessões; a vista inicial é sempre MAPA_INICIAL (depois dela quem manda é o navegador)
+    nivel = None if TILES_URL else nivel_para_zoom(MAPA_INICIAL["zoom"] if zoom is None else zoom)
+    chave = ("mapa", ds.versao, camada, esquema, filtro, nivel)
+    construiu = []
 
-st.divider()
-
-# Gráficos (2 colunas)
-g1, g2 = st.columns(2)
-
-with g1:
-    st.markdown(
-    """
-    <h5 style='display:flex; align-items:center; color:#6c91c8; margin-top:12px;'>
-        <span style='font-size:1.2em; margin-right:6px;'>🎓</span>
-        Top 10 cursos/concludentes
-    </h5>
-    """,
-    unsafe_allow_html=True
-)
-    if not top_cursos.empty:
-        ch = (alt.Chart(top_cursos)
-                .mark_bar(color="#cf2e26")
-                .encode(
-                    x=alt.X("qtd_concludentes:Q", title="concludentes"),
-                    y=alt.Y("CURSO:N", sort="-x", title="Curso"),
-                    tooltip=["CURSO", alt.Tooltip("qtd_concludentes:Q", title="concludentes")]
-                )
-                .properties(height=420))
-        st.altair_chart(ch, use_container_width=True)
-        # Download
-        st.download_button(
-            "Baixar Top 10 cursos (CSV)",
-            data=top_cursos.to_csv(index=False).encode("latin-1"),
-            file_name="top10_cursos_concludentes.csv",
-            mime="text/csv"
-        )
-    else:
-        st.info("Dados insuficientes para montar o ranking de cursos (precisa de 'CURSO' e 'qtd_concludentes').")
-
-with g2:
-    st.markdown(
-    """
-    <h5 style='display:flex; align-items:center; color:#6c91c8; margin-top:12px;'>
-        <span style='font-size:1.2em; margin-right:6px;'>🏙️</span>
-        Top 10 municípios/concludentes
-    </h5>
-    """,
-    unsafe_allow_html=True
-)
-    if not top_municipios.empty:
-        ch = (alt.Chart(top_municipios)
-                .mark_bar(color="#cf2e26")
-                .encode(
-                    x=alt.X("qtd_concludentes:Q", title="concludentes"),
-                    y=alt.Y("Município:N", sort="-x", title="Município"),
-                    tooltip=["Município", alt.Tooltip("qtd_concludentes:Q", title="concludentes")]
-                )
-                .properties(height=420))
-        st.altair_chart(ch, use_container_width=True)
-        st.download_button(
-            "Baixar Top 10 municípios (CSV)",
-            data=top_municipios.to_csv(index=False).encode("latin-1"),
-            file_name="top10_municipios_concludentes.csv",
-            mime="text/csv"
-        )
-    else:
-        st.info("Dados insuficientes para montar o ranking de municípios (precisa de 'Município' e 'qtd_concludentes').")
+    def _renderizar():
+        construiu.append(True)
+        if TILES_URL:
+            with etapa("build_map"):
+                m, _ = build_map(None, camada, valores_mapa(ds, camada, filtro), tiles_url=TILES_URL,
+                                 esquema=esquema)
+            with etapa("serializar_mapa"):
+                return renderizar_mapa(m)
+        # nível de detalhe da geometria conforme o zoom
+        geometria = load_geometria(nivel)
+        with etapa("build_map"):
+            m, geo = build_map(geometria, camada, valores_mapa(ds, camada, filtro), esquema=esquema)
+        with etapa("serializar_mapa"):
+            return renderizar_mapa(m, feature_groups=[geo], n_features=len(geometria))
 
-st.divider()
+    # hit só se já estava pronto; quem esperou a construção de outra thread (aquecimento) não conta
+    pronto = chave in resultados()
+    payload = resultados().get_or_build(chave, _renderizar)
+    registrar("mapa_cache_hit", pronto and not construiu)
+    if not pronto and not construiu:
+        registrar("mapa_aguardou_construcao", True)
+    return payload
 
 
+def build_map(geometria, camada, valores_feicoes, tiles_url=None, esquema="fixo", map_state=None):
+    import folium
 
-def build_map(geojson_data, camada, df):
     # m = folium.Map(location=[-5.3159, -39.2129], zoom_start=7, tiles="CartoDB positron")
 
-    if "map_state" not in st.session_state:
-        st.session_state.map_state = {"center": [-5.3159, -39.2129], "zoom": 7}
-
+    map_state = map_state or MAPA_INICIAL
     m = folium.Map(
-        location=st.session_state.map_state["center"],
-        zoom_start=st.session_state.map_state["zoom"],
+        location=map_state["center"],
+        zoom_start=map_state["zoom"],
         tiles="CartoDB positron"
     )
-    
-    # ======= Métrica por camada =======
-    if camada == "Cursos por Município":
-        df_metric = df["Município"].value_counts().reset_index()
-        df_metric.columns = ["NM_MUN", "valor"]
-    elif camada == "Municípios com Qualificação":
-        df_metric = df[["Município"]].drop_duplicates().rename(columns={"Município": "NM_MUN"})
-        df_metric["valor"] = 1.0
-    elif camada == "Concludentes por Município":
-        df_metric = df.groupby("Município")["qtd_concludentes"].sum().reset_index()
-        df_metric.columns = ["NM_MUN", "valor"]
-    elif camada == "Turmas por Município":
-        df_metric = df.groupby("Município")["qtd_turmas"].sum().reset_index()
-        df_metric.columns = ["NM_MUN", "valor"]
-    else:
-        df_metric = pd.DataFrame(columns=["NM_MUN", "valor"])
-
-    # Normalização
-    df_metric["NM_MUN"] = df_metric["NM_MUN"].str.strip().str.upper()
-    df_metric["valor"] = pd.to_numeric(df_metric["valor"], errors="coerce").fillna(0.0).astype(float)
-    valores = dict(zip(df_metric["NM_MUN"], df_metric["valor"]))
-
-    # ======= Escalas por camada (Greens) =======
-    colormap = None
-    grey = "#e0e0e0"
-
-    if camada == "Municípios com Qualificação":
-        # Binário: 1 = verde, 0/ausente = cinza
-        # Legenda categórica:
-        add_binary_legend(m, "Municípios com Qualificação", color_on="#a9c772", color_off="#f7e350")
-
-    elif camada == "Cursos por Município":
-        # Bins fixos (QGIS): 1-5, 5-10, 10-20, 20-max
-        vmax = max(20.0, float(df_metric["valor"].max()))
-        bins = [1.0, 2.0, 5.0, 10.0, 20.0, vmax]
-        colormap = linear.Greens_05.to_step(index=bins)
-        colormap.caption = "Cursos por Município"
-        colormap.add_to(m)
-
-    elif camada == "Concludentes por Município":
-        # Bins fixos (QGIS): 0-100, 100-200, 200-500, 500-1000, 1000-max
-        vmax = max(1000.0, float(df_metric["valor"].max()))
-        bins = [0.0, 100.0, 150.0, 200.0, 500.0, 1000.0, vmax]
-        colormap = linear.Greens_06.to_step(index=bins)
-        colormap.caption = "Concludentes por Município"
-        colormap.add_to(m)
-
-    elif camada == "Turmas por Município":
-        # Bins análogos aos de cursos: 1-5, 5-10, 10-20, 20-max
-        vmax = max(20.0, float(df_metric["valor"].max()))
-        bins = [1.0, 5.0, 10.0, 20.0, vmax]
-        colormap = linear.Greens_05.to_step(index=bins)
-        colormap.caption = "Turmas por Município"
-        colormap.add_to(m)
-
-    # ======= Injeção VALOR no GeoJSON =======
-    for feature in geojson_data["features"]:
-        nome_mun = feature["properties"]["NM_MUN"].strip().upper()
-        feature["properties"]["VALOR"] = float(valores.get(nome_mun, 0.0))
-
-    # ======= Estilo =======
-    def style_fn(feat):
-        nome = feat["properties"]["NM_MUN"].strip().upper()
-        v = float(valores.get(nome, 0.0))
-
-        if camada == "Municípios com Qualificação":
-            fill = "#a9c772" if v >= 1.0 else "#f7e350"
-        else:
-            if colormap is None:
-                fill = grey
-            else:
-                # Para Cursos/Turmas: 0 vira cinza para destacar ausência
-                if camada in ("Cursos por Município", "Turmas por Município") and v < 1.0:
-                    fill = grey
-                else:
-                    fill = colormap(v)
 
-        return {"fillColor": fill, "color": "#333", "weight": 0.7, "fillOpacity": 0.75}
+    # ======= Métrica por camada: valores_feicoes já vem alinhado às feições (id do município) =======
+
+    # ======= Modo tiles vetoriais: só a tabela de cores vai no payload =======
+    if tiles_url:
+        municipios = tabela_municipios()
+        classes = classificar(camada, valores_feicoes, esquema)
+        add_legenda(m, classes)
+        cores = dict(zip(municipios.nomes, classes.cores_de(valores_feicoes)))
+        camada_vetorial(tiles_url, cores, str(classes.cores_de([0.0])[0])).add_to(m)
+        return m, None
+
+    # ======= VALOR e cor unidos às feições só na serialização =======
+    classes = classificar(camada, valores_feicoes, esquema)
+    add_legenda(m, classes)
+    # estilo embutido em properties.style: sem callback Python por feição
+    estilos = [{"fillColor": cor, "color": "#333", "weight": 0.7, "fillOpacity": 0.75}
+               for cor in classes.cores_de(valores_feicoes)]
 
     geo = folium.GeoJson(
-        geojson_data,
-        style_function=style_fn,
+        geometria.com_propriedades(VALOR=valores_feicoes.tolist(), style=estilos),
         tooltip=folium.GeoJsonTooltip(
             fields=["NM_MUN", "VALOR"],
             aliases=["Município:", f"{camada}:"],
@@ -545,91 +862,53 @@ def build_map(geojson_data, camada, df):
         highlight_function=lambda f: {"weight": 2, "color": "#000", "fillOpacity": 0.85},
         popup_keep_highlighted=True,
     )
-    geo.add_to(m)
+    # a camada não entra no script do mapa: vai como feature group do componente, que a
+    # troca (ex.: outro nível de detalhe) sem recriar o mapa
     return m, geo
 
 
-# Sidebar
-st.sidebar.image('icons/neg_color.png', use_container_width=True)
-camada = st.sidebar.radio("Selecione a camada:", 
-                          ["Municípios com Qualificação", "Cursos por Município", "Concludentes por Município", "Turmas por Município"])
-
+def desligar_mapa_leve():
+    st.session_state.mapa_leve = False
 
+def build_svg(camada, valores, esquema="fixo"):
+    # mesma classificação/legenda do build_map, desenhada em SVG
+    base = mapa_svg_base()
+    classes = classificar(camada, valores, esquema)
+    titulos = [f"{nome.title()}: {fmt_int(v)}" for nome, v in zip(base.geometria.nomes, valores)]
+    return base.renderizar(classes.cores_de(valores), titulos, classes.legenda(), camada)
 
-# GeoDataFrame para lookup ponto-em-polígono (EPSG:4326)
-gdf_muns = gpd.GeoDataFrame.from_features(geojson_raw, crs="EPSG:4326")[["NM_MUN", "geometry"]]
-# índice espacial para acelerar
-_ = gdf_muns.sindex
 
-# Dados auxiliares
-df_municipios_unicos = df_qualificacao['Município'].unique()
-df_lotes_unicos = df_qualificacao['Nº LOTE'].unique()
-
-qtd_cursos_por_municipio = df_qualificacao['Município'].value_counts()
-qtd_concludentes_por_municipio = df_qualificacao.groupby('Município')['qtd_concludentes'].sum().reset_index()
-qtd_turmas_por_municipio = df_qualificacao.groupby('Município')['qtd_turmas'].sum().reset_index().sort_values(by='qtd_turmas', ascending=False)
 
 
 # =========================
 # Modal de detalhes do município   
 @st.dialog("Detalhes do Município", width="large")
-def show_municipio_dialog(municipio: str, df_base: pd.DataFrame, camada: str):
-    # filtra base (seu df_qualificacao já está normalizado em UPPER)
-    df_mun = df_base[df_base["Município"].str.upper().eq(str(municipio).upper())].copy()
+def show_municipio_dialog(id_municipio: int, ds: Dataset, filtro: Filtro, camada: str):
+    # detalhe pronto do cache (fatia por intervalo de linhas, agregados e gráficos)
+    with etapa("detalhe_municipio"):
+        det = detalhe_municipio(ds, id_municipio, filtro)
 
-    st.subheader(municipio.title())
+    st.subheader(det.municipio.title())
 
     # KPIs rápidos
     c1, c2, c3 = st.columns(3)
-    c1.metric("Cursos distintos", df_mun["CURSO"].nunique())
-    c2.metric("Total de turmas", int(df_mun["qtd_turmas"].sum()))
-    c3.metric("Total de concludentes", int(df_mun["qtd_concludentes"].sum()))
-
-    # Agregações por curso
-    agg = (df_mun.groupby("CURSO", as_index=False)
-                 .agg(concludentes=("qtd_concludentes", "sum"),
-                      turmas=("qtd_turmas", "sum"))
-          )
-    # ordenação por concludentes
-    agg = agg.sort_values("concludentes", ascending=False)
+    c1.metric("Cursos distintos", det.cursos_distintos)
+    c2.metric("Total de turmas", det.total_turmas)
+    c3.metric("Total de concludentes", det.total_concludentes)
 
     st.markdown("#### Concludentes por curso")
-    ch1 = (alt.Chart(agg)
-             .mark_bar(color="#cf2e26")
-             .encode(
-                 x=alt.X("concludentes:Q", title="Concludentes"),
-                 y=alt.Y("CURSO:N", sort="-x", title="Curso"),
-                 tooltip=["CURSO", "concludentes", "turmas"]
-             )
-             .properties(height=400)
-          )
-    st.altair_chart(ch1, use_container_width=True)  # Altair no Streamlit :contentReference[oaicite:7]{index=7}
+    st.vega_lite_chart(det.graficos["concludentes"], use_container_width=True)
 
     st.markdown("#### Turmas por curso")
-    ch2 = (alt.Chart(agg)
-             .mark_bar(color="#cf2e26")
-             .encode(
-                 x=alt.X("turmas:Q", title="Turmas"),
-                 y=alt.Y("CURSO:N", sort="-x", title="Curso"),
-                 tooltip=["CURSO", "turmas", "concludentes"]
-             )
-             .properties(height=400)
-          )
-    st.altair_chart(ch2, use_container_width=True)
+    st.vega_lite_chart(det.graficos["turmas"], use_container_width=True)
 
     # Tabela detalhada (você pode escolher as colunas mais úteis)
     st.markdown("#### Detalhamento dos cursos (linhas originais)")
-    cols = [c for c in df_mun.columns if c in ["Nº LOTE", "Município", "CURSO", "qtd_turmas", "qtd_inscritos", "qtd_vagas", "qtd_concludentes"]]
-    st.dataframe(df_mun[cols], use_container_width=True)
-
-    # Download do recorte
-    csv_bytes = df_mun[cols].to_csv(index=False).encode("latin-1")
-    st.download_button(
-        "Baixar CSV do município",
-        data=csv_bytes,
-        file_name=f"{municipio}_detalhamento.csv",
-        mime="text/csv"
-    )  # download_button doc :contentReference[oaicite:8]{index=8}
+    st.dataframe(det.linhas, use_container_width=True)
+
+    # Download do recorte (gerado só no clique)
+    botoes_exportacao("Baixar dados do município", (ds.versao, "municipio", id_municipio, filtro),
+                      lambda: det.linhas, f"{det.municipio}_detalhamento")
 
     # Botão fechar (opcional): st.rerun() fecha o modal programaticamente. :contentReference[oaicite:9]{index=9}
     if st.button("Fechar"):
@@ -637,8 +916,163 @@ def show_municipio_dialog(municipio: str, df_base: pd.DataFrame, camada: str):
         st.rerun()
 
 
-# ---- captura do clique ----
-if "mun_clicked" not in st.session_state:
-    st.session_state.mun_clicked = None
+def main():
+    # o que roda a cada rerun, na ordem da página (acima, só definições)
+    # Dados
+    with etapa("carregar_dados"):
+        # snapshot da versão atual: o rerun inteiro (e o fragmento) seguem com ele
+        dataset = atualizador().atual
+        total_municipios_ce = len(tabela_municipios())
+        if dataset.nao_encontrados is not None:
+            registrar("municipios_nao_encontrados", len(dataset.nao_encontrados))
+
+    # =========================
+    # HOME: Panorama do Programa
+    # =========================
+
+    st.markdown(
+        "<h2 style='color:#4a595e; font-weight:700; margin:0'>"
+        "<span style='font-size:1.5em; margin-right:8px;'>📊</span>"
+        "Panorama do Programa"
+        "</h2>",
+        unsafe_allow_html=True,
+    )
+
+    # modo série: o intervalo de períodos vale para KPIs, rankings, lotes, mapa e modal
+    dataset_base = dataset
+    if dataset.periodos is not None and len(dataset.periodos) > 1:
+        rotulos_periodo = dataset.periodos.rotulos
+        if any(p not in rotulos_periodo for p in st.session_state.get("periodo", ())):
+            del st.session_state["periodo"]   # período que saiu da série
+        inicio, fim = st.select_slider("Período", options=rotulos_periodo, key="periodo",
+                                       value=(rotulos_periodo[0], rotulos_periodo[-1]),
+                                       help="Soma os períodos do intervalo (agregados por período já prontos).")
+        with etapa("recorte_periodo"):
+            dataset = recorte_periodo(dataset, inicio, fim)
+
+    with etapa("kpis"):
+        kpis = compute_kpis(dataset, total_municipios_ce)
+    top_cursos = kpis.top("curso")
+    top_municipios = kpis.top("municipio")
+
+    c1, c2, c3, c4 = st.columns(4)
+    with c1:
+        kpi_card("Municípios atendidos", fmt_int(kpis.municipios_atendidos))
+    with c2:
+        cov_help = (f"{kpis.municipios_atendidos}/{kpis.total_municipios_ce} municípios do CE") if kpis.total_municipios_ce else None
+        kpi_card("Cobertura no CE", fmt_pct(kpis.cobertura), color=BRAND_BLUE, bg=BG_BLUE, help_text=cov_help)
+    with c3:
+        kpi_card("Qtd de Cursos", fmt_int(kpis.cursos_distintos), color="#f7e350", bg=BG_YELLOW)
+    with c4:
+        kpi_card("Total de concludentes", fmt_int(kpis.total_concludentes), color= "#4a595e", bg=BG_GRAY)
+
+    # <<< inserindo espaçamento entre linhas >>>
+    st.markdown("<div style='margin-top:18px;'></div>", unsafe_allow_html=True)
+
+    c5, c6 = st.columns(2)
+    with c5:
+        kpi_card("Total de turmas", fmt_int(kpis.total_turmas), color="#cf2e26", bg=BG_RED)
+    with c6:
+        med = f"{kpis.media_concludentes_por_turma:.1f}" if kpis.media_concludentes_por_turma else "—"
+        kpi_card("Média de concludentes por turma", med, color=BRAND_GREEN, bg=BG_GREEN)
+
+    st.divider()
+
+    # Gráficos (2 colunas)
+    g1, g2 = st.columns(2)
+
+    with g1:
+        st.markdown(
+        """
+        <h5 style='display:flex; align-items:center; color:#6c91c8; margin-top:12px;'>
+            <span style='font-size:1.2em; margin-right:6px;'>🎓</span>
+            Top 10 cursos/concludentes
+        </h5>
+        """,
+        unsafe_allow_html=True
+    )
+        if not top_cursos.empty:
+            with etapa("graficos_panorama"):
+                st.vega_lite_chart(grafico_top(dataset, "curso"), use_container_width=True)
+            # Download
+            botoes_exportacao("Baixar Top 10 cursos", (dataset.versao, "top_cursos"),
+                              lambda: top_cursos, "top10_cursos_concludentes")
+        else:
+            st.info("Dados insuficientes para montar o ranking de cursos (precisa de 'CURSO' e 'qtd_concludentes').")
+
+    with g2:
+        st.markdown(
+        """
+        <h5 style='display:flex; align-items:center; color:#6c91c8; margin-top:12px;'>
+            <span style='font-size:1.2em; margin-right:6px;'>🏙️</span>
+            Top 10 municípios/concludentes
+        </h5>
+        """,
+        unsafe_allow_html=True
+    )
+        if not top_municipios.empty:
+            with etapa("graficos_panorama"):
+                st.vega_lite_chart(grafico_top(dataset, "municipio"), use_container_width=True)
+            botoes_exportacao("Baixar Top 10 municípios", (dataset.versao, "top_municipios"),
+                              lambda: top_municipios, "top10_municipios_concludentes")
+        else:
+            st.info("Dados insuficientes para montar o ranking de municípios (precisa de 'Município' e 'qtd_concludentes').")
+
+    st.divider()
+
+    if dataset_base.periodos is not None and len(dataset_base.periodos) > 1:
+        periodos_fragment(dataset_base)
+        st.divider()
+
+    # Sidebar
+    st.sidebar.image('icons/neg_color.png', use_container_width=True)
+    camada = st.sidebar.radio("Selecione a camada:", CAMADAS)
+    mapa_leve = st.sidebar.toggle("Mapa leve (SVG estático)", key="mapa_leve",
+                                  help="Mapa desenhado no servidor: abre na hora, sem tiles, e pode ser baixado em SVG.")
+    mapa_navegador = st.sidebar.toggle("Filtros no navegador", key="mapa_navegador", disabled=mapa_leve,
+                                       value=os.environ.get("QUALIFICACAO_MAPA_NAVEGADOR") == "1",
+                                       help="O mapa filtra cursos e troca de camada no próprio navegador, na hora; "
+                                            "o servidor só é chamado para os detalhes do município.")
+    ROTULOS_ESQUEMA = {
+        "fixo": "Quebras fixas (QGIS)",
+        "quantil": "Quantis",
+        "jenks": "Quebras naturais (Jenks)",
+        "intervalos_iguais": "Intervalos iguais",
+    }
+    esquema = st.sidebar.selectbox("Classificação das cores:", ESQUEMAS,
+                                   format_func=ROTULOS_ESQUEMA.get)
+    lote = st.sidebar.selectbox("Lote:", [None, *hierarquia(dataset).nomes_lotes()], key="lote",
+                                format_func=lambda l: "Todos os lotes" if l is None else l,
+                                help="Detalha o lote por município e curso e colore o mapa só com ele.")
+
+    # versão dos dados em uso (trocada em segundo plano quando o CSV muda)
+    st.sidebar.caption(
+        f"Dados: versão {dataset_base.versao[:8]} • carregados em "
+        f"{time.strftime('%d/%m/%Y %H:%M', time.localtime(dataset_base.carregado_em))}"
+        + (f" • {len(dataset_base.periodos)} período(s)" if dataset_base.periodos is not None else "")
+    )
+    # aquecimento desta versão (no primeiro run do processo começa aqui, depois de tudo definido)
+    if AQUECER_NO_INICIO:
+        progresso = aquecimento(dataset_base).progresso()
+        if not progresso["concluido"]:
+            st.sidebar.caption(f"Aquecendo caches: {progresso['prontas']}/{progresso['total']} prontos "
+                               f"({progresso['segundos']:.0f} s); o restante é montado sob demanda.")
+    if st.session_state.get("versao_dados") not in (None, dataset_base.versao):
+        st.toast("Dados atualizados para a versão mais recente.")
+    st.session_state.versao_dados = dataset_base.versao
+
+    # ---- captura do clique ----
+    if "mun_clicked" not in st.session_state:
+        st.session_state.mun_clicked = None
+
+    lotes_fragment(dataset, lote)
+    mapa_fragment(camada, dataset, esquema, mapa_leve, lote, mapa_navegador)
+    return dataset_base
+
+
+# Instrumentação do rerun (no-op quando desligada); fecha também no st.rerun()/st.stop()
+sessao_diagnostico = st.session_state.setdefault("sessao_diagnostico", uuid.uuid4().hex[:8])
+with instrumentacao().rerun(sessao_diagnostico):
+    dataset_base = main()
 
-mapa_fragment(geojson_data, camada, df_qualificacao)
+painel_diagnostico(instrumentacao(), sessao_diagnostico, dataset_base)